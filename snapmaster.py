@@ -0,0 +1,11 @@
+"""Lanzador de SnapMaster: python -m snapmaster [gui|capture|daemon|control] ...
+
+Sin argumentos abre la interfaz gráfica. Las órdenes capture y daemon no
+importan Tkinter, así que funcionan en servidores sin pantalla.
+"""
+import sys
+
+from snapmaster_profesional import cli_main
+
+if __name__ == "__main__":
+    sys.exit(cli_main(sys.argv[1:]))
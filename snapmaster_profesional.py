@@ -10,8 +10,9 @@ Descripción: Implementación en un solo archivo, modularizada con clases:
    manejo de hilos, logging, y manejo robusto de excepciones.
 
 Requisitos (sugeridos para un virtualenv):
-  pip install pyautogui pillow python-docx opencv-python docx2pdf mss pywin32
+  pip install pyautogui pillow opencv-python docx2pdf mss pywin32
   # No todas son obligatorias: mss y docx2pdf son opcionales; se usan si están
+  # SNAPMASTER_BACKEND=mss|pyautogui|synthetic fuerza el backend de captura
 
 Notas de seguridad:
  - No se guarda ninguna contraseña en texto plano.
@@ -21,20 +22,109 @@ Notas de seguridad:
 Autor: Reescrito por ChatGPT (solicitud del usuario)
 Versión: 1.0
 """
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import time
+
+# Inicio de la importación de este módulo (lo reporta --profile-startup)
+MODULE_IMPORT_STARTED = time.perf_counter()
+
 import os
 import threading
-import time
 from datetime import datetime
 import subprocess
 import sys
 import hashlib
-import tkinter.ttk as ttk
+import json
+import random
+import shutil
+import socket
+import queue
+import struct
+import zlib
+import textwrap
+import bisect
+from concurrent.futures import Future
+import zipfile
+import io
+import importlib
+from collections import OrderedDict, deque
+
+# Tkinter solo se carga para la interfaz (ver load_tk): la CLI y el daemon
+# funcionan en servidores sin pantalla ni Tk instalado
+tk = ttk = filedialog = messagebox = None
+
+
+def load_tk():
+    """Importa Tkinter en los nombres globales que usa la interfaz."""
+    global tk, ttk, filedialog, messagebox
+    if tk is None:
+        import tkinter
+        import tkinter.ttk
+        from tkinter import filedialog as tk_filedialog, messagebox as tk_messagebox
+        tk, ttk = tkinter, tkinter.ttk
+        filedialog, messagebox = tk_filedialog, tk_messagebox
+
+# ================== ARRANQUE ==================
+
+# Dependencias pesadas que se cargan en segundo plano con la ventana ya visible,
+# para que la primera captura, la cámara o el primer reporte no paguen la importación
+WARMUP_MODULES = ("PIL.Image", "PIL.ImageTk", "PIL.ImageChops", "numpy", "mss", "pyautogui", "cv2")
+# Tiempo máximo (ms) hasta mostrar la ventana en --profile-startup
+STARTUP_BUDGET_MS = 1500
+
+
+class StartupProfiler:
+    """Cronometra las fases del arranque (importaciones, construcción de la interfaz)."""
+
+    def __init__(self):
+        self.timings = []  # (fase, segundos, nota)
+
+    def record(self, name, seconds, note=""):
+        self.timings.append((name, seconds, note))
+
+    def measure(self, name, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def total(self):
+        return sum(seconds for _, seconds, _ in self.timings)
+
+    def report(self):
+        width = max([len(name) for name, _, _ in self.timings] + [10])
+        lines = [f"{'Fase'.ljust(width)}  {'ms':>8}"]
+        for name, seconds, note in self.timings:
+            lines.append(f"{name.ljust(width)}  {seconds * 1000:8.1f}  {note}".rstrip())
+        return "\n".join(lines)
+
+
+def import_timed(name):
+    """Importa un módulo y devuelve (segundos, error); 0 si ya estaba cargado."""
+    if name in sys.modules:
+        return 0.0, None
+    started = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        # Dependencia opcional ausente (o sin pantalla): se importará, y fallará, donde se use
+        return time.perf_counter() - started, e
+    return time.perf_counter() - started, None
+
+
+def warm_up_imports(modules=WARMUP_MODULES, profiler=None):
+    """Precarga las dependencias pesadas; pensado para un hilo en segundo plano."""
+    for name in modules:
+        already_loaded = name in sys.modules
+        seconds, error = import_timed(name)
+        if profiler:
+            note = "no disponible" if error else ("ya cargado" if already_loaded else "")
+            profiler.record(f"import {name}", seconds, note)
 
 # ================== CONFIGURACIÓN DE SEGURIDAD ==================
 
-APP_DIR = os.path.join(os.getenv('APPDATA'), 'SnapMaster')
+# APPDATA solo existe en Windows; en Linux/macOS se usa ~/.config
+APP_DIR = os.path.join(os.getenv('APPDATA') or os.path.expanduser('~/.config'), 'SnapMaster')
 TOKEN_FILE = os.path.join(APP_DIR, 'unlock.token')
 PASSWORD_HASH = hashlib.sha256("123alexyjhenny".encode()).hexdigest()  # 🔑 Cambia aquí tu contraseña
 
@@ -75,49 +165,5335 @@ def ask_password():
     
     result = [False]  
 
-    def check_password():
-        password = pwd_entry.get()
-        if hashlib.sha256(password.encode()).hexdigest() == PASSWORD_HASH:
-            save_token()
-            result[0] = True
-            login_win.destroy()
+    def check_password():
+        password = pwd_entry.get()
+        if hashlib.sha256(password.encode()).hexdigest() == PASSWORD_HASH:
+            save_token()
+            result[0] = True
+            login_win.destroy()
+        else:
+            messagebox.showerror("Error", "Contraseña incorrecta")
+            pwd_entry.delete(0, tk.END)
+
+    tk.Button(login_win, text="Acceder", command=check_password,
+              bg='#0d6efd', fg='white', font=('Arial', 10, 'bold')).pack(pady=10)  
+    
+    # Permitir usar Enter para enviar la contraseña
+    login_win.bind('<Return>', lambda event: check_password())
+    
+    login_win.mainloop()
+    
+    return result[0]
+
+# ================== MÉTRICAS ==================
+
+# Límites superiores (segundos) de los buckets de latencia
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_FORMATS = ("prometheus", "jsonl")
+# Histogramas de las etapas, en orden, con su nombre en la interfaz
+METRIC_STAGES = (("grab", "Captura"), ("encode", "Códec"), ("write", "Escritura"),
+                 ("thumbnail", "Miniatura"), ("report_media", "Imagen Word"),
+                 ("report_append", "Reporte"), ("save", "Guardar Word"), ("convert", "PDF"),
+                 ("upload", "Subida"))
+
+
+class _MetricShard:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self, buckets):
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Histogram:
+    """Histograma de latencias con buckets fijos.
+
+    Cada hilo escribe en su propio fragmento, así que observe() no toma
+    ningún lock; snapshot() suma los fragmentos (puede ir una muestra por
+    detrás, pero nunca frena a los hilos de captura).
+    """
+
+    def __init__(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _MetricShard(len(self.buckets))
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, seconds):
+        shard = self._shard()
+        shard.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        shard.count += 1
+        shard.total += seconds
+        if seconds > shard.max:
+            shard.max = seconds
+
+    def time(self):
+        return _MetricTimer(self)
+
+    def snapshot(self):
+        counts = [0] * (len(self.buckets) + 1)
+        count, total, peak = 0, 0.0, 0.0
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for i, value in enumerate(shard.counts):
+                counts[i] += value
+            count += shard.count
+            total += shard.total
+            peak = max(peak, shard.max)
+        info = {"count": count, "sum": total, "max": peak, "buckets": counts,
+                "mean": total / count if count else 0.0}
+        for p in (50, 95, 99):
+            info[f"p{p}"] = self._quantile(counts, count, peak, p / 100)
+        return info
+
+    def _quantile(self, counts, count, peak, q):
+        """Estimación por interpolación lineal dentro del bucket."""
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, value in enumerate(counts):
+            if value and seen + value >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else peak
+                return min(peak, lower + (upper - lower) * (rank - seen) / value)
+            seen += value
+        return peak
+
+
+class _MetricTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class MetricCounter:
+    """Contador monótono; igual que Histogram, un fragmento por hilo."""
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = [0]
+            with self._lock:
+                self._shards.append(shard)
+        shard[0] += amount
+
+    @property
+    def value(self):
+        with self._lock:
+            return sum(shard[0] for shard in self._shards)
+
+
+class MetricGauge:
+    """Valor instantáneo (profundidad de cola, etc.): set() es una asignación."""
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class MetricsRegistry:
+    """Registro de histogramas, contadores y gauges del proceso."""
+
+    def __init__(self, prefix="snapmaster"):
+        self.prefix = prefix
+        self.started = time.time()
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, cls(name, help_text))
+        return metric
+
+    def histogram(self, name, help_text=""):
+        return self._get(Histogram, name, help_text)
+
+    def counter(self, name, help_text=""):
+        return self._get(MetricCounter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(MetricGauge, name, help_text)
+
+    def time(self, name):
+        """with METRICS.time("encode"): ... registra la duración del bloque."""
+        return self.histogram(name).time()
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {"timestamp": time.time(), "uptime": time.time() - self.started,
+                  "histograms": {}, "counters": {}, "gauges": {}}
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                result["histograms"][metric.name] = metric.snapshot()
+            elif isinstance(metric, MetricCounter):
+                result["counters"][metric.name] = metric.value
+            else:
+                result["gauges"][metric.name] = metric.value
+        return result
+
+    def to_prometheus(self):
+        """Formato de texto de Prometheus (para el textfile collector de node_exporter)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            name = f"{self.prefix}_{metric.name}"
+            if isinstance(metric, Histogram):
+                name += "_seconds"
+                info = metric.snapshot()
+                lines.append(f"# HELP {name} {metric.help_text or metric.name}")
+                lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, value in zip(metric.buckets, info["buckets"]):
+                    cumulative += value
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {info["count"]}')
+                lines.append(f"{name}_sum {info['sum']:.6f}")
+                lines.append(f"{name}_count {info['count']}")
+            else:
+                kind = "counter" if isinstance(metric, MetricCounter) else "gauge"
+                if kind == "counter":
+                    name += "_total"
+                lines.append(f"# HELP {name} {metric.help_text or metric.name}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+for _name, _label in METRIC_STAGES:
+    METRICS.histogram(_name, _label)
+
+
+class MetricsExporter:
+    """Vuelca METRICS a un archivo cada `interval` segundos desde un hilo propio.
+
+    "prometheus" reescribe el archivo de forma atómica (tmp + replace);
+    "jsonl" añade una línea con la instantánea completa en cada vuelco.
+    """
+
+    def __init__(self, path, fmt="prometheus", interval=10.0, registry=None):
+        if fmt not in METRICS_FORMATS:
+            raise ValueError(f"Formato de métricas desconocido: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.interval = max(0.5, float(interval))
+        self.registry = registry or METRICS
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.write()
+
+    def write(self):
+        if self.fmt == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.registry.snapshot()) + "\n")
+        else:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.registry.to_prometheus())
+            os.replace(tmp_path, self.path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"No se pudieron exportar las métricas: {e}", file=sys.stderr)
+
+# ================== BÚFERES DE FRAME ==================
+
+# Los frames se guardan como RGBX (4 bytes por píxel), que es la disposición
+# interna de Pillow para RGB: así una imagen PIL puede apuntar directamente a
+# la memoria del arreglo NumPy sin copiarla.
+FRAME_POOL_FREE = 4
+PREVIEW_SIZE = (500, 350)
+
+
+class FrameBuffer:
+    """Arreglo RGBX (alto, ancho, 4) prestado por un FrameBufferPool.
+
+    image() devuelve una imagen PIL de solo lectura que comparte la memoria
+    del arreglo; deja de ser válida en cuanto se llama a release().
+    """
+
+    __slots__ = ("array", "pool", "_image")
+
+    def __init__(self, array, pool=None):
+        self.array = array
+        self.pool = pool
+        self._image = None
+
+    @property
+    def size(self):
+        height, width = self.array.shape[:2]
+        return width, height
+
+    def image(self):
+        from PIL import Image
+
+        if self._image is None:
+            self._image = Image.frombuffer("RGBX", self.size, self.array, "raw", "RGBX", 0, 1)
+        return self._image
+
+    def release(self):
+        pool, self.pool = self.pool, None
+        self._image = None
+        if pool is not None:
+            pool.release(self)
+
+
+class FrameBufferPool:
+    """Reutiliza los arreglos de los frames en tránsito (captura -> codificador).
+
+    A 4K cada frame ocupa ~33 MB; en vez de reservarlos en cada tick, el
+    backend escribe en un arreglo del pool y el pipeline lo devuelve al
+    terminar de codificar. Se conservan hasta `max_free` arreglos libres por
+    tamaño: con backpressure puede haber más en uso, pero no se retienen.
+    """
+
+    def __init__(self, max_free=FRAME_POOL_FREE):
+        self.max_free = max_free
+        self._free = {}
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    @staticmethod
+    def available():
+        try:
+            import numpy  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, width, height):
+        import numpy as np
+
+        with self._lock:
+            free = self._free.get((width, height))
+            array = free.pop() if free else None
+            if array is None:
+                self.allocated += 1
+            else:
+                self.reused += 1
+        if array is None:
+            METRICS.counter("frame_buffers", "Búferes de frame reservados").inc()
+            # El canal X queda a 255 y los backends solo escriben RGB
+            array = np.full((height, width, 4), 255, dtype=np.uint8)
+        return FrameBuffer(array, self)
+
+    def release(self, buffer):
+        with self._lock:
+            free = self._free.setdefault(buffer.size, [])
+            if len(free) < self.max_free:
+                free.append(buffer.array)
+
+
+def make_thumbnail(image, size=PREVIEW_SIZE):
+    """Miniatura de vista previa sin copiar antes el frame completo.
+
+    reduce() promedia bloques leyendo el original (que puede ser el búfer
+    compartido del pool) y solo reserva la imagen reducida.
+    """
+    factor = max(1, min(image.width // size[0], image.height // size[1]))
+    small = image.reduce(factor) if factor > 1 else image.copy()
+    small.thumbnail(size)
+    return small if small.mode == "RGB" else small.convert("RGB")
+
+# ================== BACKENDS DE CAPTURA ==================
+
+class CaptureBackend:
+    """Interfaz común de captura: grab() devuelve una imagen PIL RGB.
+
+    region=(x, y, ancho, alto) en coordenadas del escritorio virtual captura
+    solo ese rectángulo; monitors() devuelve los rectángulos de los
+    monitores, con el escritorio completo en la posición 0.
+    """
+
+    name = "base"
+
+    @classmethod
+    def available(cls):
+        return False
+
+    def grab(self, region=None):
+        raise NotImplementedError
+
+    def grab_into(self, pool, region=None):
+        """Como grab(), pero escribiendo en un búfer de `pool` si el backend
+        puede. Devuelve (imagen, búfer); búfer es None si no se usó el pool."""
+        return self.grab(region), None
+
+    def monitors(self):
+        width, height = self.grab().size
+        return [(0, 0, width, height)]
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    """Captura con pyautogui (lenta, pero disponible casi siempre)."""
+
+    name = "pyautogui"
+
+    @classmethod
+    def available(cls):
+        try:
+            import pyautogui  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def grab(self, region=None):
+        import pyautogui
+
+        return pyautogui.screenshot(region=region)
+
+    def monitors(self):
+        import pyautogui
+
+        # pyautogui solo conoce el monitor principal
+        width, height = pyautogui.size()
+        return [(0, 0, width, height), (0, 0, width, height)]
+
+
+class MSSBackend(CaptureBackend):
+    """Captura con mss (XShm en Linux, BitBlt en Windows).
+
+    El manejador de mss se crea una vez por hilo y se reutiliza en cada tick
+    (mss no es seguro entre hilos), evitando reabrir la conexión al servidor
+    gráfico en cada captura.
+    """
+
+    name = "mss"
+
+    def __init__(self, monitor=0):
+        # monitor 0 = escritorio virtual completo (igual que pyautogui)
+        self.monitor = monitor
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        try:
+            import mss  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def _handle(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            import mss
+
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._lock:
+                self._handles.append(sct)
+        return sct
+
+    def _shot(self, region):
+        sct = self._handle()
+        if region:
+            left, top, width, height = region
+            area = {"left": left, "top": top, "width": width, "height": height}
+        else:
+            area = sct.monitors[self.monitor]
+        # Solo se copian del servidor gráfico los píxeles de la región
+        return sct.grab(area)
+
+    def grab(self, region=None):
+        from PIL import Image
+
+        shot = self._shot(region)
+        # BGRA -> RGB en una sola pasada, sin copias intermedias
+        return Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+    def grab_into(self, pool, region=None):
+        import numpy as np
+
+        shot = self._shot(region)
+        width, height = shot.size
+        buffer = pool.acquire(width, height)
+        # shot.raw es el bytearray de mss (shot.bgra haría otra copia):
+        # BGRA -> RGB directamente sobre el arreglo del pool
+        source = np.frombuffer(shot.raw, dtype=np.uint8).reshape(height, width, 4)
+        buffer.array[..., :3] = source[..., 2::-1]
+        return buffer.image(), buffer
+
+    def monitors(self):
+        return [(m["left"], m["top"], m["width"], m["height"]) for m in self._handle().monitors]
+
+    def close(self):
+        with self._lock:
+            handles, self._handles = self._handles, []
+        for sct in handles:
+            try:
+                sct.close()
+            except Exception:
+                pass
+
+
+# Tipos de contenido sintético: "ui" (colores planos y texto, como un
+# escritorio), "photo" (degradados con ruido) y "static" (siempre igual).
+SYNTHETIC_CONTENT_TYPES = ("ui", "photo", "static")
+
+
+class SyntheticBackend(CaptureBackend):
+    """Generador determinista de frames para pruebas y benchmarks sin pantalla.
+
+    El frame n depende solo de (seed, n, tamaño, contenido), así que dos
+    ejecuciones producen exactamente los mismos píxeles.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, width=1920, height=1080, content="ui", seed=0, screens=1):
+        if content not in SYNTHETIC_CONTENT_TYPES:
+            raise ValueError(f"Contenido sintético desconocido: {content}")
+        self.width = width
+        self.height = height
+        # Monitores simulados: el ancho se reparte en `screens` columnas
+        self.screens = max(1, screens)
+        self.content = content
+        self.seed = seed
+        self.frame_index = 0
+        self._base = None
+        self._base_array = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        try:
+            import PIL  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def monitors(self):
+        width = self.width // self.screens
+        return [(0, 0, self.width, self.height)] + \
+            [(i * width, 0, width, self.height) for i in range(self.screens)]
+
+    def grab(self, region=None):
+        n = self._next_index()
+        image = self._base.copy()
+        window = self._window(n)
+        if window:
+            x, y, patch = window
+            image.paste(patch, (x, y))
+        if region:
+            left, top, width, height = region
+            return image.crop((left, top, left + width, top + height))
+        return image
+
+    def grab_into(self, pool, region=None):
+        import numpy as np
+
+        left, top, width, height = region or (0, 0, self.width, self.height)
+        if left < 0 or top < 0 or left + width > self.width or top + height > self.height:
+            # Fuera del escritorio crop() rellena con negro; se deja a grab()
+            return self.grab(region), None
+        n = self._next_index()
+        with self._lock:
+            if self._base_array is None:
+                self._base_array = np.asarray(self._base.convert("RGBX"))
+        buffer = pool.acquire(width, height)
+        buffer.array[:] = self._base_array[top:top + height, left:left + width]
+        window = self._window(n)
+        if window:
+            x, y, patch = window
+            # Solo la parte de la ventana que cae dentro de la región
+            x0, y0 = max(x, left), max(y, top)
+            x1, y1 = min(x + patch.width, left + width), min(y + patch.height, top + height)
+            if x0 < x1 and y0 < y1:
+                pixels = np.asarray(patch)[y0 - y:y1 - y, x0 - x:x1 - x]
+                buffer.array[y0 - top:y1 - top, x0 - left:x1 - left, :3] = pixels
+        return buffer.image(), buffer
+
+    def _next_index(self):
+        with self._lock:
+            if self._base is None:
+                self._base = self._render_base()
+            n = self.frame_index
+            self.frame_index += 1
+        return n
+
+    def _window(self, n):
+        """Ventana que se mueve y un contador: (x, y, parche) o None si es estático."""
+        from PIL import Image, ImageDraw
+
+        if self.content == "static":
+            return None
+        rng = random.Random(self.seed * 1000003 + n)
+        box_w, box_h = max(40, self.width // 8), max(30, self.height // 8)
+        x = (n * 37) % max(1, self.width - box_w)
+        y = (n * 23) % max(1, self.height - box_h)
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        patch = Image.new("RGB", (box_w + 1, box_h + 1), color)
+        ImageDraw.Draw(patch).text((10, 10), f"frame {n}", fill=(0, 0, 0))
+        return x, y, patch
+
+    def _render_base(self):
+        from PIL import Image, ImageDraw
+
+        rng = random.Random(self.seed)
+        w, h = self.width, self.height
+        if self.content == "photo":
+            small = Image.frombytes("RGB", (max(1, w // 16), max(1, h // 16)),
+                                    bytes(rng.randrange(256) for _ in range(max(1, w // 16) * max(1, h // 16) * 3)))
+            image = small.resize((w, h), Image.BICUBIC)
+            noise = Image.frombytes("L", (w, h), rng.randbytes(w * h))
+            return Image.merge("RGB", [Image.blend(band, noise, 0.15) for band in image.split()])
+        image = Image.new("RGB", (w, h), (236, 239, 241))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, h - 40, w, h), fill=(32, 33, 36))
+        for i in range(12):
+            x0, y0 = rng.randrange(w // 2), rng.randrange(h // 2)
+            x1, y1 = x0 + rng.randrange(w // 6, w // 2), y0 + rng.randrange(h // 6, h // 2)
+            draw.rectangle((x0, y0, x1, y1), fill=(255, 255, 255), outline=(160, 160, 160))
+            draw.rectangle((x0, y0, x1, y0 + 28), fill=(rng.randrange(40, 200), 90, 160))
+            for line in range(y0 + 40, min(y1, h) - 10, 18):
+                draw.text((x0 + 10, line), "Lorem ipsum dolor sit amet " * 2, fill=(60, 60, 60))
+        return image
+
+
+CAPTURE_BACKENDS = {
+    "mss": MSSBackend,
+    "pyautogui": PyAutoGUIBackend,
+    "synthetic": SyntheticBackend,
+}
+
+
+class CaptureManager:
+    """Elige y mantiene el backend de captura.
+
+    Sin preferencia explícita (argumento o variable SNAPMASTER_BACKEND) se
+    cronometra una captura de cada backend real disponible y se queda el más
+    rápido. El sintético solo se usa si se pide, para no ocultar un fallo de
+    captura real con imágenes falsas.
+    """
+
+    PREFERENCE = ("mss", "pyautogui")
+
+    def __init__(self, backend=None):
+        self.probe_times = {}
+        if backend is None:
+            backend = os.getenv("SNAPMASTER_BACKEND") or None
+        if isinstance(backend, CaptureBackend):
+            self.backend = backend
+        elif backend:
+            if backend not in CAPTURE_BACKENDS:
+                raise ValueError(f"Backend de captura desconocido: {backend}")
+            self.backend = CAPTURE_BACKENDS[backend]()
+        else:
+            self.backend = self.select_fastest()
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def select_fastest(self):
+        best = None
+        errors = []
+        for name in self.PREFERENCE:
+            cls = CAPTURE_BACKENDS[name]
+            if not cls.available():
+                continue
+            candidate = cls()
+            try:
+                start = time.perf_counter()
+                candidate.grab()
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                candidate.close()
+                continue
+            self.probe_times[name] = elapsed
+            if best is None or elapsed < self.probe_times[best.name]:
+                if best:
+                    best.close()
+                best = candidate
+            else:
+                candidate.close()
+        if best is None:
+            detail = "; ".join(errors) or "instale mss o pyautogui"
+            raise RuntimeError(f"No hay backend de captura disponible ({detail})")
+        return best
+
+    def grab(self, region=None):
+        return self.backend.grab(region)
+
+    def grab_into(self, pool, region=None):
+        """(imagen, búfer): con pool=None o sin soporte del backend, búfer es None."""
+        if pool is None:
+            return self.backend.grab(region), None
+        return self.backend.grab_into(pool, region)
+
+    def monitors(self):
+        return self.backend.monitors()
+
+    def monitor_rect(self, index):
+        """Rectángulo (x, y, ancho, alto) del monitor `index` (0 = todos)."""
+        monitors = self.monitors()
+        if not 0 <= index < len(monitors):
+            raise ValueError(f"El monitor {index} no existe (hay {len(monitors) - 1})")
+        return monitors[index]
+
+    def close(self):
+        self.backend.close()
+
+# ================== CÓDECS DE IMAGEN ==================
+
+# Preajustes por formato y perfil. Los parámetros van directos a Image.save().
+# En capturas de interfaz el PNG pasa casi todo el tiempo filtrando filas:
+# subir de nivel 4 apenas reduce tamaño y duplica el tiempo.
+CODEC_FORMATS = {
+    "PNG": ("PNG", ".png"),
+    "JPG": ("JPEG", ".jpg"),
+    "WEBP": ("WEBP", ".webp"),
+    "WEBP_LL": ("WEBP", ".webp"),
+}
+CODEC_PROFILES = ("fast", "balanced", "small")
+CODEC_PRESETS = {
+    "PNG": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 4},
+        "small": {"compress_level": 9, "optimize": True},
+    },
+    "JPG": {
+        "fast": {"quality": 75, "subsampling": "4:2:0"},
+        "balanced": {"quality": 85, "subsampling": "4:2:0", "optimize": True},
+        "small": {"quality": 70, "subsampling": "4:2:0", "optimize": True, "progressive": True},
+    },
+    "WEBP": {
+        "fast": {"quality": 75, "method": 0},
+        "balanced": {"quality": 80, "method": 4},
+        "small": {"quality": 70, "method": 6},
+    },
+    "WEBP_LL": {
+        "fast": {"lossless": True, "quality": 0, "method": 0},
+        "balanced": {"lossless": True, "quality": 25, "method": 1},
+        "small": {"lossless": True, "quality": 75, "method": 4},
+    },
+}
+# Fracción de colores distintos (muestreo sin interpolar) por debajo de la
+# cual una captura se considera de interfaz plana y no fotográfica.
+FLAT_CONTENT_COLOR_RATIO = 0.08
+
+
+def image_content_stats(image, sample_width=256):
+    """Estadísticas baratas de contenido sobre una muestra sin interpolar."""
+    from PIL import Image
+
+    width = min(sample_width, image.width)
+    height = max(1, image.height * width // max(1, image.width))
+    # NEAREST conserva los colores originales (un remuestreo los mezclaría);
+    # se convierte la muestra, no la imagen completa
+    sample = image.resize((width, height), Image.NEAREST)
+    if sample.mode != "RGB":
+        sample = sample.convert("RGB")
+    pixels = width * height
+    colors = sample.getcolors(maxcolors=pixels)
+    distinct = len(colors) if colors else pixels
+    ratio = distinct / pixels
+    return {"colors": distinct, "color_ratio": ratio, "flat": ratio < FLAT_CONTENT_COLOR_RATIO}
+
+
+class CodecEngine:
+    """Codificación de capturas con preajustes y modo automático.
+
+    Con codec="AUTO" cada frame se clasifica (interfaz plana o contenido
+    fotográfico) y se codifica como PNG o JPG; el nivel de PNG y la calidad
+    de JPG se ajustan con medias móviles del tiempo de codificación y del
+    tamaño obtenidos, para acercarse a `target_ms` y/o `target_kb`.
+    """
+
+    def __init__(self, codec="PNG", profile="balanced", target_ms=None, target_kb=None):
+        if codec != "AUTO" and codec not in CODEC_FORMATS:
+            raise ValueError(f"Códec desconocido: {codec}")
+        if profile not in CODEC_PROFILES:
+            raise ValueError(f"Perfil de códec desconocido: {profile}")
+        self.codec = codec
+        self.profile = profile
+        self.target_ms = target_ms
+        self.target_kb = target_kb
+        self.png_level = CODEC_PRESETS["PNG"][profile]["compress_level"]
+        self.jpeg_quality = CODEC_PRESETS["JPG"][profile]["quality"]
+        self._lock = threading.Lock()
+        # codec -> [frames, media ms, media KB]
+        self.stats = {}
+
+    def choose(self, image):
+        """Devuelve (códec, parámetros de save) para esta imagen."""
+        codec = self.codec
+        if codec == "AUTO":
+            codec = "PNG" if image_content_stats(image)["flat"] else "JPG"
+        params = dict(CODEC_PRESETS[codec][self.profile])
+        if self.codec == "AUTO":
+            with self._lock:
+                if codec == "PNG":
+                    params["compress_level"] = self.png_level
+                else:
+                    params["quality"] = self.jpeg_quality
+        return codec, params
+
+    def extension_for(self, codec):
+        return CODEC_FORMATS[codec][1]
+
+    def encode(self, image, base_path, unique_path=None):
+        """Codifica y guarda la imagen. Devuelve (ruta, códec, bytes, hash).
+
+        `unique_path(base, extension)` permite al llamador resolver colisiones
+        de nombre una vez conocida la extensión del códec elegido.
+        """
+        codec, extension, data = self.encode_bytes(image)
+        path = unique_path(base_path, extension) if unique_path else base_path + extension
+        with METRICS.time("write"):
+            with open(path, "wb") as f:
+                f.write(data)
+        METRICS.counter("bytes_written", "Bytes de imagen escritos").inc(len(data))
+        return path, codec, len(data), hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def encode_bytes(self, image):
+        """Codifica en memoria. Devuelve (códec, extensión, datos)."""
+        codec, params = self.choose(image)
+        pil_format, extension = CODEC_FORMATS[codec]
+        if pil_format == "PNG" and image.mode == "RGBX":
+            # El PNG no admite RGBX; JPEG y WebP lo leen directamente del búfer
+            image = image.convert("RGB")
+        elif pil_format == "JPEG" and image.mode not in ("RGB", "RGBX"):
+            image = image.convert("RGB")
+        # Se codifica en memoria para medir por separado el códec y el disco
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        image.save(buffer, format=pil_format, **params)
+        elapsed = time.perf_counter() - start
+        METRICS.histogram("encode").observe(elapsed)
+        data = buffer.getbuffer()
+        self._feedback(codec, elapsed * 1000, len(data) / 1024)
+        return codec, extension, data
+
+    def _feedback(self, codec, elapsed_ms, size_kb, alpha=0.2):
+        with self._lock:
+            entry = self.stats.setdefault(codec, [0, elapsed_ms, size_kb])
+            entry[0] += 1
+            entry[1] += alpha * (elapsed_ms - entry[1])
+            entry[2] += alpha * (size_kb - entry[2])
+            if self.codec != "AUTO":
+                return
+            avg_ms, avg_kb = entry[1], entry[2]
+            if codec == "PNG":
+                if self.target_ms and avg_ms > self.target_ms * 1.1:
+                    self.png_level = max(1, self.png_level - 1)
+                elif self.target_kb and avg_kb > self.target_kb * 1.1 and \
+                        (not self.target_ms or avg_ms < self.target_ms * 0.6):
+                    self.png_level = min(9, self.png_level + 1)
+            else:
+                if self.target_kb and avg_kb > self.target_kb * 1.1:
+                    self.jpeg_quality = max(40, self.jpeg_quality - 5)
+                elif self.target_kb and avg_kb < self.target_kb * 0.7:
+                    self.jpeg_quality = min(95, self.jpeg_quality + 2)
+
+# ================== SESIÓN DE VÍDEO (TIMELAPSE) ==================
+
+# Preferencia de códec: H.264 si el OpenCV instalado lo trae, si no MPEG-4.
+# Ambos comprimen entre frames, que es donde está el ahorro con pantallas
+# casi idénticas.
+TIMELAPSE_FOURCCS = ("avc1", "mp4v")
+TIMELAPSE_INDEX_SUFFIX = ".index.jsonl"
+
+
+class TimelapseSession:
+    """Sesión de capturas codificada en un único vídeo.
+
+    Junto al vídeo se escribe un índice JSON-lines (frame, marca de tiempo,
+    número de captura) para poder localizar y exportar cualquier captura sin
+    tener miles de archivos sueltos. write() debe llamarse siempre desde el
+    mismo hilo y en orden (la etapa de reporte del pipeline).
+    """
+
+    def __init__(self, path, fps=10.0):
+        self.path = path
+        self.index_path = path + TIMELAPSE_INDEX_SUFFIX
+        self.fps = fps
+        self.frame_size = None
+        self.frames = 0
+        self._writer = None
+        self._index = open(self.index_path, "a", encoding="utf-8")
+
+    @staticmethod
+    def to_bgr(image):
+        """Imagen PIL o arreglo RGBX de un FrameBuffer -> arreglo BGR para OpenCV
+        (se puede hacer en paralelo)."""
+        import cv2
+        import numpy as np
+
+        if isinstance(image, np.ndarray):
+            return cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+
+    def write(self, frame_bgr, timestamp, seq=None):
+        """Añade un frame al vídeo. Devuelve su número de frame."""
+        import cv2
+
+        height, width = frame_bgr.shape[:2]
+        if self._writer is None:
+            self.frame_size = (width, height)
+            self._writer = self._open_writer(self.frame_size)
+        if (width, height) != self.frame_size:
+            frame_bgr = cv2.resize(frame_bgr, self.frame_size, interpolation=cv2.INTER_AREA)
+        self._writer.write(frame_bgr)
+        number = self.frames
+        self.frames += 1
+        self._index.write(json.dumps({"frame": number, "time": timestamp.isoformat(), "seq": seq}) + "\n")
+        self._index.flush()
+        return number
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        if not self._index.closed:
+            self._index.close()
+
+    def _open_writer(self, size):
+        import cv2
+
+        for fourcc in TIMELAPSE_FOURCCS:
+            writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*fourcc), self.fps, size)
+            if writer.isOpened():
+                return writer
+            writer.release()
+        raise RuntimeError("OpenCV no puede escribir vídeo en este equipo")
+
+
+class TimelapseReader:
+    """Acceso a los frames de una sesión de vídeo a través de su índice."""
+
+    def __init__(self, path):
+        self.path = path
+        self.times = []
+        self.seqs = []
+        with open(path + TIMELAPSE_INDEX_SUFFIX, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.times.append(datetime.fromisoformat(entry["time"]))
+                self.seqs.append(entry.get("seq"))
+        self._capture = None
+        self._position = None
+
+    def __len__(self):
+        return len(self.times)
+
+    def find_frame(self, when):
+        """Frame más cercano a un datetime (búsqueda binaria en el índice)."""
+        if not self.times:
+            raise ValueError("La sesión no tiene frames")
+        i = bisect.bisect_left(self.times, when)
+        if i == len(self.times) or (i > 0 and when - self.times[i - 1] < self.times[i] - when):
+            i -= 1
+        return i
+
+    def frames_between(self, start, end):
+        return range(bisect.bisect_left(self.times, start), bisect.bisect_right(self.times, end))
+
+    def frame(self, number):
+        """Decodifica un frame como imagen PIL."""
+        import cv2
+        from PIL import Image
+
+        if self._capture is None:
+            self._capture = cv2.VideoCapture(self.path)
+        # Lectura secuencial si es el siguiente; si no, salto al frame
+        if self._position != number:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, number)
+        ok, bgr = self._capture.read()
+        if not ok:
+            raise IndexError(f"Frame {number} fuera del vídeo")
+        self._position = number + 1
+        return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+
+    def export_frame(self, number, path):
+        self.frame(number).save(path)
+        return path
+
+    def export_report(self, docx_path, numbers, title="Capturas exportadas de vídeo"):
+        """Genera un Word con los frames pedidos (en el orden dado)."""
+        writer = StreamingReportWriter(docx_path)
+        writer.add_heading(title, 0)
+        writer.add_paragraph(f'Vídeo: {os.path.basename(self.path)}')
+        for number in numbers:
+            image = self.frame(number)
+            seq = self.seqs[number]
+            label = f'Captura #{seq}' if seq is not None else f'Frame {number}'
+            writer.add_heading(f'{label} - {self.times[number].strftime("%Y%m%d_%H%M%S")}', level=1)
+            media_path, media_size = writer.embedder.prepare(image)
+            writer.add_picture(media_path, size=media_size)
+        return writer.finalize()
+
+    def parse_selection(self, text):
+        """'5, 10-12, 14:30:00' -> números de frame (horas = frame más cercano)."""
+        numbers = []
+        for item in text.replace(";", ",").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if ":" in item:
+                day = self.times[0].date() if self.times else datetime.now().date()
+                when = datetime.combine(day, datetime.strptime(item, "%H:%M:%S").time())
+                numbers.append(self.find_frame(when))
+            elif "-" in item:
+                first, last = (int(x) for x in item.split("-", 1))
+                numbers.extend(range(first, last + 1))
+            else:
+                numbers.append(int(item))
+        return [n for n in numbers if 0 <= n < len(self)]
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+# ================== ARCHIVO DE SESIÓN ==================
+
+# Contenedor de un solo archivo, solo de anexado:
+#   cabecera "SNAPARC\x01" y registros seguidos, cada uno con
+#   <etiqueta(4) | largo de metadatos(4) | largo de datos(8) | crc32(4)>,
+#   los metadatos en JSON y los datos (la imagen ya codificada).
+# El índice lateral (.idx) tiene una entrada de 16 bytes por frame:
+#   <desplazamiento del registro(8) | hora unix(8, double)>.
+# Se escribe el registro y después su entrada: tras un corte, un índice
+# corto o ausente se completa recorriendo los registros, y un último
+# registro a medias se ignora (el CRC no cuadra o falta el final).
+ARCHIVE_EXTENSION = ".snaparc"
+ARCHIVE_INDEX_SUFFIX = ".idx"
+ARCHIVE_MAGIC = b"SNAPARC\x01"
+ARCHIVE_INDEX_MAGIC = b"SNAPIDX\x01"
+_ARCHIVE_RECORD = struct.Struct("<4sIQI")
+_ARCHIVE_ENTRY = struct.Struct("<Qd")
+ARCHIVE_FRAME = b"FRME"
+ARCHIVE_META = b"META"
+
+
+class SessionArchiveWriter:
+    """Escribe una sesión como un único archivo .snaparc (más su índice .idx).
+
+    append() se llama desde un solo hilo (la etapa de reporte), en orden de
+    captura; cada registro se vuelca al sistema operativo al escribirlo y
+    close() hace fsync de ambos archivos.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.index_path = path + ARCHIVE_INDEX_SUFFIX
+        self._file = open(path, "xb")
+        self._index = open(self.index_path, "wb")
+        self._file.write(ARCHIVE_MAGIC)
+        self._index.write(ARCHIVE_INDEX_MAGIC)
+        self._offset = len(ARCHIVE_MAGIC)
+        self.frames = 0
+        self.bytes = 0
+        if metadata:
+            self._write_record(ARCHIVE_META, metadata, b"")
+        self._file.flush()
+        self._index.flush()
+
+    def _write_record(self, tag, metadata, data):
+        meta = json.dumps(metadata, default=str).encode("utf-8")
+        crc = zlib.crc32(data, zlib.crc32(meta))
+        offset = self._offset
+        self._file.write(_ARCHIVE_RECORD.pack(tag, len(meta), len(data), crc))
+        self._file.write(meta)
+        self._file.write(data)
+        self._offset += _ARCHIVE_RECORD.size + len(meta) + len(data)
+        return offset
+
+    def append(self, name, data, timestamp, **metadata):
+        """Añade un frame codificado. Devuelve su número dentro del archivo."""
+        metadata.update(name=name, time=timestamp.isoformat())
+        offset = self._write_record(ARCHIVE_FRAME, metadata, data)
+        # El registro llega al disco antes que su entrada del índice
+        self._file.flush()
+        self._index.write(_ARCHIVE_ENTRY.pack(offset, timestamp.timestamp()))
+        self._index.flush()
+        self.bytes += len(data)
+        number = self.frames
+        self.frames += 1
+        return number
+
+    def close(self):
+        for f in (self._file, self._index):
+            if not f.closed:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+
+class SessionArchiveReader:
+    """Acceso aleatorio a los frames de un .snaparc mediante mmap.
+
+    Usa el índice lateral si existe y lo completa recorriendo los registros
+    que falten, así que abre archivos truncados por un corte (el último frame
+    a medias se descarta). frame_bytes() devuelve una vista sin copia del
+    archivo mapeado.
+    """
+
+    def __init__(self, path):
+        import mmap
+
+        self.path = path
+        self.metadata = {}
+        self.offsets = []
+        self.times = []
+        self.truncated = False
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(ARCHIVE_MAGIC):
+            self._file.close()
+            raise ValueError(f"{os.path.basename(path)} no es un archivo de sesión")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            self.close()
+            raise ValueError(f"{os.path.basename(path)} no es un archivo de sesión")
+        position = self._load_index()
+        self._scan(position)
+
+    def _load_index(self):
+        """Carga las entradas válidas del .idx; devuelve dónde seguir recorriendo."""
+        position = len(ARCHIVE_MAGIC)
+        try:
+            with open(self.path + ARCHIVE_INDEX_SUFFIX, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return position
+        if data[:len(ARCHIVE_INDEX_MAGIC)] != ARCHIVE_INDEX_MAGIC:
+            return position
+        start = len(ARCHIVE_INDEX_MAGIC)
+        count = (len(data) - start) // _ARCHIVE_ENTRY.size
+        for offset, stamp in _ARCHIVE_ENTRY.iter_unpack(data[start:start + count * _ARCHIVE_ENTRY.size]):
+            record = self._record(offset)
+            if record is None or record[0] != ARCHIVE_FRAME or offset < position:
+                break
+            self.offsets.append(offset)
+            self.times.append(datetime.fromtimestamp(stamp))
+            position = record[3]
+        return position
+
+    def _record(self, offset, verify=False):
+        """(etiqueta, inicio de metadatos, inicio de datos, fin) o None si está incompleto."""
+        header_end = offset + _ARCHIVE_RECORD.size
+        if header_end > len(self._map):
+            return None
+        tag, meta_length, data_length, crc = _ARCHIVE_RECORD.unpack_from(self._map, offset)
+        data_start = header_end + meta_length
+        end = data_start + data_length
+        if tag not in (ARCHIVE_FRAME, ARCHIVE_META) or end > len(self._map):
+            return None
+        if verify:
+            view = memoryview(self._map)
+            try:
+                if zlib.crc32(view[data_start:end], zlib.crc32(view[header_end:data_start])) != crc:
+                    return None
+            finally:
+                view.release()
+        return tag, header_end, data_start, end
+
+    def _scan(self, position):
+        # Registros sin entrada en el índice: se validan con su CRC
+        while position < len(self._map):
+            record = self._record(position, verify=True)
+            if record is None:
+                self.truncated = True
+                break
+            tag, meta_start, data_start, end = record
+            meta = json.loads(self._map[meta_start:data_start])
+            if tag == ARCHIVE_META:
+                self.metadata.update(meta)
+            else:
+                self.offsets.append(position)
+                self.times.append(datetime.fromisoformat(meta["time"]))
+            position = end
+        if not self.metadata and len(self._map) > len(ARCHIVE_MAGIC):
+            record = self._record(len(ARCHIVE_MAGIC))
+            if record and record[0] == ARCHIVE_META:
+                self.metadata = json.loads(self._map[record[1]:record[2]])
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def info(self, number):
+        """Metadatos de un frame (nombre, hora, códec, tamaño, hash...)."""
+        _, meta_start, data_start, _ = self._record(self.offsets[number])
+        return json.loads(self._map[meta_start:data_start])
+
+    def frame_bytes(self, number):
+        """Imagen codificada del frame como memoryview del archivo mapeado."""
+        _, _, data_start, end = self._record(self.offsets[number])
+        return memoryview(self._map)[data_start:end]
+
+    def frame(self, number):
+        """Decodifica un frame como imagen PIL."""
+        from PIL import Image
+
+        with self.frame_bytes(number) as data:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        return image
+
+    # Mismo índice por hora (y la misma sintaxis de selección) que el vídeo
+    find_frame = TimelapseReader.find_frame
+    frames_between = TimelapseReader.frames_between
+    parse_selection = TimelapseReader.parse_selection
+
+    def verify(self):
+        """Números de los frames cuyo CRC no cuadra."""
+        return [number for number, offset in enumerate(self.offsets)
+                if self._record(offset, verify=True) is None]
+
+    def export(self, folder, numbers=None, report=None, progress=None):
+        """Escribe los frames como archivos sueltos (con su nombre original) y,
+        con report=ruta .docx, el Word correspondiente. Devuelve las rutas."""
+        os.makedirs(folder, exist_ok=True)
+        numbers = range(len(self)) if numbers is None else numbers
+        items = []
+        for done, number in enumerate(numbers, 1):
+            name = os.path.basename(self.info(number)["name"])
+            path = get_unique_filename(os.path.join(folder, os.path.splitext(name)[0]), os.path.splitext(name)[1])
+            with self.frame_bytes(number) as data, open(path, "wb") as f:
+                f.write(data)
+            stamp = self.times[number].timestamp()
+            os.utime(path, (stamp, stamp))
+            items.append((path, self.times[number]))
+            if progress:
+                progress(done, len(numbers))
+        if report and items:
+            BatchReportBuilder(report).build(items, source=self.path)
+        return [path for path, _ in items]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ================== PIPELINE DE CAPTURA ==================
+
+# Políticas cuando la cola entre captura y codificación está llena:
+#  - block: la etapa de captura espera a que haya sitio
+#  - drop_oldest: se descarta el frame más antiguo en cola (el nuevo entra)
+#  - drop_newest: se descarta el frame recién capturado
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "drop_newest")
+PIPELINE_QUEUE_SIZE = 8
+PIPELINE_WORKERS = max(2, min(4, os.cpu_count() or 2))
+
+
+class CaptureFrame:
+    """Captura en tránsito por el pipeline: imagen y metadatos."""
+
+    def __init__(self, seq, image, timestamp, buffer=None):
+        self.seq = seq
+        self.image = image
+        self.buffer = buffer
+        self.timestamp = timestamp
+        self.filepath = None
+        self.thumbnail = None
+        self.size = None
+        self.codec = None
+        self.bytes = None
+        self.digest = None
+        self.report_media = None
+        self.video_frame = None
+        self.video_number = None
+        # (nombre, datos) codificados a la espera de anexarse al archivo de sesión
+        self.encoded = None
+        self.target = None
+        self.unchanged = False
+
+    def release(self):
+        """Devuelve el búfer al pool; la imagen deja de ser válida."""
+        buffer, self.buffer = self.buffer, None
+        self.image = None
+        if buffer is not None:
+            buffer.release()
+
+
+class CapturePipeline:
+    """Pipeline por etapas: captura -> cola acotada -> codificadores -> reporte.
+
+    submit() se llama desde el hilo de captura y nunca espera por disco ni
+    códec (salvo con la política "block"). Un pool de hilos ejecuta
+    `encode(frame)` en paralelo y un único hilo ejecuta `commit(frame)` en el
+    mismo orden en que los frames salieron de la cola, para que el reporte
+    conserve el orden de captura. on_drop(frame) recibe cada frame que el
+    pipeline descarta sin procesar (para liberar su búfer).
+    """
+
+    def __init__(self, encode, commit, workers=PIPELINE_WORKERS,
+                 queue_size=PIPELINE_QUEUE_SIZE, policy="drop_oldest", on_error=None, on_drop=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Política de contrapresión desconocida: {policy}")
+        self.encode = encode
+        self.commit = commit
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.on_error = on_error
+        self.on_drop = on_drop
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._results = {}
+        self._next_ticket = 0
+        self._next_commit = 0
+        self._closed = False
+        self._threads = []
+        self._commit_thread = None
+
+        self.submitted = 0
+        self.dropped = 0
+        self.encoded = 0
+        self.committed = 0
+        self.failed = 0
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"encoder-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._commit_thread = threading.Thread(target=self._commit_loop, name="report", daemon=True)
+        self._commit_thread.start()
+
+    def submit(self, frame):
+        """Encola un frame. Devuelve False si el frame nuevo fue descartado."""
+        with self._cond:
+            if self._closed:
+                self._drop(frame)
+                return False
+            self.submitted += 1
+            if len(self._queue) >= self.queue_size:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    self._drop(frame)
+                    return False
+                if self.policy == "drop_oldest":
+                    self._drop(self._queue.popleft())
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.queue_size and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        self._drop(frame)
+                        return False
+            self._queue.append(frame)
+            self._cond.notify_all()
+            return True
+
+    def _drop(self, frame):
+        if self.on_drop:
+            try:
+                self.on_drop(frame)
+            except Exception:
+                pass
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue) + (self._next_ticket - self._next_commit)
+
+    def stop(self, drain=True, timeout=None):
+        """Cierra la entrada; con drain=True procesa lo que quede en cola."""
+        with self._cond:
+            self._closed = True
+            if not drain:
+                self.dropped += len(self._queue)
+                for frame in self._queue:
+                    self._drop(frame)
+                self._queue.clear()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        if self._commit_thread:
+            self._commit_thread.join(timeout)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                frame = self._queue.popleft()
+                ticket = self._next_ticket
+                self._next_ticket += 1
+                self._cond.notify_all()
+            ok = True
+            try:
+                self.encode(frame)
+            except Exception as e:
+                ok = False
+                self._report_error(frame, e)
+            with self._cond:
+                if ok:
+                    self.encoded += 1
+                else:
+                    self.failed += 1
+                self._results[ticket] = frame if ok else None
+                self._cond.notify_all()
+
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                while self._next_commit not in self._results:
+                    workers_done = self._closed and not self._queue and \
+                        self._next_commit >= self._next_ticket
+                    if workers_done:
+                        return
+                    self._cond.wait()
+                frame = self._results.pop(self._next_commit)
+                self._next_commit += 1
+                self._cond.notify_all()
+            if frame is None:
+                continue
+            try:
+                self.commit(frame)
+                with self._cond:
+                    self.committed += 1
+            except Exception as e:
+                with self._cond:
+                    self.failed += 1
+                self._report_error(frame, e)
+
+    def _report_error(self, frame, error):
+        if self.on_error:
+            try:
+                self.on_error(frame, error)
+            except Exception:
+                pass
+
+# ================== PLANIFICADOR DE CAPTURA ==================
+
+# Qué hacer cuando al despertar ya venció también el tick siguiente:
+#  - catch_up: se disparan todos los ticks atrasados, uno tras otro
+#  - skip: se descartan los atrasados y se espera al próximo tick alineado
+#  - coalesce: se dispara uno solo en representación de todos los atrasados
+MISSED_TICK_POLICIES = ("catch_up", "skip", "coalesce")
+MIN_CAPTURE_INTERVAL = 0.1
+
+
+class CaptureTick:
+    """Un disparo del planificador."""
+
+    def __init__(self, index, deadline, fired_at, wall_time, lateness, merged=1, reason="timer"):
+        self.index = index
+        self.deadline = deadline
+        self.fired_at = fired_at
+        self.wall_time = wall_time
+        self.lateness = lateness
+        self.merged = merged
+        # Motivo del disparo: "timer" o el de ActivityScheduler (input, heartbeat...)
+        self.reason = reason
+
+
+class CaptureScheduler:
+    """Planificador sin deriva basado en reloj monotónico.
+
+    El tick k vence en `inicio + k * intervalo`, independientemente de cuánto
+    tarde cada captura, así que el periodo real no acumula error. Los tiempos
+    de pared se derivan del reloj monotónico para que un ajuste del reloj del
+    sistema no desordene las marcas de tiempo de la sesión.
+    """
+
+    def __init__(self, interval, policy="skip", align_to_wall=True,
+                 clock=time.monotonic, wall_clock=time.time):
+        if policy not in MISSED_TICK_POLICIES:
+            raise ValueError(f"Política de ticks perdidos desconocida: {policy}")
+        self.interval = max(MIN_CAPTURE_INTERVAL, float(interval))
+        self.policy = policy
+        self.align_to_wall = align_to_wall
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self._stop = threading.Event()
+        self._index = 0
+        self._mono_anchor = None
+        self._wall_anchor = None
+
+        self.ticks = 0
+        self.missed = 0
+        self.max_lateness = 0.0
+        self._lateness_mean = 0.0
+        self._lateness_m2 = 0.0
+
+    def start(self):
+        now = self.clock()
+        wall = self.wall_clock()
+        self._wall_anchor = wall - now
+        first = now
+        if self.align_to_wall:
+            # Primer tick en el próximo múltiplo del intervalo en hora de pared
+            # (p. ej. :00, :05, :10 con 5 s) para que las capturas cuadren
+            # con los registros de auditoría.
+            offset = wall % self.interval
+            if offset > 1e-6:
+                first = now + (self.interval - offset)
+        self._mono_anchor = first
+        self._index = 0
+        self._stop.clear()
+
+    def stop(self):
+        self._stop.set()
+
+    def stopped(self):
+        return self._stop.is_set()
+
+    def wall_time(self, mono=None):
+        """Convierte un instante monotónico en datetime de pared."""
+        if mono is None:
+            mono = self.clock()
+        return datetime.fromtimestamp(self._wall_anchor + mono)
+
+    def wait_next(self):
+        """Bloquea hasta el próximo tick. Devuelve None si se detuvo."""
+        if self._mono_anchor is None:
+            self.start()
+        while True:
+            deadline = self._mono_anchor + self._index * self.interval
+            remaining = deadline - self.clock()
+            if remaining > 0 and self._stop.wait(remaining):
+                return None
+            if self._stop.is_set():
+                return None
+
+            now = self.clock()
+            behind = int((now - deadline) // self.interval)
+            merged = 1
+            if behind >= 1 and self.policy == "skip":
+                self.missed += behind + 1
+                self._index += behind + 1
+                continue
+            if behind >= 1 and self.policy == "coalesce":
+                self.missed += behind
+                merged = behind + 1
+                self._index += behind
+                deadline = self._mono_anchor + self._index * self.interval
+
+            index = self._index
+            self._index += 1
+            lateness = now - deadline
+            self._record(lateness)
+            return CaptureTick(index, deadline, now, self.wall_time(now), lateness, merged)
+
+    def _record(self, lateness):
+        # Media y varianza incrementales (Welford): memoria constante
+        self.ticks += 1
+        delta = lateness - self._lateness_mean
+        self._lateness_mean += delta / self.ticks
+        self._lateness_m2 += delta * (lateness - self._lateness_mean)
+        self.max_lateness = max(self.max_lateness, lateness)
+
+    def stats(self):
+        """Retraso medio/máximo y jitter (desviación típica) en segundos."""
+        jitter = (self._lateness_m2 / (self.ticks - 1)) ** 0.5 if self.ticks > 1 else 0.0
+        return {
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "mean_lateness": self._lateness_mean,
+            "max_lateness": self.max_lateness,
+            "jitter": jitter,
+        }
+
+# ================== DETECCIÓN DE CAMBIOS ==================
+
+# - diff: diferencia por píxel sobre una versión reducida en escala de grises;
+#   el umbral es la fracción de píxeles que cambiaron más que la tolerancia.
+# - phash: hash de diferencias (dHash) de 64 bits; el umbral es la fracción
+#   de bits distintos (distancia de Hamming / 64).
+CHANGE_DETECTION_MODES = ("diff", "phash")
+
+
+class ChangeDetector:
+    """Filtro barato delante del codificador para descartar pantallas iguales.
+
+    Compara cada captura con la última aceptada (no con la anterior), así un
+    cambio lento y progresivo termina superando el umbral.
+    """
+
+    def __init__(self, threshold=0.005, mode="diff", size=(64, 36), pixel_tolerance=12,
+                 keepalive=None):
+        if mode not in CHANGE_DETECTION_MODES:
+            raise ValueError(f"Modo de detección desconocido: {mode}")
+        self.threshold = threshold
+        self.mode = mode
+        self.size = size
+        self.pixel_tolerance = pixel_tolerance
+        # Segundos tras los que se acepta una captura aunque no haya cambios
+        self.keepalive = keepalive
+        self._lut = [0] * (pixel_tolerance + 1) + [255] * (255 - pixel_tolerance)
+        self._reference = None
+        self._reference_time = None
+
+        self.checked = 0
+        self.unchanged = 0
+
+    def reset(self):
+        self._reference = None
+        self._reference_time = None
+
+    def has_changed(self, image, now=None):
+        """True si la imagen difiere de la última aceptada (y pasa a serlo)."""
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        signature = self.signature(image)
+        if self._reference is None:
+            changed = True
+        elif self.keepalive is not None and now - self._reference_time >= self.keepalive:
+            changed = True
+        else:
+            changed = self.distance(self._reference, signature) > self.threshold
+        if changed:
+            self._reference = signature
+            self._reference_time = now
+        else:
+            self.unchanged += 1
+        return changed
+
+    def distance(self, a, b):
+        """Distancia normalizada (0..1) entre dos firmas."""
+        if self.mode == "phash":
+            return bin(a ^ b).count("1") / 64
+        from PIL import ImageChops
+
+        mask = ImageChops.difference(a, b).point(self._lut)
+        width, height = self.size
+        return mask.histogram()[255] / (width * height)
+
+    def signature(self, image):
+        from PIL import Image
+
+        width, height = (9, 8) if self.mode == "phash" else self.size
+        # Reducción entera previa (muy barata) antes del remuestreo final
+        factor = max(1, min(image.width // (width * 2), image.height // (height * 2)))
+        small = image.reduce(factor) if factor > 1 else image
+        small = small.convert("L").resize((width, height), Image.BILINEAR)
+        if self.mode != "phash":
+            return small
+        pixels = list(small.getdata())
+        bits = 0
+        for row in range(height):
+            for col in range(width - 1):
+                left = pixels[row * width + col]
+                bits = (bits << 1) | (left > pixels[row * width + col + 1])
+        return bits
+
+# ================== DISPARO POR ACTIVIDAD ==================
+
+# Fuentes de actividad que puede usar una sesión en lugar del temporizador fijo:
+#  - input: teclado o ratón (GetLastInputInfo en Windows, pynput en el resto)
+#  - window: cambia la ventana en primer plano o su título
+#  - screen: una sonda de baja frecuencia detecta cambios en la pantalla
+TRIGGER_KINDS = ("input", "window", "screen")
+TRIGGER_DEBOUNCE = 0.5
+TRIGGER_HEARTBEAT = 60.0
+
+
+class ActivitySource:
+    """Fuente de eventos de actividad.
+
+    start(emit) la arranca; la fuente llama a emit(tipo, detalle) con cada
+    actividad. Las subclases con sondeo implementan check(), que devuelve
+    None si no hubo actividad desde la última llamada. Una misma fuente puede
+    alimentar a varios planificadores (una sesión por objetivo).
+    """
+
+    kind = "manual"
+
+    def __init__(self, poll=0.5):
+        self.poll = poll
+        self.last_error = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def start(self, emit):
+        with self._lock:
+            self._listeners.append(emit)
+            if self._stop is None:
+                self._stop = threading.Event()
+                self.open()
+                threading.Thread(target=self._run, args=(self._stop,), name=f"trigger-{self.kind}",
+                                 daemon=True).start()
+
+    def stop(self, emit=None):
+        """No bloquea: el hilo de sondeo termina en su próxima vuelta."""
+        with self._lock:
+            if emit in self._listeners:
+                self._listeners.remove(emit)
+            if not self._listeners and self._stop is not None:
+                self._stop.set()
+                self._stop = None
+                self.close()
+
+    def emit(self, detail=None):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(self.kind, detail)
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def check(self):
+        return None
+
+    def _run(self, stop):
+        while not stop.wait(self.poll):
+            try:
+                detail = self.check()
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            if detail is not None:
+                self.emit(detail)
+
+
+class ManualActivitySource(ActivitySource):
+    """Fuente inyectable: cada fire() es un evento (pruebas, daemon, otras apps)."""
+
+    def __init__(self, kind="manual"):
+        super().__init__(poll=None)
+        self.kind = kind
+
+    def start(self, emit):
+        with self._lock:
+            self._listeners.append(emit)
+
+    def stop(self, emit=None):
+        with self._lock:
+            if emit in self._listeners:
+                self._listeners.remove(emit)
+
+    def fire(self, detail=None):
+        self.emit(detail)
+
+
+class InputActivitySource(ActivitySource):
+    """Actividad de teclado o ratón.
+
+    En Windows se sondea GetLastInputInfo (sin ganchos globales); en el resto
+    se usan los listeners de pynput, que solo marcan una bandera: el sondeo
+    la convierte en como mucho un evento por `poll`.
+    """
+
+    kind = "input"
+
+    def __init__(self, poll=0.25):
+        super().__init__(poll)
+        self._last_tick = None
+        self._seen = False
+        self._listeners_input = []
+
+    @classmethod
+    def available(cls):
+        if sys.platform == "win32":
+            return True
+        try:
+            import pynput  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def open(self):
+        if sys.platform == "win32":
+            return
+        from pynput import keyboard, mouse
+
+        def seen(*args):
+            self._seen = True
+        self._listeners_input = [
+            mouse.Listener(on_move=seen, on_click=seen, on_scroll=seen),
+            keyboard.Listener(on_press=seen),
+        ]
+        for listener in self._listeners_input:
+            listener.daemon = True
+            listener.start()
+
+    def close(self):
+        for listener in self._listeners_input:
+            listener.stop()
+        self._listeners_input = []
+
+    def check(self):
+        if sys.platform == "win32":
+            import ctypes
+
+            class LASTINPUTINFO(ctypes.Structure):
+                _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+            info = LASTINPUTINFO()
+            info.cbSize = ctypes.sizeof(info)
+            if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+                return None
+            previous, self._last_tick = self._last_tick, info.dwTime
+            return "entrada" if previous is not None and info.dwTime != previous else None
+        seen, self._seen = self._seen, False
+        return "entrada" if seen else None
+
+
+class WindowTitleSource(ActivitySource):
+    """Cambio de la ventana en primer plano o de su título.
+
+    Windows: GetForegroundWindow/GetWindowTextW. Linux (X11): xdotool.
+    """
+
+    kind = "window"
+
+    def __init__(self, poll=0.5):
+        super().__init__(poll)
+        self._title = None
+
+    @classmethod
+    def available(cls):
+        return sys.platform == "win32" or bool(shutil.which("xdotool"))
+
+    @staticmethod
+    def foreground_title():
+        if sys.platform == "win32":
+            import ctypes
+
+            user32 = ctypes.windll.user32
+            hwnd = user32.GetForegroundWindow()
+            length = user32.GetWindowTextLengthW(hwnd)
+            buffer = ctypes.create_unicode_buffer(length + 1)
+            user32.GetWindowTextW(hwnd, buffer, length + 1)
+            return f"{hwnd}:{buffer.value}"
+        result = subprocess.run(["xdotool", "getactivewindow", "getwindowname"],
+                                capture_output=True, text=True, timeout=2)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def check(self):
+        title = self.foreground_title()
+        previous, self._title = self._title, title
+        if previous is None or title is None or title == previous:
+            return None
+        return title
+
+
+class ScreenChangeSource(ActivitySource):
+    """Sonda de pantalla: cada `poll` segundos toma una imagen con grab() y la
+    compara por firma (ChangeDetector); la imagen no se guarda."""
+
+    kind = "screen"
+
+    def __init__(self, grab, poll=1.0, threshold=0.005):
+        super().__init__(poll)
+        self.grab = grab
+        self.threshold = threshold
+        self._detector = None
+
+    def open(self):
+        self._detector = ChangeDetector(threshold=self.threshold)
+
+    def check(self):
+        detector = self._detector
+        if detector is None:
+            return None
+        first = detector.checked == 0
+        # La primera sonda solo fija la referencia
+        if detector.has_changed(self.grab()) and not first:
+            return "pantalla"
+        return None
+
+
+ACTIVITY_SOURCES = {
+    "input": InputActivitySource,
+    "window": WindowTitleSource,
+}
+
+
+def create_activity_source(kind):
+    """Fuente de actividad por nombre ("screen" necesita una sesión, ver CaptureSession)."""
+    if kind not in ACTIVITY_SOURCES:
+        raise ValueError(f"Disparador desconocido: {kind} (use {', '.join(TRIGGER_KINDS)})")
+    cls = ACTIVITY_SOURCES[kind]
+    if not cls.available():
+        hint = "instale pynput" if kind == "input" else "instale xdotool"
+        raise ValueError(f"El disparador '{kind}' no está disponible en este sistema ({hint})")
+    return cls()
+
+
+class ActivityScheduler(CaptureScheduler):
+    """Planificador por eventos con la misma interfaz que CaptureScheduler.
+
+    - Antirrebote: tras un evento se espera `debounce` segundos sin actividad
+      antes de capturar (una ráfaga de teclas es una sola captura).
+    - Ráfaga: mientras la actividad no cesa se captura cada `burst_interval`
+      segundos como mucho, y nunca más a menudo que eso.
+    - Latido: sin actividad se captura cada `heartbeat` segundos (None o 0 =
+      nunca), además de una captura inicial al arrancar.
+    """
+
+    def __init__(self, sources, burst_interval=1.0, debounce=TRIGGER_DEBOUNCE, heartbeat=TRIGGER_HEARTBEAT,
+                 clock=time.monotonic, wall_clock=time.time):
+        super().__init__(burst_interval, policy="coalesce", align_to_wall=False,
+                         clock=clock, wall_clock=wall_clock)
+        self.sources = list(sources)
+        self.debounce = max(0.0, float(debounce))
+        self.heartbeat = float(heartbeat) if heartbeat else None
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._pending_since = None
+        self._last_event = None
+        self._last_fire = None
+        self.events = 0
+        self.reasons = {}
+
+    def start(self):
+        super().start()
+        self._last_fire = None
+        for source in self.sources:
+            source.start(self.notify)
+
+    def stop(self):
+        super().stop()
+        for source in self.sources:
+            source.stop(self.notify)
+        with self._cond:
+            self._cond.notify_all()
+
+    def notify(self, kind, detail=None):
+        """Registra un evento de actividad (lo llaman las fuentes, desde su hilo)."""
+        now = self.clock()
+        with self._cond:
+            self.events += 1
+            if self._pending_since is None:
+                self._pending_since = now
+            self._last_event = now
+            self._pending[kind] = self._pending.get(kind, 0) + 1
+            self._cond.notify_all()
+
+    def _due(self):
+        if self._pending_since is not None:
+            due = min(self._last_event + self.debounce, self._pending_since + self.interval)
+            if self._last_fire is not None:
+                due = max(due, self._last_fire + self.interval)
+            return due
+        if self._last_fire is None:
+            return self._mono_anchor
+        if self.heartbeat:
+            return self._last_fire + self.heartbeat
+        return None
+
+    def wait_next(self):
+        """Bloquea hasta el próximo disparo. Devuelve None si se detuvo."""
+        if self._mono_anchor is None:
+            self.start()
+        with self._cond:
+            while not self._stop.is_set():
+                now = self.clock()
+                due = self._due()
+                if due is not None and now >= due:
+                    return self._fire(now, due)
+                self._cond.wait(None if due is None else due - now)
+        return None
+
+    def _fire(self, now, due):
+        if self._pending:
+            reason = max(self._pending, key=self._pending.get)
+        else:
+            reason = "start" if self._last_fire is None else "heartbeat"
+        merged = max(1, sum(self._pending.values()))
+        self.missed += merged - 1
+        self._pending = {}
+        self._pending_since = None
+        self._last_fire = now
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        index = self._index
+        self._index += 1
+        lateness = now - due
+        self._record(lateness)
+        return CaptureTick(index, due, now, self.wall_time(now), lateness, merged, reason=reason)
+
+    def stats(self):
+        info = super().stats()
+        info.update(events=self.events, reasons=dict(self.reasons))
+        return info
+
+# ================== REPORTE WORD INCREMENTAL ==================
+
+EMU_PER_INCH = 914400
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Default Extension="jpeg" ContentType="image/jpeg"/>'
+    '<Default Extension="jpg" ContentType="image/jpeg"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+
+_DOCX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+_DOCX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/>'
+    '<w:rPr><w:sz w:val="22"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:spacing w:after="240"/></w:pPr><w:rPr><w:color w:val="17365D"/><w:sz w:val="52"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:keepNext/><w:spacing w:before="480"/><w:outlineLvl w:val="0"/></w:pPr>'
+    '<w:rPr><w:b/><w:color w:val="365F91"/><w:sz w:val="28"/></w:rPr></w:style>'
+    '</w:styles>'
+)
+
+_DOCX_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"><w:body>'
+)
+
+# Carta con márgenes de 1": 6.5" de ancho útil
+_DOCX_DOCUMENT_TAIL = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+    'w:header="720" w:footer="720" w:gutter="0"/></w:sectPr></w:body></w:document>'
+)
+
+
+class FileLock:
+    """Cerrojo exclusivo del sistema sobre un archivo auxiliar (p. ej. "x.journal.lock").
+
+    Lo libera el sistema si el proceso muere, así que un archivo de cerrojo
+    sin bloquear indica que su dueño ya no existe. acquire() no espera:
+    devuelve False si otro proceso (u otro objeto de este) lo tiene.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._handle = None
+
+    def acquire(self):
+        handle = open(self.path, "a+b")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self, remove=True):
+        if self._handle is None:
+            return
+        if remove:
+            # Se borra antes de soltarlo: nadie puede tomar un cerrojo ya borrado
+            # (en Windows no se puede borrar abierto y se borra después)
+            if sys.platform != "win32":
+                _remove_quietly(self.path)
+        if sys.platform == "win32":
+            import msvcrt
+
+            self._handle.seek(0)
+            msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+        self._handle.close()
+        self._handle = None
+        if remove and sys.platform == "win32":
+            _remove_quietly(self.path)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class StreamingReportWriter:
+    """Reporte Word incremental y a prueba de caídas.
+
+    Cada entrada (título, párrafo, imagen) se añade a un diario JSON-lines
+    junto al .docx en lugar de acumularse en memoria; cada `checkpoint_every`
+    entradas o `checkpoint_seconds` segundos el diario se sincroniza a disco.
+    finalize() genera el .docx leyendo el diario en streaming (las imágenes se
+    copian desde disco una a una), así que la memoria no crece con la sesión.
+    Si el programa se cierra mal, recover() construye el .docx desde el diario.
+    Mientras el reporte está abierto su diario tiene un FileLock, para que
+    find_orphan_journals() no tome por huérfano un reporte en curso.
+    """
+
+    JOURNAL_SUFFIX = ".journal"
+    MEDIA_SUFFIX = ".media"
+    LOCK_SUFFIX = ".lock"
+
+    def __init__(self, docx_path, checkpoint_every=20, checkpoint_seconds=30.0, embed_dpi=150):
+        self.docx_path = docx_path
+        self.journal_path = docx_path + self.JOURNAL_SUFFIX
+        self.embedder = ReportImageEmbedder(docx_path + self.MEDIA_SUFFIX, dpi=embed_dpi)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.entries = 0
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+        self._lock = FileLock(self.journal_path + self.LOCK_SUFFIX)
+        if not self._lock.acquire():
+            raise OSError(f"El reporte {os.path.basename(docx_path)} está en uso por otra sesión")
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._write({"type": "header", "docx": os.path.basename(docx_path),
+                     "created": datetime.now().isoformat(timespec="seconds")})
+        self.checkpoint()
+
+    def add_heading(self, text, level=1):
+        self._write({"type": "heading", "text": text, "level": level})
+
+    def add_paragraph(self, text):
+        self._write({"type": "paragraph", "text": text})
+
+    def add_picture(self, path, width_inches=6, size=None, original=None):
+        """Referencia una imagen ya guardada en disco (no se carga en memoria).
+
+        Varias entradas con la misma ruta comparten una sola imagen en el .docx.
+        """
+        if size is None:
+            from PIL import Image
+
+            with Image.open(path) as image:
+                size = image.size
+        entry = {"type": "picture", "path": os.path.abspath(path),
+                 "width": size[0], "height": size[1], "width_in": width_inches}
+        if original:
+            entry["original"] = os.path.abspath(original)
+        self._write(entry)
+
+    def checkpoint(self):
+        """Asegura en disco todo lo escrito en el diario hasta ahora."""
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+    def close(self):
+        """Cierra el diario y lo deja en disco (y libre) para recuperarlo."""
+        self._close_journal()
+        self._lock.release()
+
+    def _close_journal(self):
+        if not self._journal.closed:
+            self.checkpoint()
+            self._journal.close()
+
+    def finalize(self, pdf_path=None):
+        """Genera el .docx definitivo (y opcionalmente el PDF) y elimina el diario."""
+        # El cerrojo se mantiene hasta borrar el diario: si se soltara antes,
+        # otra sesión podría "recuperar" este reporte a la vez
+        self._close_journal()
+        try:
+            build_docx_from_journal(self.journal_path, self.docx_path)
+            if pdf_path:
+                build_pdf_from_journal(self.journal_path, pdf_path)
+            os.remove(self.journal_path)
+            shutil.rmtree(self.docx_path + self.MEDIA_SUFFIX, ignore_errors=True)
+        finally:
+            self._lock.release()
+        return self.docx_path
+
+    @classmethod
+    def recover(cls, journal_path):
+        """Genera el .docx de un diario huérfano. Devuelve la ruta del .docx.
+
+        Lanza OSError si el diario está en uso (su sesión sigue abierta).
+        """
+        docx_path = journal_path[:-len(cls.JOURNAL_SUFFIX)]
+        lock = FileLock(journal_path + cls.LOCK_SUFFIX)
+        if not lock.acquire():
+            raise OSError(f"{os.path.basename(journal_path)} está en uso")
+        try:
+            # Otra sesión pudo recuperarlo entre la búsqueda y el cerrojo
+            if not os.path.exists(journal_path):
+                return docx_path
+            build_docx_from_journal(journal_path, docx_path)
+            os.remove(journal_path)
+            shutil.rmtree(docx_path + cls.MEDIA_SUFFIX, ignore_errors=True)
+        finally:
+            lock.release()
+        return docx_path
+
+    @classmethod
+    def find_orphan_journals(cls, folder):
+        """Diarios sin sesión viva (su cerrojo está libre o no existe)."""
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return []
+        orphans = []
+        for name in sorted(names):
+            if not name.endswith(".docx" + cls.JOURNAL_SUFFIX):
+                continue
+            path = os.path.join(folder, name)
+            lock = FileLock(path + cls.LOCK_SUFFIX)
+            if lock.acquire():
+                # Se suelta sin borrar: el archivo de cerrojo lo limpia recover()
+                lock.release(remove=False)
+                orphans.append(path)
+        return orphans
+
+    def _write(self, entry):
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.entries += 1
+        self._pending += 1
+        if (self._pending >= self.checkpoint_every or
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds):
+            self.checkpoint()
+
+
+class ReportImageEmbedder:
+    """Derivados de las capturas para incrustar en el reporte.
+
+    Una captura 4K mostrada a 6" de ancho solo necesita ~900 px a 150 ppp:
+    se remuestrea a ese tamaño y se recomprime (PNG si es interfaz plana, JPG
+    si es fotográfica) en una carpeta temporal junto al diario. Los derivados
+    idénticos byte a byte, o casi idénticos píxel a píxel (comparados con las
+    últimas `recent_window` imágenes únicas), reutilizan el mismo archivo y
+    acaban como una única imagen compartida en el paquete .docx. Las capturas
+    originales no se modifican.
+    """
+
+    def __init__(self, media_dir, dpi=150, jpeg_quality=80, recent_window=32):
+        self.media_dir = media_dir
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.recent_window = recent_window
+        self._by_digest = {}
+        self._recent = deque(maxlen=recent_window)
+        # Tolerancia de ruido de remuestreo, pero ningún píxel de la firma
+        # puede cambiar: un reloj o un cursor distintos cuentan como cambio.
+        self._detector = ChangeDetector(mode="diff", threshold=0.0, pixel_tolerance=6)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.unique = 0
+        self.reused = 0
+
+    def prepare(self, image, width_inches=6):
+        """Devuelve (ruta, (ancho, alto)) del derivado para esta imagen."""
+        derivative = resample_for_report(image, width_inches, self.dpi)
+
+        signature = self._detector.signature(derivative)
+        with self._lock:
+            for recent_signature, recent in self._recent:
+                if self._detector.distance(recent_signature, signature) <= 0:
+                    self.reused += 1
+                    return recent
+
+        data, extension = encode_report_image(derivative, self.jpeg_quality)
+        digest = hashlib.sha1(data).hexdigest()
+
+        with self._lock:
+            record = self._by_digest.get(digest)
+            if record is None:
+                os.makedirs(self.media_dir, exist_ok=True)
+                self._counter += 1
+                path = os.path.join(self.media_dir, f"m{self._counter:06d}{extension}")
+                with open(path, "wb") as f:
+                    f.write(data)
+                record = (path, derivative.size)
+                self._by_digest[digest] = record
+                self.unique += 1
+            else:
+                self.reused += 1
+            self._recent.append((signature, record))
+            return record
+
+
+def resample_for_report(image, width_inches, dpi):
+    """Reduce la imagen al ancho que ocupará impresa (width_inches a dpi)."""
+    from PIL import Image
+
+    target_width = int(width_inches * dpi)
+    if image.width > target_width:
+        target_height = max(1, round(image.height * target_width / image.width))
+        image = image.resize((target_width, target_height), Image.LANCZOS, reducing_gap=2.0)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
+
+
+def encode_report_image(derivative, jpeg_quality=80):
+    """(bytes, extensión): PNG si es interfaz plana, JPG si es contenido fotográfico."""
+    buffer = io.BytesIO()
+    if image_content_stats(derivative)["flat"]:
+        derivative.save(buffer, format="PNG", compress_level=6)
+        extension = ".png"
+    else:
+        derivative.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+        extension = ".jpg"
+    return buffer.getvalue(), extension
+
+
+def read_report_journal(journal_path):
+    """Itera las entradas del diario; ignora una última línea truncada."""
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Solo puede pasar con la última línea tras un cierre brusco
+                continue
+
+
+def _docx_picture_entries(journal_path):
+    """Imágenes únicas del diario que siguen existiendo, numeradas como en el .docx."""
+    seen = set()
+    for entry in read_report_journal(journal_path):
+        path = entry.get("path")
+        if entry.get("type") == "picture" and path not in seen and os.path.exists(path):
+            seen.add(path)
+            yield len(seen), entry
+
+
+# Caracteres que XML 1.0 no admite (controles C0, sustitutos, U+FFFE/U+FFFF):
+# uno solo en una ruta o un mensaje dejaría el document.xml ilegible
+_XML_INVALID = {code: "\ufffd" for code in (*range(0x20), *range(0xD800, 0xE000), 0xFFFE, 0xFFFF)
+                if code not in (0x09, 0x0A, 0x0D)}
+
+
+def xml_escape(text):
+    """Escapa &, < y > y sustituye los caracteres no válidos en XML por U+FFFD.
+
+    (xml.sax.saxutils arrastra urllib y alarga el arranque.)
+    """
+    text = text.translate(_XML_INVALID)
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _docx_paragraph(text, style=None):
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    return (f'<w:p>{props}<w:r><w:t xml:space="preserve">{xml_escape(text)}</w:t></w:r></w:p>')
+
+
+def _docx_picture(number, entry, drawing_id):
+    cx = int(entry["width_in"] * EMU_PER_INCH)
+    cy = int(cx * entry["height"] / max(1, entry["width"]))
+    name = f"image{number}"
+    return (
+        '<w:p><w:r><w:drawing><wp:inline distT="0" distB="0" distL="0" distR="0">'
+        f'<wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{drawing_id}" name="Picture {drawing_id}"/>'
+        '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+        '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:pic><pic:nvPicPr><pic:cNvPr id="0" name="{name}"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="rIdImg{number}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+        '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr></pic:pic>'
+        '</a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>'
+    )
+
+
+# Formatos que Word acepta tal cual; el resto (WebP) se convierte a PNG
+DOCX_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def _docx_media_name(number, entry):
+    extension = os.path.splitext(entry["path"])[1].lower()
+    if extension not in DOCX_IMAGE_EXTENSIONS:
+        extension = ".png"
+    return f"media/image{number}{extension}"
+
+
+def build_docx_from_journal(journal_path, docx_path):
+    """Construye un .docx válido a partir de un diario de reporte.
+
+    Se recorre el diario varias veces en streaming (zipfile no permite tener
+    dos entradas abiertas a la vez): document.xml, las relaciones y luego las
+    imágenes, copiadas sin recomprimir. Se escribe a un temporal y se renombra,
+    así nunca queda un .docx a medio escribir.
+    """
+    tmp_path = docx_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _DOCX_ROOT_RELS)
+        zf.writestr("word/styles.xml", _DOCX_STYLES)
+
+        with zf.open("word/document.xml", "w") as raw:
+            doc = _Utf8Writer(raw)
+            doc.write(_DOCX_DOCUMENT_HEAD)
+            media_numbers = {}
+            drawings = 0
+            for entry in read_report_journal(journal_path):
+                kind = entry.get("type")
+                if kind == "heading":
+                    level = entry.get("level", 1)
+                    doc.write(_docx_paragraph(entry["text"], "Title" if level == 0 else f"Heading{level}"))
+                elif kind == "paragraph":
+                    doc.write(_docx_paragraph(entry["text"]))
+                elif kind == "picture" and os.path.exists(entry["path"]):
+                    # Misma numeración que _docx_picture_entries: una parte por ruta
+                    number = media_numbers.setdefault(entry["path"], len(media_numbers) + 1)
+                    drawings += 1
+                    doc.write(_docx_picture(number, entry, drawings))
+            doc.write(_DOCX_DOCUMENT_TAIL)
+
+        with zf.open("word/_rels/document.xml.rels", "w") as raw:
+            rels = _Utf8Writer(raw)
+            rels.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                       '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                       '<Relationship Id="rIdStyles" Target="styles.xml" '
+                       'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>')
+            for number, entry in _docx_picture_entries(journal_path):
+                rels.write(f'<Relationship Id="rIdImg{number}" Target="{_docx_media_name(number, entry)}" '
+                           'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"/>')
+            rels.write('</Relationships>')
+
+        for number, entry in _docx_picture_entries(journal_path):
+            media_name = "word/" + _docx_media_name(number, entry)
+            if os.path.splitext(entry["path"])[1].lower() in DOCX_IMAGE_EXTENSIONS:
+                # PNG/JPG ya están comprimidos: se guardan tal cual
+                zf.write(entry["path"], media_name, compress_type=zipfile.ZIP_STORED)
+            else:
+                from PIL import Image
+
+                with Image.open(entry["path"]) as image, \
+                        zf.open(media_name, "w") as media:
+                    image.save(media, format="PNG", compress_level=1)
+    os.replace(tmp_path, docx_path)
+    return docx_path
+
+
+class _Utf8Writer:
+    """Adaptador mínimo para escribir texto en una entrada zip binaria."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def write(self, text):
+        self.raw.write(text.encode("utf-8"))
+
+# ================== PDF NATIVO ==================
+
+PDF_PAGE_SIZE = (612, 792)  # Carta, en puntos
+PDF_MARGIN = 72
+
+
+def _pdf_text(text):
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _png_passthrough(data):
+    """Si el PNG se puede incrustar sin decodificar devuelve (w, h, canales, idat).
+
+    Vale para PNG de 8 bits en gris o RGB sin entrelazar: sus datos IDAT ya
+    son un flujo zlib con predictores PNG, que PDF entiende directamente.
+    """
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    pos = 8
+    header = None
+    idat = []
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+        pos += 12 + length
+    if not header:
+        return None
+    width, height, depth, color_type, _, _, interlace = header
+    if depth != 8 or interlace or color_type not in (0, 2):
+        return None
+    return width, height, 1 if color_type == 0 else 3, b"".join(idat)
+
+
+class StreamingPDFWriter:
+    """Escritor de PDF en streaming, sin dependencias externas.
+
+    Cada objeto se escribe al archivo en cuanto está listo; en memoria solo
+    quedan los desplazamientos de los objetos y el contenido de la página en
+    curso. Las imágenes JPEG se copian tal cual (DCTDecode) y los PNG RGB/gris
+    de 8 bits pasan sus datos comprimidos sin recodificar; solo otros formatos
+    se decodifican y comprimen con zlib.
+    """
+
+    def __init__(self, path, page_size=PDF_PAGE_SIZE, margin=PDF_MARGIN):
+        self.path = path
+        self.page_width, self.page_height = page_size
+        self.margin = margin
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._offsets = {}
+        self._next_id = 5  # 1 catálogo, 2 árbol de páginas, 3-4 fuentes
+        self._pages = []
+        self._content = None
+        self._images = []
+        self._y = 0
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                              b"/Encoding /WinAnsiEncoding >>")
+        self._write_object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold "
+                              b"/Encoding /WinAnsiEncoding >>")
+
+    @property
+    def page_count(self):
+        return len(self._pages) + (1 if self._content is not None else 0)
+
+    def new_page(self):
+        self._end_page()
+        self._content = []
+        self._images = []
+        self._y = self.page_height - self.margin
+
+    def add_text(self, text, size=11, bold=False, space_after=4):
+        usable = self.page_width - 2 * self.margin
+        # Helvetica mide ~0.5 em de media por carácter
+        lines = textwrap.wrap(text, max(10, int(usable / (size * 0.5)))) or [""]
+        for line in lines:
+            if self._content is None or self._y - size < self.margin:
+                self.new_page()
+            self._y -= size
+            font = b"/F2" if bold else b"/F1"
+            self._content.append(b"BT %s %d Tf %.2f %.2f Td %s Tj ET\n"
+                                 % (font, size, self.margin, self._y, _pdf_text(line)))
+            self._y -= space_after
+
+    def add_image(self, source, width_pt=None):
+        """Añade una imagen (ruta o bytes) escalada al ancho indicado."""
+        if isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+        image_id, (width, height) = self._write_image(data)
+        usable_w = self.page_width - 2 * self.margin
+        draw_w = min(width_pt or usable_w, usable_w)
+        draw_h = draw_w * height / max(1, width)
+        if self._content is None:
+            self.new_page()
+        elif self._y - draw_h < self.margin and self._y < self.page_height - self.margin:
+            self.new_page()
+        max_h = self._y - self.margin
+        if draw_h > max_h:
+            # Imagen más alta que el espacio disponible: se reduce
+            draw_w, draw_h = draw_w * max_h / draw_h, max_h
+        self._y -= draw_h
+        name = b"/Im%d" % image_id
+        self._images.append((name, image_id))
+        self._content.append(b"q %.2f 0 0 %.2f %.2f %.2f cm %s Do Q\n"
+                             % (draw_w, draw_h, self.margin, self._y, name))
+        self._y -= 8
+
+    def close(self):
+        """Escribe árbol de páginas, catálogo y xref, y publica el archivo."""
+        self._end_page()
+        if not self._pages:
+            self.new_page()
+            self._end_page()
+        kids = b" ".join(b"%d 0 R" % page for page in self._pages)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_at = self._file.tell()
+        count = self._next_id
+        lines = [b"xref\n0 %d\n" % count, b"0000000000 65535 f \n"]
+        for obj_id in range(1, count):
+            lines.append(b"%010d 00000 n \n" % self._offsets.get(obj_id, 0))
+        self._file.write(b"".join(lines))
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_at))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % obj_id)
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def _write_image(self, data):
+        obj_id = self._new_id()
+        if data[:2] == b"\xff\xd8":
+            from PIL import Image
+
+            with Image.open(io.BytesIO(data)) as image:
+                (width, height), mode = image.size, image.mode
+            colors = {"L": b"/DeviceGray", "CMYK": b"/DeviceCMYK"}.get(mode, b"/DeviceRGB")
+            decode = b" /Decode [1 0 1 0 1 0 1 0]" if mode == "CMYK" else b""
+            self._write_object(obj_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                                       b"/ColorSpace %s /BitsPerComponent 8%s /Filter /DCTDecode "
+                                       b"/Length %d >>" % (width, height, colors, decode, len(data)), data)
+            return obj_id, (width, height)
+        png = _png_passthrough(data)
+        if png:
+            width, height, channels, idat = png
+            colors = b"/DeviceGray" if channels == 1 else b"/DeviceRGB"
+            self._write_object(obj_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                                       b"/ColorSpace %s /BitsPerComponent 8 /Filter /FlateDecode "
+                                       b"/DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent 8 "
+                                       b"/Columns %d >> /Length %d >>"
+                                       % (width, height, colors, channels, width, len(idat)), idat)
+            return obj_id, (width, height)
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            rgb = image.convert("RGB")
+        width, height = rgb.size
+        raw = zlib.compress(rgb.tobytes(), 6)
+        self._write_object(obj_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                                   b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+                                   b"/Length %d >>" % (width, height, len(raw)), raw)
+        return obj_id, (width, height)
+
+    def _end_page(self):
+        if self._content is None:
+            return
+        content = b"".join(self._content)
+        content_id = self._new_id()
+        self._write_object(content_id, b"<< /Length %d >>" % len(content), content)
+        xobjects = b" ".join(b"%s %d 0 R" % (name, image_id) for name, image_id in self._images)
+        page_id = self._new_id()
+        self._write_object(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                                    b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> /XObject << %s >> >> "
+                                    b"/Contents %d 0 R >>"
+                                    % (self.page_width, self.page_height, xobjects, content_id))
+        self._pages.append(page_id)
+        self._content = None
+        self._images = []
+
+
+def _write_report_entries_pdf(entries, pdf_path):
+    """Vuelca entradas de reporte (formato del diario) a un PDF en streaming.
+
+    Cada título de nivel 1 abre página nueva: así cada captura ocupa su
+    propia página con su título (número y hora) y su imagen.
+    """
+    writer = StreamingPDFWriter(pdf_path)
+    try:
+        for entry in entries:
+            kind = entry.get("type")
+            if kind == "heading":
+                level = entry.get("level", 1)
+                if level >= 1 and writer.page_count:
+                    writer.new_page()
+                writer.add_text(entry["text"], size=24 if level == 0 else 14, bold=True, space_after=10)
+            elif kind == "paragraph":
+                writer.add_text(entry["text"])
+            elif kind == "picture":
+                source = entry.get("data") or entry["path"]
+                if isinstance(source, bytes) or os.path.exists(source):
+                    writer.add_image(source, entry.get("width_in", 6) * 72)
+        return writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def build_pdf_from_journal(journal_path, pdf_path):
+    """PDF directo desde el diario de una sesión, sin pasar por el .docx."""
+    return _write_report_entries_pdf(read_report_journal(journal_path), pdf_path)
+
+
+def _docx_report_entries(docx_path):
+    """Lee en streaming un .docx generado por SnapMaster como entradas de reporte."""
+    import xml.etree.ElementTree as ET
+
+    w = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    r = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+    blip = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+    extent = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}extent"
+    with zipfile.ZipFile(docx_path) as zf:
+        rels = {}
+        with zf.open("word/_rels/document.xml.rels") as f:
+            for _, element in ET.iterparse(f):
+                if element.tag.endswith("Relationship"):
+                    rels[element.get("Id")] = element.get("Target")
+        with zf.open("word/document.xml") as f:
+            for _, element in ET.iterparse(f):
+                if element.tag != w + "p":
+                    continue
+                style = element.find(f"{w}pPr/{w}pStyle")
+                style = style.get(w + "val") if style is not None else ""
+                image = element.find(f".//{blip}")
+                if image is not None:
+                    target = rels.get(image.get(r + "embed"), "")
+                    size = element.find(f".//{extent}")
+                    width_in = int(size.get("cx")) / EMU_PER_INCH if size is not None else 6
+                    yield {"type": "picture", "data": zf.read("word/" + target.lstrip("/")),
+                           "width_in": width_in}
+                else:
+                    text = "".join(t.text or "" for t in element.iter(w + "t"))
+                    if style == "Title":
+                        yield {"type": "heading", "text": text, "level": 0}
+                    elif style.startswith("Heading"):
+                        yield {"type": "heading", "text": text, "level": int(style[7:] or 1)}
+                    elif text:
+                        yield {"type": "paragraph", "text": text}
+                # Liberar los párrafos ya procesados: memoria acotada
+                element.clear()
+
+
+def build_pdf_from_docx(docx_path, pdf_path):
+    """PDF nativo a partir de un .docx de SnapMaster (sin Office)."""
+    return _write_report_entries_pdf(_docx_report_entries(docx_path), pdf_path)
+
+# ================== CONVERSIÓN A PDF ==================
+
+LIBREOFFICE_PATHS = [
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+]
+
+
+def find_soffice():
+    """Ruta del ejecutable de LibreOffice, o None si no está instalado."""
+    for path in LIBREOFFICE_PATHS:
+        if os.path.exists(path):
+            return path
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class OfficeWorker:
+    """Una instancia de LibreOffice con su propio perfil de usuario.
+
+    Con el puente UNO de Python (módulo `uno`) el proceso queda arrancado y
+    escuchando en un puerto local, y cada conversión solo carga y exporta el
+    documento. Sin UNO se lanza `soffice --convert-to` por trabajo, pero con
+    un perfil persistente por worker: la creación del perfil, que es la mayor
+    parte del arranque en frío, solo se paga la primera vez.
+    """
+
+    def __init__(self, soffice, profile_dir):
+        self.soffice = soffice
+        self.profile_dir = profile_dir
+        self.profile_url = "file:///" + os.path.abspath(profile_dir).replace("\\", "/").lstrip("/")
+        self.process = None
+        self.desktop = None
+        self.jobs_done = 0
+        self.timed_out = False
+        try:
+            import uno  # noqa: F401
+            self.use_uno = True
+        except Exception:
+            self.use_uno = False
+
+    def start(self, timeout=60):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if not self.use_uno:
+            return
+        import uno
+
+        port = _free_port()
+        self.process = subprocess.Popen([
+            self.soffice, f"-env:UserInstallation={self.profile_url}",
+            "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+            f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("LibreOffice no respondió al arrancar")
+                time.sleep(0.25)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        self.jobs_done = 0
+
+    def stop(self):
+        self.desktop = None
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def convert(self, src, dst, timeout):
+        if self.use_uno:
+            self._convert_uno(src, dst)
+        else:
+            self._convert_cli(src, dst, timeout)
+        self.jobs_done += 1
+
+    def _convert_uno(self, src, dst):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            return p
+
+        doc = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(src)),
+                                                "_blank", 0, (prop("Hidden", True),))
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst)),
+                           (prop("FilterName", "writer_pdf_Export"),))
+        finally:
+            doc.close(True)
+
+    def _convert_cli(self, src, dst, timeout):
+        # --convert-to decide el nombre de salida: se convierte en una carpeta
+        # propia del worker y luego se mueve al nombre pedido.
+        outdir = os.path.join(self.profile_dir, "out")
+        os.makedirs(outdir, exist_ok=True)
+        cmd = [self.soffice, f"-env:UserInstallation={self.profile_url}", "--headless",
+               "--convert-to", "pdf", "--outdir", outdir, src]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        produced = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        if result.returncode != 0 or not os.path.exists(produced):
+            raise RuntimeError(f"LibreOffice error: {result.stderr.strip() or result.returncode}")
+        os.replace(produced, dst)
+
+
+class OfficeConversionPool:
+    """Servicio de conversión .docx -> .pdf con instancias de LibreOffice calientes.
+
+    Los trabajos entran en una cola y los atienden `workers` hilos, cada uno
+    dueño de un OfficeWorker. Cada trabajo tiene su tiempo límite (si se pasa,
+    se mata la instancia y se arranca otra) y cada instancia se recicla tras
+    `max_jobs_per_worker` conversiones para contener fugas de memoria.
+    """
+
+    def __init__(self, workers=None, max_jobs_per_worker=50, job_timeout=120,
+                 soffice=None, profile_root=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise RuntimeError("LibreOffice no encontrado")
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.job_timeout = job_timeout
+        self.profile_root = profile_root or os.path.join(APP_DIR, "office_profiles")
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._running = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        for i in range(self.workers):
+            worker = OfficeWorker(self.soffice, os.path.join(self.profile_root, f"worker{i}"))
+            t = threading.Thread(target=self._worker_loop, args=(worker,), name=f"office-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._watchdog = threading.Thread(target=self._watchdog_loop, name="office-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def submit(self, src, dst=None, timeout=None):
+        """Encola una conversión. Devuelve un Future con la ruta del PDF."""
+        if self._closed:
+            raise RuntimeError("El pool de conversión está cerrado")
+        dst = dst or os.path.splitext(src)[0] + ".pdf"
+        future = Future()
+        self._jobs.put((src, dst, timeout or self.job_timeout, future))
+        return future
+
+    def convert(self, src, dst=None, timeout=None):
+        timeout = timeout or self.job_timeout
+        # Margen para la espera en cola y el arranque de la instancia
+        return self.submit(src, dst, timeout).result(timeout * 2 + 60)
+
+    def convert_many(self, sources, progress=None):
+        """Convierte varios .docx en paralelo. Devuelve {origen: pdf o excepción}."""
+        futures = [(src, self.submit(src)) for src in sources]
+        results = {}
+        for done, (src, future) in enumerate(futures, 1):
+            try:
+                results[src] = future.result()
+            except Exception as e:
+                results[src] = e
+            if progress:
+                progress(done, len(futures))
+        return results
+
+    def shutdown(self):
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join(10)
+
+    def _worker_loop(self, worker):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            src, dst, timeout, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            worker.timed_out = False
+            try:
+                if worker.use_uno and (worker.desktop is None or
+                                       worker.jobs_done >= self.max_jobs_per_worker):
+                    worker.stop()
+                    worker.start()
+                with self._lock:
+                    self._running[worker] = time.monotonic() + timeout
+                worker.convert(src, dst, timeout)
+                future.set_result(dst)
+            except Exception as e:
+                worker.stop()
+                if worker.timed_out or isinstance(e, subprocess.TimeoutExpired):
+                    e = TimeoutError(f"Conversión de {os.path.basename(src)} excedió {timeout} s")
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._running.pop(worker, None)
+        worker.stop()
+
+    def _watchdog_loop(self):
+        # Con UNO la llamada bloquea sin tiempo límite propio: si se pasa el
+        # plazo se mata el proceso, lo que hace fallar la llamada en el worker.
+        while not self._closed:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._lock:
+                expired = [w for w, deadline in self._running.items() if now > deadline]
+            for worker in expired:
+                if worker.process:
+                    worker.timed_out = True
+                    worker.process.kill()
+
+
+_office_pool = None
+_office_pool_lock = threading.Lock()
+
+
+def get_office_pool():
+    """Pool de conversión compartido por todo el proceso (se crea al primer uso)."""
+    global _office_pool
+    with _office_pool_lock:
+        if _office_pool is None:
+            _office_pool = OfficeConversionPool()
+        return _office_pool
+
+
+def shutdown_office_pool():
+    global _office_pool
+    with _office_pool_lock:
+        pool, _office_pool = _office_pool, None
+    if pool:
+        pool.shutdown()
+
+
+class PDFConverter:
+    """Convierte .docx -> .pdf con el mejor método disponible.
+
+    Orden: docx2pdf (Word en Windows/macOS), pool de LibreOffice y, en
+    Windows, automatización COM de Word; el escritor PDF nativo va primero
+    si prefer_native, o como último recurso. Devuelve el método usado.
+    """
+
+    def __init__(self, prefer_native=False):
+        self.prefer_native = prefer_native
+
+    def convert(self, docx_path, pdf_path):
+        with METRICS.time("convert"):
+            method = self._convert(docx_path, pdf_path)
+        METRICS.counter("pdf_conversions", "PDF generados").inc()
+        return method
+
+    def _convert(self, docx_path, pdf_path):
+        errors = []
+        if self.prefer_native:
+            try:
+                build_pdf_from_docx(docx_path, pdf_path)
+                return "PDF nativo"
+            except Exception as e:
+                errors.append(f"nativo={e}")
+                print(f"Método nativo falló: {e}")
+                METRICS.counter("pdf_fallbacks", "Métodos de PDF que fallaron").inc()
+
+        try:
+            from docx2pdf import convert
+            convert(docx_path, pdf_path)
+            return "docx2pdf"
+        except Exception as e:
+            errors.append(f"docx2pdf={e}")
+            print(f"Método docx2pdf falló: {e}")
+            METRICS.counter("pdf_fallbacks", "Métodos de PDF que fallaron").inc()
+
+        try:
+            get_office_pool().convert(docx_path, pdf_path)
+            return "LibreOffice"
+        except Exception as e:
+            errors.append(f"LibreOffice={e}")
+            print(f"Método LibreOffice falló: {e}")
+            METRICS.counter("pdf_fallbacks", "Métodos de PDF que fallaron").inc()
+
+        try:
+            if sys.platform != "win32":
+                raise Exception("win32com solo disponible en Windows")
+            import win32com.client
+            word = win32com.client.Dispatch("Word.Application")
+            word.Visible = False
+            doc = word.Documents.Open(docx_path)
+            doc.SaveAs(pdf_path, FileFormat=17)  # 17 = PDF format
+            doc.Close()
+            word.Quit()
+            return "MS Word"
+        except Exception as e:
+            errors.append(f"win32com={e}")
+            print(f"Método win32com falló: {e}")
+            METRICS.counter("pdf_fallbacks", "Métodos de PDF que fallaron").inc()
+
+        if not self.prefer_native:
+            try:
+                build_pdf_from_docx(docx_path, pdf_path)
+                return "PDF nativo"
+            except Exception as e:
+                errors.append(f"nativo={e}")
+        raise Exception("Todos los métodos fallaron: " + ", ".join(errors))
+
+# ================== CÁMARA WEB ==================
+
+class LatestFrameBuffer:
+    """Buffer de un solo frame (el más reciente) con triple búfer reutilizable.
+
+    El productor escribe siempre en `spare` y luego lo intercambia con
+    `latest`; el consumidor intercambia `latest` con `reading`. Cada lado solo
+    toca su propio arreglo fuera del cerrojo, así que no hay copias ni
+    asignaciones por frame una vez que los tres arreglos existen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spare = None
+        self._latest = None
+        self._reading = None
+        self._fresh = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def publish(self):
+        """El productor terminó de escribir en `spare`: pasa a ser el más reciente."""
+        with self._lock:
+            if self._fresh:
+                # El anterior nunca llegó a mostrarse
+                self.dropped += 1
+            self.spare, self._latest = self._latest, self.spare
+            self._fresh = True
+            self.published += 1
+
+    def take(self):
+        """Devuelve el frame más reciente si hay uno nuevo, o None."""
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._reading, self._latest = self._latest, self._reading
+            self._fresh = False
+            self.delivered += 1
+            return self._reading
+
+
+class WebcamManager:
+    """Cámara con OpenCV leída en un hilo propio.
+
+    `cap.read()` puede bloquear decenas de milisegundos: se hace fuera del
+    hilo de Tk y escribe directamente en el búfer reutilizable. La interfaz
+    solo consume el último frame al ritmo de refresco de pantalla.
+    """
+
+    def __init__(self, index=0, width=640, height=480):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.cap = None
+        self.buffer = LatestFrameBuffer()
+        self._running = False
+        self._thread = None
+        self._listeners = []
+        self._rate_mark = (time.monotonic(), 0, 0)
+        self.rates = {"delivered_fps": 0.0, "dropped_fps": 0.0}
+
+    def open(self):
+        import cv2
+
+        backend = cv2.CAP_DSHOW if sys.platform == "win32" else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(self.index, backend)
+        if not self.cap.isOpened():
+            self.cap = None
+            return False
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self._running = True
+        self._thread = threading.Thread(target=self._read_loop, name="webcam", daemon=True)
+        self._thread.start()
+        return True
+
+    def add_listener(self, callback):
+        """callback(frame) se llama en el hilo de la cámara con cada frame leído.
+
+        Debe ser rápido y no bloquear: el frame se reutiliza después.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def fps(self, default=30.0):
+        import cv2
+
+        value = self.cap.get(cv2.CAP_PROP_FPS) if self.cap else 0
+        return value if 1 <= value <= 240 else default
+
+    def close(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(2)
+            self._thread = None
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+    def _read_loop(self):
+        while self._running and self.cap:
+            # read(image) reutiliza el arreglo si el tamaño coincide
+            ok, frame = self.cap.read(self.buffer.spare)
+            if not ok:
+                time.sleep(0.01)
+                continue
+            self.buffer.spare = frame
+            for listener in list(self._listeners):
+                listener(frame)
+            self.buffer.publish()
+
+    def latest(self):
+        return self.buffer.take()
+
+    def stats(self):
+        """FPS entregados a la interfaz y descartados desde la última consulta."""
+        now = time.monotonic()
+        mark_time, mark_delivered, mark_dropped = self._rate_mark
+        elapsed = now - mark_time
+        if elapsed >= 1.0:
+            self.rates = {
+                "delivered_fps": (self.buffer.delivered - mark_delivered) / elapsed,
+                "dropped_fps": (self.buffer.dropped - mark_dropped) / elapsed,
+            }
+            self._rate_mark = (now, self.buffer.delivered, self.buffer.dropped)
+        return dict(self.rates, delivered=self.buffer.delivered, dropped=self.buffer.dropped)
+
+WEBCAM_PREROLL_SECONDS = 3
+WEBCAM_VIDEO_FOURCC = "mp4v"
+
+
+class WebcamRecorder:
+    """Grabación de la cámara a vídeo con un hilo codificador propio.
+
+    feed() se llama desde el hilo de la cámara y nunca bloquea: mientras no
+    se graba, los frames van a un anillo con los últimos `preroll_seconds`
+    segundos; al grabar, a una cola acotada que vacía el hilo codificador
+    con cv2.VideoWriter. Si la cola está llena el frame se descarta y se
+    cuenta, pero la vista previa no se detiene. Los arreglos se reciclan
+    entre anillo, cola y codificador para no asignar memoria por frame.
+    """
+
+    def __init__(self, fps=30.0, preroll_seconds=WEBCAM_PREROLL_SECONDS, queue_frames=60,
+                 fourcc=WEBCAM_VIDEO_FOURCC):
+        self.fps = fps
+        self.fourcc = fourcc
+        self.queue_frames = queue_frames
+        self._ring = deque(maxlen=max(0, int(fps * preroll_seconds)))
+        self._preroll = deque()
+        self._queue = deque()
+        self._free = []
+        self._cond = threading.Condition()
+        self._recording = False
+        self._thread = None
+        self.path = None
+        self.started_at = None
+        self.recorded = 0
+        self.dropped = 0
+        self.preroll_frames = 0
+
+    @property
+    def recording(self):
+        return self._recording
+
+    def feed(self, frame):
+        import numpy as np
+
+        with self._cond:
+            if self._recording:
+                if len(self._queue) >= self.queue_frames:
+                    self.dropped += 1
+                    return
+                self._queue.append(self._copy(frame))
+                self._cond.notify()
+            elif self._ring.maxlen:
+                if len(self._ring) == self._ring.maxlen:
+                    buf = self._ring.popleft()
+                    if buf.shape == frame.shape:
+                        np.copyto(buf, frame)
+                    else:
+                        buf = frame.copy()
+                    self._ring.append(buf)
+                else:
+                    self._ring.append(self._copy(frame))
+
+    def start(self, path):
+        """Empieza a grabar; el vídeo arranca con el contenido del anillo."""
+        with self._cond:
+            if self._recording:
+                return
+            self.path = path
+            self.started_at = time.monotonic()
+            self.recorded = 0
+            self.dropped = 0
+            self._preroll, self._ring = self._ring, deque(maxlen=self._ring.maxlen)
+            self.preroll_frames = len(self._preroll)
+            self._recording = True
+        self._thread = threading.Thread(target=self._encode_loop, name="webcam-encoder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Deja de aceptar frames, espera a que se escriban los pendientes y cierra."""
+        with self._cond:
+            if not self._recording:
+                return
+            self._recording = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _copy(self, frame):
+        import numpy as np
+
+        while self._free:
+            buf = self._free.pop()
+            if buf.shape == frame.shape:
+                np.copyto(buf, frame)
+                return buf
+        return frame.copy()
+
+    def _next_frame(self):
+        with self._cond:
+            while True:
+                if self._preroll:
+                    return self._preroll.popleft()
+                if self._queue:
+                    return self._queue.popleft()
+                if not self._recording:
+                    return None
+                self._cond.wait()
+
+    def _encode_loop(self):
+        import cv2
+
+        writer = None
+        size = None
+        try:
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                if writer is None:
+                    size = (frame.shape[1], frame.shape[0])
+                    writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+                if (frame.shape[1], frame.shape[0]) != size:
+                    writer.write(cv2.resize(frame, size))
+                else:
+                    writer.write(frame)
+                with self._cond:
+                    self.recorded += 1
+                    if len(self._free) < self.queue_frames:
+                        self._free.append(frame)
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "recording": self._recording,
+                "seconds": time.monotonic() - self.started_at if self._recording else 0.0,
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "queued": len(self._queue) + len(self._preroll),
+                "preroll": self.preroll_frames,
+            }
+
+# ================== CATÁLOGO DE SESIONES ==================
+
+CATALOG_FILENAME = ".snapmaster_catalog.sqlite3"
+
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    started TEXT NOT NULL,
+    ended TEXT,
+    word_path TEXT,
+    pdf_path TEXT,
+    video_path TEXT,
+    captures INTEGER DEFAULT 0,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    seq INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    path TEXT NOT NULL,
+    frame INTEGER,
+    bytes INTEGER,
+    width INTEGER,
+    height INTEGER,
+    codec TEXT,
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS captures_by_time ON captures(timestamp);
+CREATE INDEX IF NOT EXISTS captures_by_session ON captures(session_id, seq);
+CREATE INDEX IF NOT EXISTS captures_by_path ON captures(path);
+CREATE TABLE IF NOT EXISTS names (
+    base TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+"""
+
+
+def _path_taken(path, companions=()):
+    return os.path.exists(path) or any(os.path.exists(path + c) for c in companions)
+
+
+def _catalog_time(value):
+    """datetime o texto ISO -> texto ISO comparable (el orden léxico es el cronológico)."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return datetime.fromisoformat(value).isoformat(sep=" ")
+
+
+class SessionCatalog:
+    """Índice SQLite de las sesiones y capturas de una carpeta.
+
+    Guarda cada captura (hora, ruta, tamaño, códec, hash del archivo y
+    sesión) y asigna nombres libres con un contador por nombre base, así que
+    no hace falta recorrer la carpeta probando _01, _02... Varios procesos
+    pueden compartir el catálogo: la asignación va en una transacción.
+    """
+
+    def __init__(self, folder):
+        import sqlite3
+
+        self.folder = folder
+        self.path = os.path.join(folder, CATALOG_FILENAME)
+        self._lock = threading.Lock()
+        # isolation_level=None: las transacciones se abren a mano (BEGIN IMMEDIATE)
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_CATALOG_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def allocate_name(self, base_path, extension="", companions=()):
+        """Igual que get_unique_filename, pero sin probar _01, _02... uno a uno.
+
+        Para los nombres de sesión (Word, PDF, vídeo, archivo), que se repiten
+        de una sesión a otra. Si el nombre está libre no se escribe nada; solo
+        cuando choca se guarda en `names` el siguiente sufijo, y la próxima vez
+        se va directo a él. Solo vuelve a probar si ese nombre existe por fuera
+        del catálogo (archivos copiados a mano).
+        """
+        key = base_path + extension
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM names WHERE base = ?", (key,)).fetchone()
+        if not known and not _path_taken(key, companions):
+            return key
+        while True:
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._db.execute("SELECT next FROM names WHERE base = ?", (key,)).fetchone()
+                    n = max(row[0] if row else 1, 1)
+                    self._db.execute("INSERT INTO names(base, next) VALUES (?, ?) "
+                                     "ON CONFLICT(base) DO UPDATE SET next = excluded.next", (key, n + 1))
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+            candidate = f"{base_path}_{n:02d}{extension}"
+            if not _path_taken(candidate, companions):
+                return candidate
+
+    def begin_session(self, name, settings=None, word_path=None, video_path=None):
+        cursor = self._write(
+            "INSERT INTO sessions(name, started, word_path, video_path, settings) VALUES (?, ?, ?, ?, ?)",
+            (name, _catalog_time(datetime.now()), word_path or None, video_path or None,
+             json.dumps(settings) if settings else None))
+        return cursor.lastrowid
+
+    def end_session(self, session_id, captures, pdf_path=None):
+        self._write("UPDATE sessions SET ended = ?, captures = ?, pdf_path = ? WHERE id = ?",
+                    (_catalog_time(datetime.now()), captures, pdf_path or None, session_id))
+
+    def record_capture(self, session_id, frame):
+        width, height = frame.size or (None, None)
+        self._write(
+            "INSERT INTO captures(session_id, seq, timestamp, path, frame, bytes, width, height, codec, digest) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, frame.seq, _catalog_time(frame.timestamp), frame.filepath, frame.video_number,
+             frame.bytes, width, height, frame.codec, frame.digest))
+
+    def forget_captures(self, paths):
+        """Borra del índice capturas cuyo archivo ya no existe (retención)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("DELETE FROM captures WHERE path = ?", [(path,) for path in paths])
+            self._db.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def sessions(self):
+        return self._query("SELECT * FROM sessions ORDER BY started")
+
+    def find_session(self, key):
+        """Sesión por id o por nombre (la más reciente con ese nombre)."""
+        rows = self._query("SELECT * FROM sessions WHERE id = ? OR name = ? ORDER BY started DESC",
+                           (key, str(key)))
+        return rows[0] if rows else None
+
+    def session_captures(self, session_id):
+        return self._query("SELECT * FROM captures WHERE session_id = ? ORDER BY seq", (session_id,))
+
+    def captures_between(self, start=None, end=None, session_id=None):
+        """Capturas con start <= hora < end (ambos opcionales), por orden de hora."""
+        sql = "SELECT * FROM captures WHERE 1 = 1"
+        params = []
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_catalog_time(start))
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params.append(_catalog_time(end))
+        if session_id is not None:
+            sql += " AND session_id = ?"
+            params.append(session_id)
+        return self._query(sql + " ORDER BY timestamp", params)
+
+# ================== RETENCIÓN ==================
+
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+# Patrón de nombre de las capturas de SnapMaster: <base>_<seq>_<AAAAMMDD>_<HHMMSS>[_NN].<ext>
+_CAPTURE_NAME = None
+
+
+def parse_size(value):
+    """"500M", "2G", "1048576" -> bytes."""
+    text = str(value).strip().upper().rstrip("IB") or "0"
+    unit = text[-1] if text[-1] in _SIZE_UNITS else ""
+    try:
+        return int(float(text[:-1] if unit else text) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Tamaño no válido: {value}")
+
+
+def parse_duration(value):
+    """"30m", "12h", "7d", "90" (segundos) -> segundos."""
+    text = str(value).strip().lower()
+    unit = text[-1] if text and text[-1] in _DURATION_UNITS else ""
+    try:
+        return float(text[:-1] if unit else text) * _DURATION_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Duración no válida: {value}")
+
+
+class RetentionPolicy:
+    """Límites de una carpeta de capturas desatendida (None = sin límite).
+
+    max_bytes: tamaño total de las capturas; max_age: segundos que se
+    conserva una captura; thin_after + keep_every: pasado ese tiempo solo se
+    conserva una de cada N; min_free_bytes: espacio libre que debe quedar en
+    el disco tras cada escritura.
+    """
+
+    def __init__(self, max_bytes=None, max_age=None, thin_after=None, keep_every=None,
+                 min_free_bytes=256 * 1024 ** 2):
+        if keep_every is not None and keep_every < 1:
+            raise ValueError("keep_every debe ser 1 o mayor")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.thin_after = thin_after if keep_every and keep_every > 1 else None
+        self.keep_every = keep_every
+        self.min_free_bytes = min_free_bytes
+
+
+class _RetainedFile:
+    __slots__ = ("path", "size", "created", "seq")
+
+    def __init__(self, path, size, created, seq):
+        self.path = path
+        self.size = size
+        self.created = created
+        self.seq = seq
+
+
+class RetentionManager:
+    """Aplica una RetentionPolicy a las capturas de una carpeta en segundo plano.
+
+    El inventario se hace una sola vez al arrancar (del catálogo si existe;
+    si no, un único recorrido buscando nombres de captura). A partir de ahí
+    el uso se lleva de forma incremental con track(): dos colas ordenadas por
+    antigüedad (capturas recientes y ya aclaradas) y un total de bytes, así
+    que un barrido cuesta lo que se borra, no lo que hay en la carpeta. Solo
+    se borran capturas de SnapMaster; ningún otro archivo de la carpeta.
+    """
+
+    def __init__(self, folder, policy, sweep_interval=5.0, clock=time.time):
+        self.folder = folder
+        self.policy = policy
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._fresh = deque()
+        self._thinned = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._forgotten = []
+        # Rutas registradas o borradas antes de terminar el inventario: el
+        # catálogo ya puede incluirlas y no deben contarse dos veces
+        self._early = set()
+        # Conexión propia al catálogo, abierta una vez y cerrada en stop()
+        self._catalog = None
+        self._typical = 0
+        self._thin_counter = 0
+        self.total_bytes = 0
+        self.files = 0
+        self.evicted = 0
+        self.evicted_bytes = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        with self._lock:
+            catalog, self._catalog = self._catalog, False
+        if catalog:
+            catalog.close()
+
+    def track(self, path, size, created, seq=None):
+        """Registra una captura recién escrita (desde cualquier hilo)."""
+        with self._lock:
+            if not self._ready.is_set():
+                self._early.add(path)
+            self._fresh.append(_RetainedFile(path, size, created, seq))
+            self.total_bytes += size
+            self.files += 1
+            self._typical = size if not self._typical else self._typical + (size - self._typical) // 8
+            over_budget = self.policy.max_bytes and self.total_bytes > self.policy.max_bytes
+        METRICS.gauge("retention_bytes", "Bytes de capturas bajo retención").set(self.total_bytes)
+        if over_budget:
+            self._wake.set()
+
+    def ensure_space(self, needed=None):
+        """Antes de escribir: deja min_free_bytes libres borrando lo más antiguo si hace falta."""
+        needed = self._typical * 2 if needed is None else needed
+        if self._has_space(needed):
+            return
+        # No se espera al inventario (bloquearía el pipeline): primero se borra
+        # lo ya registrado y solo si no basta se le da un margen corto
+        for wait in (0, 1.0):
+            if wait and not self._ready.wait(wait):
+                break
+            with self._lock:
+                while not self._has_space(needed) and self._evict_oldest():
+                    pass
+            if self._has_space(needed) or self._ready.is_set():
+                break
+        self._flush_forgotten()
+        if not self._has_space(needed):
+            raise OSError(f"Espacio insuficiente en {self.folder}: "
+                          f"quedan {shutil.disk_usage(self.folder).free // 1024 ** 2} MB")
+
+    def _has_space(self, needed):
+        return shutil.disk_usage(self.folder).free - needed >= (self.policy.min_free_bytes or 0)
+
+    def sweep(self):
+        """Aplica antigüedad, aclarado y presupuesto. Devuelve cuántas capturas borró."""
+        policy = self.policy
+        now = self.clock()
+        evicted = self.evicted
+        with self._lock:
+            if policy.max_age:
+                for items in (self._thinned, self._fresh):
+                    while items and now - items[0].created > policy.max_age:
+                        self._delete(items.popleft())
+            if policy.thin_after:
+                while self._fresh and now - self._fresh[0].created > policy.thin_after:
+                    item = self._fresh.popleft()
+                    self._thin_counter += 1
+                    # Con número de secuencia el aclarado es estable entre reinicios
+                    keep = (item.seq if item.seq is not None else self._thin_counter) % policy.keep_every == 0
+                    if keep:
+                        self._thinned.append(item)
+                    else:
+                        self._delete(item)
+            if policy.max_bytes:
+                while self.total_bytes > policy.max_bytes and self._evict_oldest():
+                    pass
+        self._flush_forgotten()
+        METRICS.gauge("retention_bytes", "Bytes de capturas bajo retención").set(self.total_bytes)
+        return self.evicted - evicted
+
+    def stats(self):
+        return {"bytes": self.total_bytes, "files": self.files, "evicted": self.evicted,
+                "evicted_bytes": self.evicted_bytes, "free": shutil.disk_usage(self.folder).free}
+
+    def _evict_oldest(self):
+        items = self._thinned or self._fresh
+        if not items:
+            return False
+        self._delete(items.popleft())
+        return True
+
+    def _delete(self, item):
+        # Se llama con el lock tomado
+        try:
+            os.remove(item.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Retención: no se pudo borrar {item.path}: {e}", file=sys.stderr)
+        self.total_bytes -= item.size
+        self.files -= 1
+        self.evicted += 1
+        self.evicted_bytes += item.size
+        if not self._ready.is_set():
+            self._early.add(item.path)
+        self._forgotten.append(item.path)
+        METRICS.counter("retention_evicted", "Capturas borradas por la retención").inc()
+
+    def _flush_forgotten(self):
+        """Quita del catálogo las capturas borradas."""
+        with self._lock:
+            paths, self._forgotten = self._forgotten, []
+        catalog = self._get_catalog() if paths else None
+        if catalog:
+            catalog.forget_captures(paths)
+
+    def _get_catalog(self):
+        """Catálogo de la carpeta (None si no tiene). Se abre una sola vez."""
+        with self._lock:
+            # False = detenido: ya no se vuelve a abrir
+            if self._catalog is None and os.path.exists(os.path.join(self.folder, CATALOG_FILENAME)):
+                self._catalog = SessionCatalog(self.folder)
+            return self._catalog or None
+
+    def _inventory(self):
+        """Capturas que ya estaban en la carpeta, ordenadas por antigüedad."""
+        items = []
+        catalog = self._get_catalog()
+        if catalog:
+            for row in catalog.captures_between():
+                if row["frame"] is None and row["bytes"]:
+                    created = datetime.fromisoformat(row["timestamp"]).timestamp()
+                    items.append(_RetainedFile(row["path"], row["bytes"], created, row["seq"]))
+            return items
+        global _CAPTURE_NAME
+        if _CAPTURE_NAME is None:
+            import re
+
+            _CAPTURE_NAME = re.compile(r"_(\d{4,})_\d{8}_\d{6}(?:_\d+)?\.(?:png|jpe?g|webp)$", re.IGNORECASE)
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                match = _CAPTURE_NAME.search(entry.name)
+                if match and entry.is_file():
+                    stat = entry.stat()
+                    items.append(_RetainedFile(entry.path, stat.st_size, stat.st_mtime, int(match.group(1))))
+        items.sort(key=lambda item: item.created)
+        return items
+
+    def _loop(self):
+        try:
+            existing = self._inventory()
+        except Exception as e:
+            print(f"Retención: no se pudo leer la carpeta: {e}", file=sys.stderr)
+            existing = []
+        with self._lock:
+            # Las capturas nuevas (track) ya pueden estar en la cola: van detrás
+            existing = [item for item in existing if item.path not in self._early]
+            self._fresh.extendleft(reversed(existing))
+            self.total_bytes += sum(item.size for item in existing)
+            self.files += len(existing)
+            self._ready.set()
+            self._early = set()
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Retención: {e}", file=sys.stderr)
+            if self._stop.is_set():
+                return
+            self._wake.wait(self.sweep_interval)
+            self._wake.clear()
+
+# ================== REPORTE POR LOTES ==================
+
+# Imágenes que se incluyen al reconstruir un reporte desde una carpeta
+BATCH_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+_FILENAME_TIMESTAMP = None
+
+
+def _timestamp_from_filename(name):
+    """Hora de captura a partir de "..._AAAAMMDD_HHMMSS..." en el nombre, o None."""
+    global _FILENAME_TIMESTAMP
+    if _FILENAME_TIMESTAMP is None:
+        import re
+
+        _FILENAME_TIMESTAMP = re.compile(r"(\d{8}_\d{6})")
+    match = _FILENAME_TIMESTAMP.search(name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        except ValueError:
+            pass
+    return None
+
+
+def report_items_from_folder(folder, session=None):
+    """[(ruta, hora)] de las imágenes de una carpeta o de una sesión, en orden de captura.
+
+    Con catálogo la hora sale de él; si no, del nombre del archivo o, en
+    último caso, de la fecha de modificación.
+    """
+    catalog = None
+    if os.path.exists(os.path.join(folder, CATALOG_FILENAME)):
+        catalog = SessionCatalog(folder)
+    try:
+        if session is not None:
+            if catalog is None:
+                raise ValueError(f"No hay catálogo en {folder}: no se pueden buscar sesiones")
+            found = catalog.find_session(session)
+            if not found:
+                raise ValueError(f"Sesión no encontrada: {session}")
+            rows = catalog.session_captures(found["id"])
+            return [(row["path"], datetime.fromisoformat(row["timestamp"])) for row in rows
+                    if row["frame"] is None and os.path.exists(row["path"])]
+        known = {}
+        if catalog:
+            known = {os.path.abspath(row["path"]): datetime.fromisoformat(row["timestamp"])
+                     for row in catalog.captures_between() if row["frame"] is None}
+    finally:
+        if catalog:
+            catalog.close()
+
+    items = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in BATCH_IMAGE_EXTENSIONS:
+                continue
+            path = os.path.abspath(entry.path)
+            timestamp = known.get(path) or _timestamp_from_filename(entry.name) or \
+                datetime.fromtimestamp(entry.stat().st_mtime)
+            items.append((path, timestamp))
+    items.sort(key=lambda item: (item[1], os.path.basename(item[0])))
+    return items
+
+
+def _batch_report_job(job):
+    """Trabajo de un proceso del pool: decodifica, remuestrea y recomprime una imagen."""
+    from PIL import Image
+
+    index, source, media_dir, width_inches, dpi, jpeg_quality = job
+    target_width = int(width_inches * dpi)
+    with Image.open(source) as image:
+        original_size = image.size
+        if image.format == "JPEG" and image.width > target_width:
+            # El decodificador JPEG puede reducir 1/2, 1/4, 1/8 al leer
+            image.draft("RGB", (target_width, max(1, image.height * target_width // image.width)))
+        image.load()
+        derivative = resample_for_report(image, width_inches, dpi)
+    data, extension = encode_report_image(derivative, jpeg_quality)
+    path = os.path.join(media_dir, f"b{index:06d}{extension}")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path, derivative.size, original_size, hashlib.sha1(data).hexdigest()
+
+
+class BatchReportBuilder:
+    """Reconstruye un reporte Word (y opcionalmente PDF) desde imágenes en disco.
+
+    Las imágenes se decodifican, remuestrean y recomprimen en un pool de
+    procesos; los resultados se añaden al reporte en orden de captura con
+    una ventana acotada de trabajos en vuelo, así que la memoria no depende
+    del número de imágenes. El ensamblado usa StreamingReportWriter, igual
+    que una sesión en vivo.
+    """
+
+    def __init__(self, docx_path, width_inches=6, dpi=150, jpeg_quality=80, workers=None,
+                 title="Reporte de Capturas de Pantalla"):
+        self.docx_path = docx_path
+        self.width_inches = width_inches
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.title = title
+        self.unique = 0
+        self.reused = 0
+        self.failed = []
+
+    def build(self, items, pdf_path=None, progress=None, source=None):
+        """items: [(ruta, hora)] en orden. progress(hechas, total). Devuelve la ruta del .docx."""
+        if not items:
+            raise ValueError("No hay imágenes para el reporte")
+        writer = StreamingReportWriter(self.docx_path, embed_dpi=self.dpi)
+        media_dir = writer.embedder.media_dir
+        os.makedirs(media_dir, exist_ok=True)
+        writer.add_heading(self.title, 0)
+        writer.add_paragraph(f'Fecha: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+        if source:
+            writer.add_paragraph(f'Reconstruido desde: {source}')
+        writer.add_paragraph(f'Capturas: {len(items)}')
+        writer.add_paragraph('_' * 40)
+
+        by_digest = {}
+        try:
+            jobs = ((i, path, media_dir, self.width_inches, self.dpi, self.jpeg_quality)
+                    for i, (path, _) in enumerate(items))
+            for i, result in enumerate(self._run(jobs)):
+                path, timestamp = items[i]
+                if isinstance(result, Exception):
+                    self.failed.append((path, result))
+                    writer.add_paragraph(f'No se pudo incluir {os.path.basename(path)}: {result}')
+                else:
+                    media_path, size, _, digest = result
+                    if digest in by_digest:
+                        # Idéntica a una anterior: una sola imagen en el .docx
+                        os.remove(media_path)
+                        media_path = by_digest[digest]
+                        self.reused += 1
+                    else:
+                        by_digest[digest] = media_path
+                        self.unique += 1
+                    writer.add_heading(f'Captura #{i + 1} - {timestamp.strftime("%Y%m%d_%H%M%S")}', level=1)
+                    writer.add_picture(media_path, width_inches=self.width_inches, size=size, original=path)
+                if progress:
+                    progress(i + 1, len(items))
+            with METRICS.time("save"):
+                writer.finalize(pdf_path=pdf_path)
+        except BaseException:
+            # El diario queda en disco: recover() puede terminar el .docx
+            writer.close()
+            raise
+        return self.docx_path
+
+    def _run(self, jobs):
+        """Resultados (o excepciones) en el orden de los trabajos, con 2×workers en vuelo."""
+        if self.workers == 1:
+            for job in jobs:
+                try:
+                    yield _batch_report_job(job)
+                except Exception as e:
+                    yield e
+            return
+        from concurrent.futures import ProcessPoolExecutor
+
+        window = deque()
+        with ProcessPoolExecutor(self.workers) as pool:
+            for job in jobs:
+                window.append(pool.submit(_batch_report_job, job))
+                if len(window) >= self.workers * 2:
+                    yield self._result(window.popleft())
+            while window:
+                yield self._result(window.popleft())
+
+    @staticmethod
+    def _result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+
+# ================== HISTORIAL DE CAPTURAS ==================
+
+THUMBNAIL_CACHE_DIR = ".snapmaster_thumbs"
+HISTORY_THUMB_SIZE = (160, 100)
+HISTORY_CACHE_BYTES = 64 * 1024 * 1024
+HISTORY_CURRENT = "Sesión actual"
+HISTORY_ALL = "Toda la carpeta"
+
+
+class ThumbnailCache:
+    """Miniaturas del historial: en memoria (LRU acotada en bytes) y en disco.
+
+    En disco van como JPEG pequeños en <carpeta>/.snapmaster_thumbs, con un
+    nombre derivado de (ruta, tamaño, mtime): si la captura cambia, la
+    miniatura vieja deja de usarse. La imagen original solo se decodifica la
+    primera vez, y thumbnail() usa draft() en JPEG (escalado DCT) y reduce()
+    en el resto.
+    """
+
+    def __init__(self, folder, size=HISTORY_THUMB_SIZE, memory_bytes=HISTORY_CACHE_BYTES):
+        self.folder = folder
+        self.cache_dir = os.path.join(folder, THUMBNAIL_CACHE_DIR)
+        self.size = size
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.decoded = 0
+        self.evicted = 0
+
+    def get(self, path):
+        """Miniatura en memoria o None (no toca el disco: apto para el hilo de Tk)."""
+        with self._lock:
+            image = self._memory.get(path)
+            if image is not None:
+                self._memory.move_to_end(path)
+                self.hits += 1
+            return image
+
+    def load(self, path):
+        """Miniatura de `path`: memoria, caché en disco o decodificando el original."""
+        image = self.get(path)
+        if image is not None:
+            return image
+        from PIL import Image
+
+        disk_path = self.disk_path(path)
+        try:
+            with Image.open(disk_path) as cached:
+                image = cached.convert("RGB")
+            self.disk_hits += 1
+        except FileNotFoundError:
+            with Image.open(path) as original:
+                original.thumbnail(self.size)
+                image = original.convert("RGB")
+            self.decoded += 1
+            self._write(disk_path, image)
+        self._remember(path, image)
+        return image
+
+    def put(self, path, image):
+        """Guarda la miniatura de una captura recién hecha (evita releerla del disco)."""
+        image = image.copy()
+        image.thumbnail(self.size)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        self._write(self.disk_path(path), image)
+        self._remember(path, image)
+        return image
+
+    def disk_path(self, path):
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        name = hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+        # Subcarpetas por prefijo: con 50.000 capturas ninguna pasa de unos cientos
+        return os.path.join(self.cache_dir, name[:2], name + ".jpg")
+
+    def _write(self, disk_path, image):
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        temp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        image.save(temp_path, format="JPEG", quality=80)
+        os.replace(temp_path, disk_path)
+
+    def _remember(self, path, image):
+        cost = image.width * image.height * 3
+        with self._lock:
+            previous = self._memory.pop(path, None)
+            if previous is not None:
+                self._bytes -= previous.width * previous.height * 3
+            self._memory[path] = image
+            self._bytes += cost
+            while self._bytes > self.memory_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._bytes -= old.width * old.height * 3
+                self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._memory), "bytes": self._bytes, "hits": self.hits,
+                    "disk_hits": self.disk_hits, "decoded": self.decoded, "evicted": self.evicted}
+
+
+class ThumbnailLoader:
+    """Hilos que cargan en segundo plano solo las miniaturas visibles.
+
+    request(paths) reemplaza la petición anterior: al desplazarse, lo que
+    dejó de verse y aún no se cargó se descarta. on_ready(ruta, imagen) se
+    llama desde el hilo del cargador (imagen None si no se pudo leer).
+    """
+
+    def __init__(self, cache, on_ready, workers=2):
+        self.cache = cache
+        self.on_ready = on_ready
+        self.workers = max(1, workers)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._failed = set()
+
+    def start(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f"thumbs-{i}", daemon=True).start()
+        return self
+
+    def request(self, paths):
+        with self._cond:
+            self._queue = deque(path for path in paths if path not in self._failed)
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path = self._queue.popleft()
+            try:
+                image = self.cache.load(path)
+            except Exception:
+                with self._cond:
+                    self._failed.add(path)
+                image = None
+            self.on_ready(path, image)
+
+
+def history_items(folder, session_ids=None):
+    """[(ruta, hora)] de las capturas de la carpeta o de las sesiones indicadas."""
+    if not session_ids:
+        return report_items_from_folder(folder)
+    items = []
+    for session_id in session_ids:
+        items.extend(report_items_from_folder(folder, session=session_id))
+    items.sort(key=lambda item: item[1])
+    return items
+
+
+def open_with_system(path):
+    """Abre un archivo con el programa predeterminado del sistema."""
+    if sys.platform == "win32":
+        os.startfile(path)
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", path])
+    else:
+        subprocess.Popen(["xdg-open", path])
+
+# ================== SUBIDA EN SEGUNDO PLANO ==================
+
+UPLOAD_QUEUE_FILE = os.path.join(APP_DIR, "upload_queue.sqlite3")
+UPLOAD_WORKERS = 2
+UPLOAD_BATCH = 8
+UPLOAD_MAX_ATTEMPTS = 8
+UPLOAD_BLOCK = 1024 * 1024
+
+_UPLOAD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    path TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    added TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_due ON uploads(endpoint, status, next_try);
+"""
+
+
+class UploadEndpoint:
+    """Destino de la subida: cada archivo es un PUT de un objeto.
+
+    - http(s)://host[:puerto]/prefijo: PUT a /prefijo/clave; con token se
+      envía "Authorization: Bearer <token>" (SNAPMASTER_UPLOAD_TOKEN).
+    - s3://bucket/prefijo: API S3 firmada con SigV4 (AWS_ACCESS_KEY_ID,
+      AWS_SECRET_ACCESS_KEY, AWS_REGION). Con `endpoint` (o
+      SNAPMASTER_S3_ENDPOINT, p. ej. http://localhost:9000 para MinIO) se
+      usan rutas /bucket/clave; si no, el host virtual de AWS.
+
+    Los errores de red y las respuestas 5xx, 408 y 429 lanzan OSError (se
+    reintenta); el resto de respuestas no 2xx lanzan ValueError (no tiene
+    sentido reintentar).
+    """
+
+    def __init__(self, url, token=None, endpoint=None, region=None, access_key=None, secret_key=None):
+        from urllib.parse import urlsplit
+
+        self.url = url
+        parts = urlsplit(url)
+        self.s3 = parts.scheme == "s3"
+        prefix = parts.path.strip("/")
+        if self.s3:
+            bucket = parts.netloc
+            if not bucket:
+                raise ValueError(f"Falta el bucket en {url}")
+            self.region = region or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+            self.access_key = access_key or os.getenv("AWS_ACCESS_KEY_ID")
+            self.secret_key = secret_key or os.getenv("AWS_SECRET_ACCESS_KEY")
+            if not (self.access_key and self.secret_key):
+                raise ValueError("Faltan las credenciales S3 (AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY)")
+            endpoint = endpoint or os.getenv("SNAPMASTER_S3_ENDPOINT")
+            if endpoint:
+                parts = urlsplit(endpoint)
+                prefix = "/".join(p for p in (bucket, prefix) if p)
+            else:
+                parts = urlsplit(f"https://{bucket}.s3.{self.region}.amazonaws.com")
+            self.token = None
+        elif parts.scheme in ("http", "https"):
+            self.token = token or os.getenv("SNAPMASTER_UPLOAD_TOKEN")
+        else:
+            raise ValueError(f"Destino de subida no soportado: {url} (use http://, https:// o s3://)")
+        if not parts.hostname:
+            raise ValueError(f"Falta el servidor en {url}")
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.netloc = parts.netloc
+        self.prefix = prefix
+
+    def connect(self, timeout=60):
+        import http.client
+
+        cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout)
+
+    def object_path(self, key):
+        from urllib.parse import quote
+
+        return "/" + quote("/".join(p for p in (self.prefix, key.strip("/")) if p), safe="/-_.~")
+
+    def put(self, connection, key, path):
+        """Sube un archivo por una conexión abierta (keep-alive). Devuelve los bytes enviados."""
+        import mimetypes
+
+        size = os.path.getsize(path)
+        target = self.object_path(key)
+        headers = {"Content-Length": str(size),
+                   "Content-Type": mimetypes.guess_type(path)[0] or "application/octet-stream"}
+        if self.s3:
+            headers.update(self._s3_headers("PUT", target, _file_sha256(path)))
+        elif self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        with open(path, "rb") as body:
+            connection.request("PUT", target, body=body, headers=headers)
+            response = connection.getresponse()
+            detail = response.read(512)
+            # Se lee la respuesta entera para poder reutilizar la conexión
+            response.read()
+        if 200 <= response.status < 300:
+            return size
+        message = f"HTTP {response.status} {response.reason}: {detail.decode('utf-8', 'replace').strip()}"
+        if response.status >= 500 or response.status in (408, 429):
+            raise OSError(message)
+        raise ValueError(message)
+
+    def _s3_headers(self, method, target, payload_hash, now=None):
+        """Cabeceras de autenticación AWS Signature Version 4."""
+        import hmac
+        from datetime import timezone
+
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        day = now.strftime("%Y%m%d")
+        headers = {"host": self.netloc, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+        signed = ";".join(sorted(headers))
+        canonical = "\n".join([method, target, "", *(f"{name}:{headers[name]}" for name in sorted(headers)),
+                               "", signed, payload_hash])
+        scope = f"{day}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                             hashlib.sha256(canonical.encode("utf-8")).hexdigest()])
+        key = ("AWS4" + self.secret_key).encode("utf-8")
+        for part in (day, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        signature = hmac.new(key, to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        return {
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+            "Authorization": f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                             f"SignedHeaders={signed}, Signature={signature}",
+        }
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BackgroundUploader:
+    """Sube capturas y reportes en segundo plano, con cola persistente.
+
+    enqueue() solo añade la ruta a una lista en memoria: nunca toca disco ni
+    red, así que se puede llamar desde la etapa de reporte sin frenar la
+    captura. Los hilos de subida (`workers`, concurrencia acotada) pasan esas
+    rutas a una cola SQLite, toman lotes de hasta `batch_size` archivos y los
+    suben seguidos por su propia conexión keep-alive, confirmando cada lote
+    en una sola transacción. Los fallos transitorios se reintentan con
+    espera exponencial (con jitter) hasta `max_attempts`; la cola sobrevive
+    a reinicios y lo pendiente se retoma al arrancar (cada destino solo ve
+    sus propias entradas).
+    """
+
+    def __init__(self, endpoint, queue_path=UPLOAD_QUEUE_FILE, workers=UPLOAD_WORKERS, batch_size=UPLOAD_BATCH,
+                 max_attempts=UPLOAD_MAX_ATTEMPTS, backoff=2.0, max_backoff=300.0, clock=time.time):
+        import sqlite3
+
+        self.endpoint = endpoint
+        self.queue_path = queue_path
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._incoming = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._active = 0
+        self._threads = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(queue_path)), exist_ok=True)
+        self._db = sqlite3.connect(queue_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_UPLOAD_SCHEMA)
+        # Lo que estaba subiéndose cuando se cerró el proceso vuelve a la cola
+        self._db.execute("UPDATE uploads SET status = 'pending' WHERE status = 'active' AND endpoint = ?",
+                         (endpoint.url,))
+        self.uploaded = 0
+        self.bytes = 0
+        self.retries = 0
+        self._running = 0
+        self._stopping = False
+        self._final_counts = {}
+
+    def start(self):
+        self._running = self.workers
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"upload-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def enqueue(self, path, key=None):
+        """Añade un archivo a la cola (no bloquea). `key` = nombre remoto (por defecto el del archivo)."""
+        if not path:
+            return
+        with self._cond:
+            self._incoming.append((os.path.abspath(path), key or os.path.basename(path)))
+            self._cond.notify()
+
+    def stop(self, timeout=5):
+        """Detiene los hilos; lo pendiente queda en la cola para el próximo arranque.
+
+        Un hilo que tras `timeout` siga a mitad de un archivo lo termina, lo
+        confirma y es él quien cierra la cola al salir.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._persist_incoming()
+        with self._lock:
+            self._stopping = True
+            if not self._running:
+                self._close_db()
+
+    def _close_db(self):
+        # Se llama con _lock tomado
+        if self._db is not None:
+            self._final_counts = self._count_rows()
+            self._db.close()
+            self._db = None
+
+    def _count_rows(self):
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM uploads WHERE endpoint = ? GROUP BY status",
+                                     (self.endpoint.url,)).fetchall())
+
+    def drain(self, timeout=None):
+        """Espera a que no quede nada pendiente. False si venció `timeout`."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                busy = self._incoming or self._active
+            if not busy and not self.stats()["pending"]:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def retry_failed(self):
+        with self._lock:
+            count = self._db.execute("UPDATE uploads SET status = 'pending', attempts = 0, next_try = 0 "
+                                     "WHERE status = 'failed' AND endpoint = ?", (self.endpoint.url,)).rowcount
+        with self._cond:
+            self._cond.notify_all()
+        return count
+
+    def stats(self):
+        with self._lock:
+            counts = self._count_rows() if self._db is not None else self._final_counts
+            uploaded, sent, retries = self.uploaded, self.bytes, self.retries
+        with self._cond:
+            queued = len(self._incoming)
+        return {"pending": counts.get("pending", 0) + counts.get("active", 0) + queued,
+                "failed": counts.get("failed", 0), "uploaded": uploaded, "bytes": sent, "retries": retries}
+
+    def failures(self):
+        with self._lock:
+            if self._db is None:
+                return []
+            return self._db.execute("SELECT path, error FROM uploads WHERE status = 'failed' AND endpoint = ? "
+                                    "ORDER BY id", (self.endpoint.url,)).fetchall()
+
+    def _persist_incoming(self):
+        # Se toma _lock antes de vaciar la lista: stats() nunca ve una entrada
+        # que ya no está en memoria pero todavía no está en la cola
+        with self._lock:
+            with self._cond:
+                items, self._incoming = list(self._incoming), deque()
+            if not items:
+                return
+            added = _catalog_time(datetime.now())
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("INSERT INTO uploads(endpoint, path, key, added) VALUES (?, ?, ?, ?)",
+                                 [(self.endpoint.url, path, key, added) for path, key in items])
+            self._db.execute("COMMIT")
+
+    def _claim(self):
+        """Toma un lote de entradas vencidas y las marca como activas. Devuelve (lote, próxima)."""
+        now = self.clock()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT id, path, key, attempts FROM uploads WHERE endpoint = ? AND status = 'pending' "
+                    "AND next_try <= ? ORDER BY id LIMIT ?", (self.endpoint.url, now, self.batch_size)).fetchall()
+                self._db.executemany("UPDATE uploads SET status = 'active' WHERE id = ?",
+                                     [(row[0],) for row in rows])
+                upcoming = None
+                if not rows:
+                    upcoming = self._db.execute("SELECT MIN(next_try) FROM uploads WHERE endpoint = ? "
+                                                "AND status = 'pending'", (self.endpoint.url,)).fetchone()[0]
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows, upcoming
+
+    def _finish(self, results):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            for upload_id, status, attempts, next_try, error in results:
+                if status == "done":
+                    # La cola solo guarda lo pendiente y lo fallido
+                    self._db.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+                    continue
+                self._db.execute("UPDATE uploads SET status = ?, attempts = ?, next_try = ?, error = ? WHERE id = ?",
+                                 (status, attempts, next_try, error, upload_id))
+            self._db.execute("COMMIT")
+
+    def _delay(self, attempts):
+        # Espera exponencial con jitter: varios equipos no reintentan a la vez
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def _worker_loop(self):
+        try:
+            self._upload_loop()
+        finally:
+            with self._lock:
+                self._running -= 1
+                if self._stopping and not self._running:
+                    self._close_db()
+
+    def _upload_loop(self):
+        connection = None
+        while True:
+            self._persist_incoming()
+            with self._cond:
+                if self._closed:
+                    break
+            rows, upcoming = self._claim()
+            if not rows:
+                wait = 1.0 if upcoming is None else max(0.05, min(1.0, upcoming - self.clock()))
+                with self._cond:
+                    if not self._incoming and not self._closed:
+                        self._cond.wait(wait)
+                continue
+            with self._cond:
+                self._active += 1
+            results = []
+            try:
+                for upload_id, path, key, attempts in rows:
+                    if self._closed:
+                        # Al detener no se empiezan más archivos: el resto vuelve a la cola
+                        break
+                    attempts += 1
+                    try:
+                        if connection is None:
+                            connection = self.endpoint.connect()
+                        with METRICS.time("upload"):
+                            sent = self.endpoint.put(connection, key, path)
+                    except FileNotFoundError as e:
+                        results.append((upload_id, "failed", attempts, 0, f"No existe: {e.filename}"))
+                    except ValueError as e:
+                        results.append((upload_id, "failed", attempts, 0, str(e)))
+                    except Exception as e:
+                        # Conexión rota o error del servidor: se descarta la conexión y se reintenta
+                        if connection is not None:
+                            connection.close()
+                            connection = None
+                        if attempts >= self.max_attempts:
+                            results.append((upload_id, "failed", attempts, 0, str(e)))
+                        else:
+                            with self._lock:
+                                self.retries += 1
+                            METRICS.counter("upload_retries", "Reintentos de subida").inc()
+                            results.append((upload_id, "pending", attempts,
+                                            self.clock() + self._delay(attempts), str(e)))
+                    else:
+                        with self._lock:
+                            self.uploaded += 1
+                            self.bytes += sent
+                        METRICS.counter("uploads", "Archivos subidos").inc()
+                        METRICS.counter("upload_bytes", "Bytes subidos").inc(sent)
+                        results.append((upload_id, "done", attempts, 0, None))
+            finally:
+                self._finish(results + [(row[0], "pending", row[3], 0, None) for row in rows[len(results):]])
+                with self._cond:
+                    self._active -= 1
+        if connection is not None:
+            connection.close()
+
+
+def upload_key(path, root):
+    """Nombre remoto de un archivo: su ruta relativa a `root`, con '/'."""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(path)
+    return relative.replace(os.sep, "/")
+
+# ================== SESIÓN DE CAPTURA (SIN INTERFAZ) ==================
+
+def get_unique_filename(base_path, extension="", companions=()):
+    """Ruta libre para base_path + extension, añadiendo _01, _02... si hace falta.
+
+    companions: sufijos que tampoco deben existir (p. ej. ".journal").
+    Las sesiones con catálogo usan SessionCatalog.allocate_name en su lugar.
+    """
+    if not _path_taken(base_path + extension, companions):
+        return base_path + extension
+    counter = 1
+    while True:
+        new_path = f"{base_path}_{counter:02d}{extension}"
+        if not _path_taken(new_path, companions):
+            return new_path
+        counter += 1
+
+
+def recover_orphan_reports(folder, journals=None):
+    """Regenera los Word de sesiones que no se cerraron bien. Devuelve mensajes.
+
+    journals: diarios ya encontrados con find_orphan_journals (si no, se buscan).
+    """
+    messages = []
+    if journals is None:
+        journals = StreamingReportWriter.find_orphan_journals(folder)
+    for journal in journals:
+        try:
+            docx_path = StreamingReportWriter.recover(journal)
+            messages.append(f"Reporte recuperado: {os.path.basename(docx_path)}")
+        except Exception as e:
+            messages.append(f"No se pudo recuperar {os.path.basename(journal)}: {e}")
+    return messages
+
+
+class CaptureConfig:
+    """Parámetros de una sesión de captura (los mismos que ofrece la interfaz)."""
+
+    def __init__(self, save_path=None, base_name="captura", word_name="reporte_capturas",
+                 interval=5.0, image_format="PNG", codec_profile="balanced",
+                 backpressure="drop_oldest", missed_policy="skip", skip_unchanged=True,
+                 change_threshold=0.005, change_mode="diff", unchanged_action="drop",
+                 video_session=False, report=True, pdf=False, backend=None, catalog=True,
+                 retention=None):
+        self.save_path = save_path or os.path.expanduser("~/Desktop")
+        self.base_name = base_name
+        self.word_name = word_name
+        self.interval = interval
+        self.image_format = image_format
+        self.codec_profile = codec_profile
+        self.backpressure = backpressure
+        self.missed_policy = missed_policy
+        self.skip_unchanged = skip_unchanged
+        # Fracción (0..1) de píxeles que deben cambiar
+        self.change_threshold = change_threshold
+        self.change_mode = change_mode
+        self.unchanged_action = unchanged_action
+        self.video_session = video_session
+        self.report = report
+        self.pdf = pdf
+        self.backend = backend
+        # Índice SQLite de la carpeta (ver SessionCatalog)
+        self.catalog = catalog
+        # RetentionPolicy para capturas desatendidas (None = sin límites)
+        self.retention = retention
+        # CaptureTarget (monitor o región); None = escritorio completo
+        self.target = None
+        # Límite de capturas (None = sin límite); lo usa la CLI
+        self.max_captures = None
+        # Disparo por actividad: nombres de TRIGGER_KINDS o ActivitySource
+        # inyectadas. Con disparadores, `interval` es el periodo de ráfaga.
+        self.triggers = ()
+        self.debounce = TRIGGER_DEBOUNCE
+        self.heartbeat = TRIGGER_HEARTBEAT
+        # Guardar las capturas en un único .snaparc en vez de archivos sueltos
+        self.archive = False
+        # BackgroundUploader que recibe capturas y reportes (None = sin subida).
+        # Lo crea y lo detiene el llamador: sobrevive a varias sesiones.
+        self.uploader = None
+
+    def schedule_text(self):
+        """Descripción del disparo para los mensajes de estado."""
+        if not self.triggers:
+            return f"cada {self.interval} segundos"
+        names = ", ".join(trigger if isinstance(trigger, str) else trigger.kind for trigger in self.triggers)
+        heartbeat = f", latido {self.heartbeat} s" if self.heartbeat else ""
+        return f"por actividad ({names}; ráfaga {self.interval} s{heartbeat})"
+
+    def validate(self):
+        if not os.path.exists(self.save_path):
+            raise ValueError("La ruta especificada no existe")
+        if not self.base_name.strip():
+            raise ValueError("Debe especificar un nombre base")
+        if self.report and not self.word_name.strip():
+            raise ValueError("Debe especificar un nombre para el documento Word")
+        if self.archive and self.video_session:
+            raise ValueError("El archivo de sesión no se puede combinar con la sesión de vídeo")
+        if self.archive and self.retention:
+            raise ValueError("El archivo de sesión es de solo anexado: no admite retención")
+        for trigger in self.triggers:
+            if isinstance(trigger, str) and trigger not in TRIGGER_KINDS:
+                raise ValueError(f"Disparador desconocido: {trigger} (use {', '.join(TRIGGER_KINDS)})")
+
+
+class CaptureTarget:
+    """Qué parte del escritorio captura un flujo y con qué intervalo y formato.
+
+    Formato de texto (CLI e interfaz): TIPO[:ARGS][/clave=valor...]
+      screen                          escritorio completo
+      monitor:2/interval=5            solo el monitor 2
+      region:0,0,1280,720/format=JPG/name=editor
+    Claves: name, interval, format, profile. Lo que no se indique se toma de
+    la configuración general.
+    """
+
+    OPTIONS = ("name", "interval", "format", "profile")
+
+    def __init__(self, name, monitor=None, region=None, interval=None, image_format=None, codec_profile=None):
+        self.name = name
+        self.monitor = monitor
+        self.region = region
+        self.interval = interval
+        self.image_format = image_format
+        self.codec_profile = codec_profile
+
+    @classmethod
+    def parse(cls, spec):
+        kind, *options = spec.strip().split("/")
+        kind, _, args = kind.partition(":")
+        kind = kind.strip().lower()
+        if kind == "screen":
+            target = cls("pantalla")
+        elif kind == "monitor":
+            if not args.strip().isdigit():
+                raise ValueError(f"Objetivo no válido: {spec} (use monitor:N)")
+            target = cls(f"monitor{int(args)}", monitor=int(args))
+        elif kind == "region":
+            try:
+                region = tuple(int(v) for v in args.split(","))
+            except ValueError:
+                region = ()
+            if len(region) != 4 or region[2] <= 0 or region[3] <= 0:
+                raise ValueError(f"Objetivo no válido: {spec} (use region:x,y,ancho,alto)")
+            target = cls(f"region{region[0]}x{region[1]}", region=region)
+        else:
+            raise ValueError(f"Objetivo no válido: {spec} (screen, monitor:N o region:x,y,ancho,alto)")
+        for option in options:
+            key, _, value = option.partition("=")
+            key = key.strip().lower()
+            if key not in cls.OPTIONS or not value:
+                raise ValueError(f"Opción de objetivo no válida: {option} ({', '.join(cls.OPTIONS)})")
+            if key == "name":
+                target.name = value.strip()
+            elif key == "interval":
+                target.interval = float(value)
+            elif key == "format":
+                target.image_format = value.strip().upper()
+                if target.image_format != "AUTO" and target.image_format not in CODEC_FORMATS:
+                    raise ValueError(f"Formato desconocido: {value}")
+            else:
+                if value not in CODEC_PROFILES:
+                    raise ValueError(f"Perfil desconocido: {value}")
+                target.codec_profile = value
+        return target
+
+    def apply(self, config):
+        """Copia de `config` para este objetivo, con nombres de salida propios."""
+        import copy
+
+        target_config = copy.copy(config)
+        target_config.target = self
+        target_config.base_name = f"{config.base_name}_{self.name}"
+        target_config.word_name = f"{config.word_name}_{self.name}" if config.word_name else ""
+        if self.interval is not None:
+            target_config.interval = self.interval
+        if self.image_format:
+            target_config.image_format = self.image_format
+        if self.codec_profile:
+            target_config.codec_profile = self.codec_profile
+        return target_config
+
+
+class MultiCaptureSession:
+    """Varios CaptureTarget a la vez, cada uno con su CaptureSession.
+
+    Cada objetivo tiene su propio hilo de captura, planificador, pipeline y
+    reporte; comparten el CaptureManager (mss abre un manejador por hilo),
+    así que los objetivos se capturan en paralelo. Los planificadores se
+    alinean al reloj, de modo que objetivos con el mismo intervalo disparan
+    en el mismo instante.
+    """
+
+    def __init__(self, config, targets, manager_factory=None, on_frame=None, on_error=None):
+        if not targets:
+            raise ValueError("No hay objetivos de captura")
+        names = [target.name for target in targets]
+        if len(set(names)) != len(names):
+            raise ValueError("Los objetivos deben tener nombres distintos (use /name=...)")
+        self.config = config
+        self.targets = targets
+        self.sessions = [CaptureSession(target.apply(config), manager_factory=manager_factory,
+                                        on_frame=on_frame, on_error=on_error) for target in targets]
+        # Una sola retención para la carpeta: el límite es de la carpeta, no de cada objetivo
+        self.retention = None
+
+    @property
+    def capturing(self):
+        return any(session.capturing for session in self.sessions)
+
+    @property
+    def paused(self):
+        return all(session.paused for session in self.sessions)
+
+    @paused.setter
+    def paused(self, value):
+        for session in self.sessions:
+            session.paused = value
+
+    @property
+    def saved_count(self):
+        return sum(session.saved_count for session in self.sessions)
+
+    @property
+    def on_frame(self):
+        return self.sessions[0].on_frame
+
+    @on_frame.setter
+    def on_frame(self, callback):
+        for session in self.sessions:
+            session.on_frame = callback
+
+    # La interfaz ofrece el Word y el vídeo del primer objetivo (botones PDF y exportar)
+    @property
+    def word_path(self):
+        return self.sessions[0].word_path
+
+    @property
+    def timelapse_path(self):
+        return self.sessions[0].timelapse_path
+
+    @property
+    def timelapse(self):
+        return self.sessions[0].timelapse
+
+    def counter_text(self):
+        dropped = sum(session.pipeline.dropped for session in self.sessions if session.pipeline)
+        text = f"Capturas: {self.saved_count} ({len(self.sessions)} objetivos)"
+        if dropped:
+            text += f" (descartadas: {dropped})"
+        return text
+
+    def status_text(self, frame):
+        for session in self.sessions:
+            if session.config.target is frame.target:
+                return f"[{frame.target.name}] {session.status_text(frame)}"
+        return ""
+
+    def start(self):
+        self.config.validate()
+        if self.config.retention:
+            self.retention = RetentionManager(self.config.save_path, self.config.retention).start()
+        started = []
+        try:
+            for session in self.sessions:
+                session.shared_retention = self.retention
+                session.start()
+                started.append(session)
+        except Exception:
+            for session in started:
+                session.abort()
+            self.stop_retention()
+            raise
+
+    def stop_retention(self):
+        """Detiene la retención compartida. Devuelve el mensaje de resumen (o "")."""
+        retention, self.retention = self.retention, None
+        if not retention:
+            return ""
+        retention.stop()
+        return f"Retención: {retention.evicted} capturas antiguas borradas" if retention.evicted else ""
+
+    def request_stop(self):
+        for session in self.sessions:
+            session.request_stop()
+
+    def trigger(self, detail=None):
+        return any([session.trigger(detail) for session in self.sessions])
+
+    def stop(self):
+        self.request_stop()
+        messages = [f"[{session.config.target.name}] {session.stop()}" for session in self.sessions]
+        retention = self.stop_retention()
+        if retention:
+            messages.append(retention)
+        return " | ".join(messages)
+
+    def abort(self):
+        for session in self.sessions:
+            session.abort()
+        self.stop_retention()
+
+    def status(self):
+        return {"capturing": self.capturing, "paused": self.paused, "saved": self.saved_count,
+                "targets": {session.config.target.name: session.status() for session in self.sessions}}
+
+
+def create_capture_session(config, targets=None, **kwargs):
+    """CaptureSession para un objetivo (o ninguno) y MultiCaptureSession para varios."""
+    if targets and len(targets) > 1:
+        return MultiCaptureSession(config, targets, **kwargs)
+    if targets:
+        config = targets[0].apply(config)
+    return CaptureSession(config, **kwargs)
+
+
+class CaptureSession:
+    """Planificador + pipeline + reporte de una sesión, sin depender de Tkinter.
+
+    La interfaz gráfica y la línea de comandos usan esta misma clase; solo
+    cambian los callbacks: on_frame(frame) tras guardar cada captura (en el
+    hilo de reporte) y on_error(mensaje, fatal) ante errores. manager_factory
+    permite reutilizar el CaptureManager del llamador (se crea en el hilo de
+    captura, no en el que arranca la sesión).
+    """
+
+    def __init__(self, config, manager_factory=None, on_frame=None, on_error=None):
+        self.config = config
+        self.manager_factory = manager_factory
+        self.capture_manager = None
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.capturing = False
+        self.paused = False
+        self.capture_thread = None
+        self.counter = 0
+        self.saved_count = 0
+        self.pipeline = None
+        self.scheduler = None
+        self.change_detector = None
+        self.codec_engine = None
+        self.document = None
+        self.word_path = ""
+        self.pdf_path = ""
+        self.timelapse = None
+        self.timelapse_path = ""
+        self.archive = None
+        self.archive_path = ""
+        self.started_at = None
+        self.catalog = None
+        self.session_id = None
+        self.unique_path = get_unique_filename
+        self.retention = None
+        # RetentionManager de MultiCaptureSession: se usa pero no se crea ni se detiene aquí
+        self.shared_retention = None
+        self.frame_pool = None
+        self._region = None
+
+    def start(self, scheduled=True):
+        """Arranca la sesión; con scheduled=False no hay planificador y el
+        llamador invoca take_screenshot() directamente (benchmarks)."""
+        config = self.config
+        config.validate()
+        # Antes de crear archivos: un disparador no disponible no deja un Word huérfano
+        self.scheduler = self.create_scheduler() if scheduled else None
+        self.capturing = True
+        self.counter = 0
+        self.saved_count = 0
+        self.started_at = datetime.now()
+        timestamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+        if config.catalog:
+            self.catalog = SessionCatalog(config.save_path)
+            self.unique_path = self.catalog.allocate_name
+        self.retention = self.shared_retention
+        if config.retention and self.retention is None:
+            self.retention = RetentionManager(config.save_path, config.retention).start()
+        self.codec_engine = CodecEngine(config.image_format, config.codec_profile)
+        if config.report:
+            self.create_word_document()
+        self.timelapse = None
+        if config.video_session:
+            self.timelapse_path = self.unique_path(
+                os.path.join(config.save_path, f"{config.base_name}_{timestamp}"), ".mp4")
+            self.timelapse = TimelapseSession(self.timelapse_path)
+        settings = {"interval": config.interval, "format": config.image_format, "profile": config.codec_profile}
+        self.archive = None
+        if config.archive:
+            self.archive_path = self.unique_path(
+                os.path.join(config.save_path, f"{config.base_name}_{timestamp}"), ARCHIVE_EXTENSION,
+                companions=(ARCHIVE_INDEX_SUFFIX,))
+            self.archive = SessionArchiveWriter(self.archive_path, dict(
+                settings, name=f"{config.base_name}_{timestamp}", started=self.started_at.isoformat()))
+            settings["archive"] = self.archive_path
+        if self.catalog:
+            self.session_id = self.catalog.begin_session(
+                f"{config.base_name}_{timestamp}", word_path=self.word_path, video_path=self.timelapse_path,
+                settings=settings)
+        # Sin NumPy se captura como antes, una imagen PIL nueva por tick
+        self.frame_pool = FrameBufferPool() if FrameBufferPool.available() else None
+        self.pipeline = CapturePipeline(self.encode_capture, self.commit_capture,
+                                        policy=config.backpressure, on_error=self.on_pipeline_error,
+                                        on_drop=CaptureFrame.release)
+        self.pipeline.start()
+        self.change_detector = None
+        if config.skip_unchanged:
+            self.change_detector = ChangeDetector(threshold=config.change_threshold, mode=config.change_mode)
+        self.capture_thread = None
+        if scheduled:
+            self.capture_thread = threading.Thread(target=self.capture_loop, name="capture", daemon=True)
+            self.capture_thread.start()
+
+    def create_scheduler(self):
+        """Temporizador fijo o, si config.triggers no está vacío, disparo por actividad."""
+        config = self.config
+        if not config.triggers:
+            return CaptureScheduler(config.interval, policy=config.missed_policy)
+        sources = [self.activity_source(trigger) for trigger in config.triggers]
+        return ActivityScheduler(sources, burst_interval=config.interval, debounce=config.debounce,
+                                 heartbeat=config.heartbeat)
+
+    def activity_source(self, trigger):
+        if isinstance(trigger, ActivitySource):
+            return trigger
+        if trigger == "screen":
+            # La sonda mira el mismo objetivo que la sesión, sin pasar por el pool
+            return ScreenChangeSource(lambda: self.get_capture_manager().grab(self.target_region()),
+                                      threshold=self.config.change_threshold)
+        return create_activity_source(trigger)
+
+    def trigger(self, detail=None):
+        """Evento de actividad manual. False si la sesión usa el temporizador fijo."""
+        if not isinstance(self.scheduler, ActivityScheduler):
+            return False
+        self.scheduler.notify("manual", detail)
+        return True
+
+    def request_stop(self):
+        """Detiene los ticks sin esperar (seguro desde un manejador de señal)."""
+        self.capturing = False
+        if self.scheduler:
+            self.scheduler.stop()
+
+    def stop(self):
+        """Detiene la captura, vacía el pipeline y cierra el reporte. Devuelve un resumen."""
+        self.request_stop()
+        # El planificador ya está detenido: el hilo de captura sale enseguida
+        if self.capture_thread:
+            self.capture_thread.join()
+        if self.pipeline:
+            self.pipeline.stop(drain=True)
+        messages = []
+        if self.archive:
+            self.archive.close()
+            messages.append(f"Archivo de sesión guardado en: {self.archive_path} ({self.archive.frames} capturas)")
+        if self.timelapse:
+            self.timelapse.close()
+            messages.append(f"Vídeo guardado en: {self.timelapse_path} ({self.timelapse.frames} capturas)")
+            if self.document:
+                self.document.add_paragraph(f'Sesión de vídeo: {os.path.basename(self.timelapse_path)} '
+                                            f'({self.timelapse.frames} capturas)')
+        if self.document:
+            try:
+                if self.config.pdf:
+                    self.pdf_path = self.unique_path(os.path.splitext(self.word_path)[0], ".pdf")
+                with METRICS.time("save"):
+                    self.document.finalize(pdf_path=self.pdf_path or None)
+                messages.append(f"Documento guardado en: {self.word_path}")
+                if self.pdf_path:
+                    messages.append(f"PDF guardado en: {self.pdf_path}")
+            except Exception as e:
+                messages.append(f"Error al guardar documento: {str(e)}")
+        self.close_catalog()
+        if self.config.uploader:
+            # Capturas agrupadas y reportes se suben al cerrar la sesión
+            for path in (self.archive_path, self.archive_path and self.archive_path + ARCHIVE_INDEX_SUFFIX,
+                         self.timelapse_path, self.timelapse_path and self.timelapse_path + TIMELAPSE_INDEX_SUFFIX,
+                         self.word_path, self.pdf_path):
+                if path and os.path.exists(path):
+                    self.upload(path)
+            messages.append(f"Subida: {self.config.uploader.stats()['pending']} archivos en cola")
+        if self.retention and self.retention is not self.shared_retention:
+            self.retention.stop()
+            if self.retention.evicted:
+                messages.append(f"Retención: {self.retention.evicted} capturas antiguas borradas")
+        return " | ".join(messages)
+
+    def upload(self, path):
+        """Encola un archivo de la sesión en el uploader (no bloquea)."""
+        if self.config.uploader:
+            self.config.uploader.enqueue(path, upload_key(path, self.config.save_path))
+
+    def close_catalog(self):
+        if self.catalog:
+            self.catalog.end_session(self.session_id, self.saved_count, self.pdf_path)
+            self.catalog.close()
+            self.catalog = None
+
+    def abort(self):
+        """Cierre rápido (al salir): el diario queda en disco para recuperarlo."""
+        self.request_stop()
+        if self.pipeline:
+            self.pipeline.stop(drain=False, timeout=1)
+        if self.timelapse:
+            self.timelapse.close()
+        if self.archive:
+            self.archive.close()
+        if self.document:
+            self.document.close()
+        if self.catalog:
+            self.catalog.close()
+            self.catalog = None
+        if self.retention and self.retention is not self.shared_retention:
+            self.retention.stop()
+
+    def create_word_document(self):
+        config = self.config
+        base_word_path = os.path.join(config.save_path, config.word_name)
+        self.word_path = self.unique_path(base_word_path, ".docx",
+                                          companions=(StreamingReportWriter.JOURNAL_SUFFIX,))
+        self.document = StreamingReportWriter(self.word_path)
+        self.document.add_heading('Reporte de Capturas de Pantalla', 0)
+        self.document.add_paragraph(f'Fecha: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+        self.document.add_paragraph(f'Intervalo: {config.interval} seg')
+        self.document.add_paragraph(f'Formato: {config.image_format}')
+        self.document.add_paragraph('_' * 40)
+
+    def get_capture_manager(self):
+        if self.capture_manager is None:
+            if self.manager_factory:
+                self.capture_manager = self.manager_factory()
+            else:
+                self.capture_manager = CaptureManager(self.config.backend)
+        return self.capture_manager
+
+    def target_region(self):
+        """Rectángulo a capturar según config.target (None = escritorio completo)."""
+        target = self.config.target
+        if target is None or (target.region is None and target.monitor is None):
+            return None
+        if target.region:
+            return target.region
+        if self._region is None:
+            self._region = self.get_capture_manager().monitor_rect(target.monitor)
+        return self._region
+
+    def capture_loop(self):
+        scheduler = self.scheduler
+        while self.capturing:
+            tick = scheduler.wait_next()
+            if tick is None:
+                break
+            if self.paused:
+                continue
+            try:
+                self.take_screenshot()
+            except Exception as e:
+                self.capturing = False
+                self.report_error(str(e), fatal=True)
+                break
+
+    def take_screenshot(self):
+        """Etapa de captura: solo toma la imagen y la entrega al pipeline."""
+        with METRICS.time("grab"):
+            screenshot, buffer = self.get_capture_manager().grab_into(self.frame_pool, self.target_region())
+        METRICS.counter("grabs", "Capturas tomadas").inc()
+        timestamp = self.scheduler.wall_time() if self.scheduler else datetime.now()
+        if self.change_detector and not self.change_detector.has_changed(screenshot):
+            # Pantalla idéntica: no se codifica, ni se guarda, ni entra al Word
+            if buffer is not None:
+                buffer.release()
+            METRICS.counter("unchanged", "Capturas omitidas por no tener cambios").inc()
+            if self.config.unchanged_action == "note" and self.pipeline:
+                frame = CaptureFrame(self.counter, None, timestamp)
+                frame.target = self.config.target
+                frame.unchanged = True
+                self.pipeline.submit(frame)
+            return
+        self.counter += 1
+        frame = CaptureFrame(self.counter, screenshot, timestamp, buffer)
+        frame.target = self.config.target
+        if self.pipeline:
+            self.pipeline.submit(frame)
+            METRICS.gauge("pipeline_pending", "Frames en cola o codificándose").set(self.pipeline.pending())
+            METRICS.gauge("pipeline_dropped", "Frames descartados por contrapresión").set(self.pipeline.dropped)
+        if self.config.max_captures and self.counter >= self.config.max_captures:
+            self.request_stop()
+
+    def encode_capture(self, frame):
+        """Etapa de codificación (pool de hilos): guarda la imagen y su miniatura.
+
+        Al terminar (o fallar) el búfer del frame vuelve al pool.
+        """
+        if frame.unchanged:
+            return
+        try:
+            self._encode_frame(frame)
+        finally:
+            frame.release()
+
+    def _encode_frame(self, frame):
+        if self.timelapse:
+            # Modo vídeo: solo se prepara el frame; se escribe en orden al reportar
+            with METRICS.time("encode"):
+                source = frame.buffer.array if frame.buffer is not None else frame.image
+                frame.video_frame = TimelapseSession.to_bgr(source)
+            frame.size = frame.image.size
+            with METRICS.time("thumbnail"):
+                frame.thumbnail = make_thumbnail(frame.image)
+            return
+        timestamp = frame.timestamp.strftime("%Y%m%d_%H%M%S")
+        base_filename = f"{self.config.base_name}_{frame.seq:04d}_{timestamp}"
+        # Los nombres llevan el número de secuencia, así que no chocan entre hilos
+        # y basta una comprobación en disco (el catálogo es para los de sesión)
+        image = frame.image
+        if self.archive:
+            # Archivo de sesión: se codifica aquí y se anexa en orden al reportar
+            codec, extension, data = self.codec_engine.encode_bytes(image)
+            frame.encoded = (base_filename + extension, data)
+            size, digest = len(data), hashlib.blake2b(data, digest_size=16).hexdigest()
+        else:
+            if self.retention:
+                # Si el disco está casi lleno se borra lo más antiguo antes de escribir
+                self.retention.ensure_space()
+            filepath, codec, size, digest = self.codec_engine.encode(
+                image, os.path.join(self.config.save_path, base_filename), unique_path=get_unique_filename)
+            if self.retention:
+                self.retention.track(filepath, size, frame.timestamp.timestamp(), frame.seq)
+            frame.filepath = filepath
+        frame.codec = codec
+        frame.bytes = size
+        frame.digest = digest
+        frame.size = image.size
+        if self.document:
+            # Derivado a resolución de impresión para el Word (también en paralelo)
+            with METRICS.time("report_media"):
+                frame.report_media = self.document.embedder.prepare(image, width_inches=6)
+
+        # Vista previa
+        with METRICS.time("thumbnail"):
+            frame.thumbnail = make_thumbnail(image)
+
+    def commit_capture(self, frame):
+        """Etapa de reporte (un solo hilo, en orden): añade la captura al Word."""
+        with METRICS.time("report_append"):
+            self._append_to_report(frame)
+        if not frame.unchanged and self.catalog:
+            try:
+                self.catalog.record_capture(self.session_id, frame)
+            except Exception as e:
+                # El catálogo es un índice: su fallo no debe perder la captura
+                self.report_error(f"Catálogo: {e}", fatal=False)
+        if not frame.unchanged:
+            METRICS.counter("captures", "Capturas guardadas").inc()
+            self.saved_count += 1
+            if frame.video_number is None:
+                self.upload(frame.filepath)
+            if self.on_frame:
+                self.on_frame(frame)
+
+    def _append_to_report(self, frame):
+        timestamp = frame.timestamp.strftime("%Y%m%d_%H%M%S")
+        if frame.unchanged:
+            if self.document:
+                self.document.add_paragraph(f'{timestamp}: sin cambios')
+            return
+        if self.timelapse:
+            frame.video_number = self.timelapse.write(frame.video_frame, frame.timestamp, frame.seq)
+            frame.video_frame = None
+            frame.filepath = self.timelapse_path
+            frame.codec = "video"
+        elif self.archive:
+            name, data = frame.encoded
+            frame.encoded = None
+            with METRICS.time("write"):
+                frame.video_number = self.archive.append(
+                    name, data, frame.timestamp, seq=frame.seq, codec=frame.codec,
+                    width=frame.size[0], height=frame.size[1], digest=frame.digest)
+            METRICS.counter("bytes_written", "Bytes de imagen escritos").inc(len(data))
+            frame.filepath = self.archive_path
+        if self.document and not self.timelapse:
+            self.document.add_heading(f'Captura #{frame.seq} - {timestamp}', level=1)
+            if frame.report_media:
+                media_path, media_size = frame.report_media
+                self.document.add_picture(media_path, width_inches=6, size=media_size,
+                                          original=frame.filepath)
+            else:
+                self.document.add_picture(frame.filepath, width_inches=6, size=frame.size)
+
+    def on_pipeline_error(self, frame, error):
+        METRICS.counter("errors", "Errores en el pipeline").inc()
+        self.report_error(f"Error en captura #{frame.seq}: {error}", fatal=False)
+
+    def report_error(self, message, fatal):
+        if self.on_error:
+            self.on_error(message, fatal)
         else:
-            messagebox.showerror("Error", "Contraseña incorrecta")
-            pwd_entry.delete(0, tk.END)
+            print(message, file=sys.stderr)
 
-    tk.Button(login_win, text="Acceder", command=check_password,
-              bg='#0d6efd', fg='white', font=('Arial', 10, 'bold')).pack(pady=10)  
-    
-    # Permitir usar Enter para enviar la contraseña
-    login_win.bind('<Return>', lambda event: check_password())
-    
-    login_win.mainloop()
-    
-    return result[0]
+    def counter_text(self):
+        dropped = self.pipeline.dropped if self.pipeline else 0
+        text = f"Capturas: {self.saved_count}"
+        if dropped:
+            text += f" (descartadas: {dropped})"
+        return text
+
+    def status_text(self, frame):
+        text = f"Guardado: {os.path.basename(frame.filepath)}"
+        if frame.video_number is not None:
+            text += f" (frame {frame.video_number})"
+        if self.change_detector and self.change_detector.unchanged:
+            text += f" | sin cambios: {self.change_detector.unchanged}"
+        if self.scheduler:
+            timing = self.scheduler.stats()
+            text += (f" | retraso {timing['mean_lateness'] * 1000:.0f} ms"
+                     f", jitter {timing['jitter'] * 1000:.1f} ms")
+            if timing['missed']:
+                text += f", ticks perdidos {timing['missed']}"
+        return text
+
+    def status(self):
+        """Estado de la sesión como diccionario (para el daemon y la CLI)."""
+        info = {
+            "capturing": self.capturing,
+            "paused": self.paused,
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "saved": self.saved_count,
+            "grabbed": self.counter,
+            "word_path": self.word_path,
+            "video_path": self.timelapse_path,
+            "backend": self.capture_manager.name if self.capture_manager else None,
+        }
+        if self.pipeline:
+            info.update(dropped=self.pipeline.dropped, failed=self.pipeline.failed,
+                        pending=self.pipeline.pending())
+        if self.change_detector:
+            info["unchanged"] = self.change_detector.unchanged
+        if self.scheduler:
+            info["scheduler"] = self.scheduler.stats()
+        if self.retention:
+            info["retention"] = self.retention.stats()
+        if self.config.uploader:
+            info["upload"] = self.config.uploader.stats()
+        return info
 
 # ================== CLASE PRINCIPAL DE LA APLICACIÓN ==================
 
 class ScreenCaptureApp:
-    def __init__(self, root):
+    def __init__(self, root, warm_up=True):
         self.root = root
         self.root.title("SnapMaster")
         self.root.geometry("1000x650")
         self.root.configure(bg='#f8f9fa')  #
         # Variables principales
-        self.capturing = False
-        self.capture_thread = None
         self.webcam_active = False
         self.webcam_window = None
-        self.cap = None
+        self.webcam = None
+        self.webcam_recorder = None
+        self.webcam_photo = None
         self.save_path = tk.StringVar(value=os.path.expanduser("~/Desktop"))
-        self.interval = tk.IntVar(value=5)
+        self.interval = tk.DoubleVar(value=5)
+        self.missed_policy = tk.StringVar(value="skip")
+        self.skip_unchanged = tk.BooleanVar(value=True)
+        self.change_threshold = tk.DoubleVar(value=0.5)
+        self.unchanged_action = tk.StringVar(value="drop")
         self.image_format = tk.StringVar(value="PNG")
+        self.codec_profile = tk.StringVar(value="balanced")
+        self.native_pdf = tk.BooleanVar(value=True)
+        self.video_session = tk.BooleanVar(value=False)
+        self.archive_session = tk.BooleanVar(value=False)
         self.base_name = tk.StringVar(value="captura")
         self.word_name = tk.StringVar(value="reporte_capturas")
-        self.counter = 0
+        self.backpressure = tk.StringVar(value="drop_oldest")
+        # Objetivos de captura separados por espacios (ver CaptureTarget); vacío = pantalla completa
+        self.targets_spec = tk.StringVar(value="")
+        # Disparadores por actividad (input window screen); vacío = temporizador fijo
+        self.triggers_spec = tk.StringVar(value="")
+        # Destino de la subida en segundo plano (ver UploadEndpoint); vacío = no subir
+        self.upload_url = tk.StringVar(value="")
+        self.uploader = None
+        # Lógica de captura y reporte: ver CaptureSession (compartida con la CLI)
+        self.session = None
+        self.timelapse_path = ""
+        self.capture_manager = None
+        self.capture_manager_lock = threading.Lock()
 
-        # Documento Word
-        self.document = None
+        # Documento Word de la última sesión
         self.word_path = ""
         self.preview_photo = None
 
@@ -137,6 +5513,12 @@ class ScreenCaptureApp:
         counter_label.pack(side='right', padx=10, pady=5)
 
         self.setup_ui()
+        # Elegir el backend de captura sin bloquear la interfaz
+        threading.Thread(target=self.get_capture_manager, daemon=True).start()
+        if warm_up:
+            # Con la ventana ya dibujada, precargar PIL, OpenCV, etc.
+            self.root.after_idle(lambda: threading.Thread(target=warm_up_imports, name="warmup",
+                                                          daemon=True).start())
 
     def setup_ui(self):
         # ------------------ TÍTULO ------------------
@@ -165,6 +5547,16 @@ class ScreenCaptureApp:
         manual_frame = tk.Frame(notebook, bg='#f8f9fa')  
         notebook.add(manual_frame, text="📖 Manual")
 
+        # Pestaña 3: Rendimiento
+        performance_frame = tk.Frame(notebook, bg='#f8f9fa')
+        notebook.add(performance_frame, text="📊 Rendimiento")
+        self.setup_performance_tab(performance_frame)
+
+        # Pestaña 4: Historial
+        history_frame = tk.Frame(notebook, bg='#f8f9fa')
+        notebook.add(history_frame, text="🕘 Historial")
+        self.setup_history_tab(history_frame)
+
         # ------------------ PANEL PRINCIPAL ------------------
         # Panel izquierdo
         left_panel = tk.Frame(main_frame, bg='#f8f9fa', width=580)  
@@ -211,18 +5603,75 @@ class ScreenCaptureApp:
 
         tk.Label(capture_config_frame, text="Intervalo (segundos):", bg='#e9ecef', fg="#495057",
                 font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(5, 0))  
-        tk.Scale(capture_config_frame, from_=1, to=300, orient='horizontal',
+        tk.Scale(capture_config_frame, from_=MIN_CAPTURE_INTERVAL, to=300, resolution=0.1, orient='horizontal',
                 variable=self.interval, bg='#e9ecef', fg="#495057", font=('Arial', 8), length=200,
                 troughcolor="#ced4da", highlightbackground="#e9ecef").pack(fill='x', padx=10, pady=2)  
 
+        tk.Label(capture_config_frame, text="Objetivos (vacío = pantalla completa):", bg='#e9ecef',
+                 fg="#495057", font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        tk.Entry(capture_config_frame, textvariable=self.targets_spec, font=('Arial', 9),
+                 bg="#ffffff", fg="#495057", insertbackground="#495057").pack(fill='x', padx=10, pady=2)
+
+        tk.Label(capture_config_frame, text="Disparadores (vacío = cada intervalo):", bg='#e9ecef',
+                 fg="#495057", font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        tk.Entry(capture_config_frame, textvariable=self.triggers_spec, font=('Arial', 9),
+                 bg="#ffffff", fg="#495057", insertbackground="#495057").pack(fill='x', padx=10, pady=2)
+
+        tk.Label(capture_config_frame, text="Ticks atrasados:", bg='#e9ecef', fg="#495057",
+                font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        missed_buttons = tk.Frame(capture_config_frame, bg='#e9ecef')
+        missed_buttons.pack(pady=5)
+        for value, text in (("catch_up", "Ponerse al día"), ("skip", "Saltar"),
+                            ("coalesce", "Agrupar")):
+            tk.Radiobutton(missed_buttons, text=text, variable=self.missed_policy, value=value,
+                        bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left', padx=(0, 10))
+
         tk.Label(capture_config_frame, text="Formato de imagen:", bg='#e9ecef', fg="#495057",
                 font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))  
         format_buttons = tk.Frame(capture_config_frame, bg='#e9ecef')  
         format_buttons.pack(pady=5)
-        tk.Radiobutton(format_buttons, text="PNG", variable=self.image_format, value="PNG",
-                    bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left', padx=(0, 10))  
-        tk.Radiobutton(format_buttons, text="JPG", variable=self.image_format, value="JPG",
-                    bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left')  
+        for value, text in (("PNG", "PNG"), ("JPG", "JPG"), ("WEBP", "WebP"),
+                            ("WEBP_LL", "WebP sin pérdida"), ("AUTO", "Auto")):
+            tk.Radiobutton(format_buttons, text=text, variable=self.image_format, value=value,
+                        bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left', padx=(0, 10))
+        profile_buttons = tk.Frame(capture_config_frame, bg='#e9ecef')
+        profile_buttons.pack(pady=(0, 5))
+        for value, text in (("fast", "Rápido"), ("balanced", "Equilibrado"), ("small", "Compacto")):
+            tk.Radiobutton(profile_buttons, text=text, variable=self.codec_profile, value=value,
+                        bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left', padx=(0, 10))
+
+        tk.Label(capture_config_frame, text="Si el guardado se atrasa:", bg='#e9ecef', fg="#495057",
+                font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        policy_buttons = tk.Frame(capture_config_frame, bg='#e9ecef')
+        policy_buttons.pack(pady=5)
+        for value, text in (("block", "Esperar"), ("drop_oldest", "Descartar antigua"),
+                            ("drop_newest", "Descartar nueva")):
+            tk.Radiobutton(policy_buttons, text=text, variable=self.backpressure, value=value,
+                        bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left', padx=(0, 10))
+
+        tk.Checkbutton(capture_config_frame, text="Omitir capturas sin cambios (umbral % de píxeles):",
+                    variable=self.skip_unchanged, bg='#e9ecef', fg="#495057", selectcolor="#ced4da",
+                    font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        tk.Scale(capture_config_frame, from_=0.1, to=20, resolution=0.1, orient='horizontal',
+                variable=self.change_threshold, bg='#e9ecef', fg="#495057", font=('Arial', 8), length=200,
+                troughcolor="#ced4da", highlightbackground="#e9ecef").pack(fill='x', padx=10, pady=2)
+        unchanged_buttons = tk.Frame(capture_config_frame, bg='#e9ecef')
+        unchanged_buttons.pack(pady=5)
+        for value, text in (("drop", "Descartar"), ("note", "Anotar \"sin cambios\" en el Word")):
+            tk.Radiobutton(unchanged_buttons, text=text, variable=self.unchanged_action, value=value,
+                        bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(side='left', padx=(0, 10))
+
+        tk.Checkbutton(capture_config_frame, text="Modo sesión de vídeo (un solo archivo .mp4)",
+                    variable=self.video_session, bg='#e9ecef', fg="#495057", selectcolor="#ced4da",
+                    font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        tk.Checkbutton(capture_config_frame, text=f"Archivo de sesión único ({ARCHIVE_EXTENSION})",
+                    variable=self.archive_session, bg='#e9ecef', fg="#495057", selectcolor="#ced4da",
+                    font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(0, 5))
+
+        tk.Label(capture_config_frame, text="Subir a (http://... o s3://..., vacío = no subir):", bg='#e9ecef',
+                 fg="#495057", font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=(8, 0))
+        tk.Entry(capture_config_frame, textvariable=self.upload_url, font=('Arial', 9),
+                 bg="#ffffff", fg="#495057", insertbackground="#495057").pack(fill='x', padx=10, pady=(2, 5))
 
         # === Control de captura ===
         control_frame = tk.LabelFrame(left_panel, text="🎮 Control de Captura",
@@ -256,6 +5705,17 @@ class ScreenCaptureApp:
                                     bg='#6c757d', fg='white', font=('Arial', 10, 'bold'),  
                                     padx=15, pady=6, width=25, state='disabled')
         self.pdf_btn.pack(pady=2)
+        self.video_export_btn = tk.Button(buttons_row2, text="🎞️ Exportar de vídeo", command=self.export_from_video,
+                                    bg='#6c757d', fg='white', font=('Arial', 10, 'bold'),
+                                    padx=15, pady=6, width=25, state='disabled')
+        self.video_export_btn.pack(pady=2)
+        self.batch_report_btn = tk.Button(buttons_row2, text="🗂️ Reporte desde carpeta",
+                                          command=self.build_report_from_folder,
+                                          bg='#6c757d', fg='white', font=('Arial', 10, 'bold'),
+                                          padx=15, pady=6, width=25)
+        self.batch_report_btn.pack(pady=2)
+        tk.Checkbutton(buttons_row2, text="PDF nativo (rápido, sin Office)", variable=self.native_pdf,
+                    bg='#e9ecef', fg="#495057", selectcolor="#ced4da", font=('Arial', 9)).pack(pady=2)
 
         # === Vista previa ===
         preview_frame = tk.LabelFrame(right_panel, text="👀 Vista Previa",
@@ -285,8 +5745,22 @@ class ScreenCaptureApp:
     - Defina el nombre base de las imágenes y del documento Word.
 
     2. Opciones de Captura:
-    - Ajuste el intervalo en segundos.
-    - Seleccione el formato de imagen (PNG o JPG).
+    - Ajuste el intervalo en segundos (desde 0.1 s).
+    - Objetivos: deje vacío para capturar todo el escritorio, o escriba uno
+      o varios separados por espacios: monitor:2, region:0,0,1280,720.
+      Cada uno admite /interval=5/format=JPG/name=editor y se guarda con su
+      propio nombre y su propio Word, capturándose todos en paralelo.
+    - Disparadores: deje vacío para capturar cada intervalo, o escriba
+      input, window y/o screen para capturar con el teclado y el ratón, al
+      cambiar de ventana o cuando cambie la pantalla. Mientras haya actividad
+      se captura como mucho una vez por intervalo, y sin actividad una vez
+      por minuto.
+    - Elija qué hacer con los ticks atrasados: ponerse al día, saltar o agrupar.
+    - Active "Omitir capturas sin cambios" para no guardar pantallas idénticas;
+      el umbral es el % de píxeles que deben cambiar.
+    - Seleccione el formato de imagen (PNG, JPG, WebP o Auto) y el perfil:
+      Rápido, Equilibrado o Compacto. En Auto cada captura se guarda como
+      PNG si es interfaz plana o JPG si tiene contenido fotográfico.
 
     3. Control:
     - Presione ▶️ INICIAR para comenzar la captura automática.
@@ -295,17 +5769,45 @@ class ScreenCaptureApp:
 
     4. Cámara Web:
     - Active la cámara con 📹 CÁMARA.
+    - ⏺️ GRABAR guarda un vídeo .mp4 que incluye los últimos segundos
+      anteriores a pulsar el botón.
     - Puede habilitar la detección de rostros con la casilla.
     - Cierre la ventana para detener.
 
-    5. Vista Previa:
+    4b. Sesión de vídeo:
+    - Con "Modo sesión de vídeo" las capturas se guardan en un único .mp4
+      con un índice de horas, en lugar de una imagen por captura.
+    - 🎞️ Exportar de vídeo extrae frames concretos (por número o por hora)
+      como PNG y en un Word.
+    - 🗂️ Reporte desde carpeta vuelve a generar el Word con las imágenes que
+      ya están en la carpeta de destino (usa todos los núcleos).
+    - Con "Archivo de sesión único" cada captura se guarda, en el formato
+      elegido, dentro de un solo .snaparc (cómodo para copias y
+      backups). Sobrevive a un cierre brusco y se extrae a archivos sueltos
+      con: python -m snapmaster archive ARCHIVO --export CARPETA --report
+    - "Subir a" envía en segundo plano cada captura, el Word, el PDF y el
+      vídeo o archivo de sesión a un servidor (http://servidor/carpeta) o a
+      un bucket S3/MinIO (s3://bucket/carpeta). La subida nunca frena la
+      captura; si no hay red se reintenta más tarde y lo pendiente se retoma
+      en la siguiente captura con el mismo destino.
+
+    5. Vista Previa e Historial:
     - A la derecha verá la última captura guardada.
+    - La pestaña 🕘 Historial muestra las miniaturas de la sesión actual, de
+      una sesión anterior o de toda la carpeta. Doble clic abre la captura.
+      Las miniaturas se guardan en la subcarpeta .snapmaster_thumbs, así que
+      la segunda vez el historial se abre al instante.
 
     ⚠️ Recomendaciones:
     - No cierre la aplicación mientras captura.
     - El documento Word se guarda automáticamente al detener.
+    - Si la aplicación se cierra de golpe, el Word se recupera al iniciar
+      la siguiente captura en la misma carpeta.
     - Para mejor rendimiento, use intervalos mayores a 10 segundos.
     - El PDF se genera usando método alternativo compatible con .exe
+    - Con "PDF nativo" el PDF se escribe directamente, sin Word ni LibreOffice.
+    - La pestaña 📊 Rendimiento muestra el tiempo de cada etapa (captura,
+      códec, escritura, reporte, PDF) y permite exportar las métricas.
     """
         text_widget = tk.Text(manual_frame, wrap="word", font=("Arial", 11),
                             bg="#ffffff", fg="#495057", insertbackground="#495057")  
@@ -317,6 +5819,258 @@ class ScreenCaptureApp:
         text_widget['yscrollcommand'] = scrollbar.set
         scrollbar.pack(side="right", fill="y")
 
+    def setup_performance_tab(self, frame):
+        # ------------------ RENDIMIENTO ------------------
+        stages_frame = tk.LabelFrame(frame, text="⏱️ Latencia por etapa (ms)",
+                                     font=('Arial', 10, 'bold'), bg='#e9ecef', fg='#495057')
+        stages_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        columns = ("n", "media", "p50", "p95", "p99", "max")
+        self.metrics_tree = ttk.Treeview(stages_frame, columns=columns, height=len(METRIC_STAGES))
+        self.metrics_tree.heading("#0", text="Etapa")
+        self.metrics_tree.column("#0", width=140)
+        for column, title in zip(columns, ("Muestras", "Media", "p50", "p95", "p99", "Máx")):
+            self.metrics_tree.heading(column, text=title)
+            self.metrics_tree.column(column, width=90, anchor='e')
+        for name, label in METRIC_STAGES:
+            self.metrics_tree.insert("", "end", iid=name, text=label, values=("0",) + ("-",) * 5)
+        self.metrics_tree.pack(fill='both', expand=True, padx=10, pady=10)
+
+        self.metrics_var = tk.StringVar(value="")
+        tk.Label(frame, textvariable=self.metrics_var, bg='#f8f9fa', fg='#495057',
+                 font=('Arial', 9), justify='left').pack(anchor='w', padx=10)
+        tk.Button(frame, text="💾 Exportar métricas", command=self.export_metrics,
+                  bg='#0d6efd', fg='white', font=('Arial', 9, 'bold')).pack(anchor='w', padx=10, pady=10)
+        self.refresh_performance()
+
+    def refresh_performance(self):
+        """Actualiza la pestaña Rendimiento una vez por segundo."""
+        snapshot = METRICS.snapshot()
+        for name, _ in METRIC_STAGES:
+            info = snapshot["histograms"].get(name)
+            if info and info["count"]:
+                values = [info["count"]] + [f"{info[key] * 1000:.1f}"
+                                            for key in ("mean", "p50", "p95", "p99", "max")]
+                self.metrics_tree.item(name, values=values)
+        counters = snapshot["counters"]
+        gauges = snapshot["gauges"]
+        self.metrics_var.set(
+            f"Capturas tomadas: {counters.get('grabs', 0)}  |  guardadas: {counters.get('captures', 0)}"
+            f"  |  sin cambios: {counters.get('unchanged', 0)}  |  errores: {counters.get('errors', 0)}\n"
+            f"En cola: {gauges.get('pipeline_pending', 0)}  |  descartadas: {gauges.get('pipeline_dropped', 0)}"
+            f"  |  escrito: {counters.get('bytes_written', 0) / 1e6:.1f} MB"
+            f"  |  PDF: {counters.get('pdf_conversions', 0)} (fallos de método: {counters.get('pdf_fallbacks', 0)})")
+        self.root.after(1000, self.refresh_performance)
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="Exportar métricas", defaultextension=".prom",
+            filetypes=[("Prometheus", "*.prom"), ("JSON lines", "*.jsonl")])
+        if not path:
+            return
+        try:
+            MetricsExporter(path, "jsonl" if path.endswith(".jsonl") else "prometheus").write()
+            self.status_var.set(f"Métricas guardadas en: {path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron exportar las métricas: {e}")
+
+    def setup_history_tab(self, frame):
+        # ------------------ HISTORIAL ------------------
+        top = tk.Frame(frame, bg='#f8f9fa')
+        top.pack(fill='x', padx=10, pady=(10, 0))
+        self.history_choice = tk.StringVar(value=HISTORY_CURRENT)
+        self.history_combo = ttk.Combobox(top, textvariable=self.history_choice, state='readonly', width=45,
+                                          values=(HISTORY_CURRENT, HISTORY_ALL))
+        self.history_combo.pack(side='left')
+        self.history_combo.bind('<<ComboboxSelected>>', lambda e: self.load_history())
+        tk.Button(top, text="🔄 Actualizar", command=self.refresh_history_sessions,
+                  bg='#0d6efd', fg='white', font=('Arial', 9, 'bold')).pack(side='left', padx=8)
+        self.history_var = tk.StringVar(value="")
+        tk.Label(top, textvariable=self.history_var, bg='#f8f9fa', fg='#495057',
+                 font=('Arial', 9)).pack(side='left', padx=8)
+
+        body = tk.Frame(frame, bg='#f8f9fa')
+        body.pack(fill='both', expand=True, padx=10, pady=10)
+        self.history_scrollbar = tk.Scrollbar(body, orient='vertical')
+        self.history_scrollbar.pack(side='right', fill='y')
+        self.history_canvas = tk.Canvas(body, bg='#ffffff', highlightthickness=0,
+                                        yscrollcommand=self.history_scrolled)
+        self.history_canvas.pack(side='left', fill='both', expand=True)
+        self.history_scrollbar.config(command=self.history_canvas.yview)
+        self.history_canvas.bind('<Configure>', lambda e: self.schedule_history_redraw())
+        self.history_canvas.bind('<Double-Button-1>', self.open_history_item)
+        self.history_canvas.bind('<MouseWheel>', lambda e: self.scroll_history(-1 if e.delta > 0 else 1))
+        self.history_canvas.bind('<Button-4>', lambda e: self.scroll_history(-1))
+        self.history_canvas.bind('<Button-5>', lambda e: self.scroll_history(1))
+
+        # Solo existen elementos del lienzo para las celdas visibles:
+        # índice -> [rectángulo, imagen, texto, PhotoImage]
+        self.history_items = []
+        self.history_live = []
+        self.history_cells = {}
+        self.history_columns_drawn = 0
+        self.history_sessions = {}
+        self.history_cache = None
+        self.history_loader = None
+        self.history_redraw_pending = False
+
+    def ensure_history_cache(self, folder):
+        """Caché de miniaturas y cargador de la carpeta actual (se rehacen si cambia)."""
+        if self.history_cache is None or self.history_cache.folder != folder:
+            if self.history_loader:
+                self.history_loader.stop()
+            self.history_cache = ThumbnailCache(folder)
+            self.history_loader = ThumbnailLoader(self.history_cache, self.on_history_thumbnail).start()
+        return self.history_cache
+
+    def refresh_history_sessions(self):
+        """Relee del catálogo las sesiones de la carpeta y recarga la lista elegida."""
+        folder = self.save_path.get()
+
+        def load():
+            sessions = []
+            if os.path.exists(os.path.join(folder, CATALOG_FILENAME)):
+                catalog = SessionCatalog(folder)
+                try:
+                    sessions = catalog.sessions()
+                finally:
+                    catalog.close()
+
+            def done():
+                self.history_sessions = {}
+                for row in reversed(sessions):
+                    label = f"#{row['id']} {row['name']} ({row['captures'] or 0} capturas)"
+                    self.history_sessions[label] = row['id']
+                self.history_combo.config(values=(HISTORY_CURRENT, HISTORY_ALL, *self.history_sessions))
+                if self.history_choice.get() not in (HISTORY_CURRENT, HISTORY_ALL, *self.history_sessions):
+                    self.history_choice.set(HISTORY_ALL)
+                self.load_history()
+            self.root.after(0, done)
+        threading.Thread(target=load, daemon=True).start()
+
+    def load_history(self):
+        """Muestra la lista elegida; las de disco se leen en segundo plano."""
+        choice = self.history_choice.get()
+        if choice == HISTORY_CURRENT:
+            self.show_history(self.history_live)
+            return
+        folder = self.save_path.get()
+        session_ids = [self.history_sessions[choice]] if choice in self.history_sessions else None
+        self.history_var.set("Cargando...")
+
+        def load():
+            try:
+                items = history_items(folder, session_ids)
+            except Exception as e:
+                self.root.after(0, lambda msg=str(e): self.history_var.set(f"Error: {msg}"))
+                return
+            self.root.after(0, lambda: self.show_history(items))
+        threading.Thread(target=load, daemon=True).start()
+
+    def show_history(self, items):
+        self.ensure_history_cache(self.save_path.get())
+        self.history_items = items
+        self.clear_history_cells()
+        self.history_canvas.yview_moveto(0)
+        self.history_var.set(f"{len(items)} capturas")
+        self.schedule_history_redraw()
+
+    def history_appended(self):
+        if self.history_items is self.history_live:
+            self.history_var.set(f"{len(self.history_live)} capturas")
+            self.schedule_history_redraw()
+
+    def clear_history_cells(self):
+        for cell in self.history_cells.values():
+            for item in cell[:3]:
+                self.history_canvas.delete(item)
+        self.history_cells = {}
+
+    def history_scrolled(self, first, last):
+        self.history_scrollbar.set(first, last)
+        self.schedule_history_redraw()
+
+    def scroll_history(self, direction):
+        self.history_canvas.yview_scroll(direction * 2, 'units')
+
+    def schedule_history_redraw(self):
+        # Varios eventos de desplazamiento seguidos se agrupan en un solo redibujado
+        if not self.history_redraw_pending:
+            self.history_redraw_pending = True
+            self.root.after_idle(self.redraw_history)
+
+    def redraw_history(self):
+        """Crea las celdas visibles, borra las demás y pide las miniaturas que faltan."""
+        self.history_redraw_pending = False
+        canvas = self.history_canvas
+        cell_w, cell_h = HISTORY_THUMB_SIZE[0] + 16, HISTORY_THUMB_SIZE[1] + 30
+        columns = max(1, canvas.winfo_width() // cell_w)
+        items = self.history_items
+        rows = (len(items) + columns - 1) // columns
+        canvas.configure(scrollregion=(0, 0, columns * cell_w, rows * cell_h), yscrollincrement=cell_h // 2)
+        if columns != self.history_columns_drawn:
+            self.clear_history_cells()
+            self.history_columns_drawn = columns
+
+        top = int(canvas.canvasy(0))
+        first = max(0, top // cell_h) * columns
+        last = min(len(items), ((top + canvas.winfo_height()) // cell_h + 1) * columns)
+        for index in [index for index in self.history_cells if not first <= index < last]:
+            for item in self.history_cells.pop(index)[:3]:
+                canvas.delete(item)
+
+        missing = []
+        for index in range(first, last):
+            if index in self.history_cells:
+                continue
+            path, timestamp = items[index]
+            x = (index % columns) * cell_w + cell_w // 2
+            y = (index // columns) * cell_h + 6
+            rect = canvas.create_rectangle(x - HISTORY_THUMB_SIZE[0] // 2, y,
+                                           x + HISTORY_THUMB_SIZE[0] // 2, y + HISTORY_THUMB_SIZE[1],
+                                           fill='#e9ecef', outline='')
+            image = canvas.create_image(x, y, anchor='n')
+            text = canvas.create_text(x, y + HISTORY_THUMB_SIZE[1] + 4, anchor='n', fill='#495057',
+                                      font=('Arial', 8), text=timestamp.strftime("%d/%m %H:%M:%S"))
+            self.history_cells[index] = [rect, image, text, None]
+            thumbnail = self.history_cache.get(path)
+            if thumbnail is not None:
+                self.set_history_thumbnail(index, thumbnail)
+            else:
+                missing.append(path)
+        if self.history_loader:
+            # También con la lista vacía: cancela lo que dejó de verse
+            self.history_loader.request(missing)
+
+    def set_history_thumbnail(self, index, thumbnail):
+        from PIL import ImageTk
+
+        cell = self.history_cells[index]
+        cell[3] = ImageTk.PhotoImage(thumbnail)
+        self.history_canvas.itemconfigure(cell[1], image=cell[3])
+
+    def on_history_thumbnail(self, path, thumbnail):
+        # Llamado desde el hilo del cargador
+        if thumbnail is not None:
+            self.root.after(0, lambda: self.history_thumbnail_ready(path, thumbnail))
+
+    def history_thumbnail_ready(self, path, thumbnail):
+        for index in self.history_cells:
+            if index < len(self.history_items) and self.history_items[index][0] == path:
+                self.set_history_thumbnail(index, thumbnail)
+
+    def open_history_item(self, event):
+        canvas = self.history_canvas
+        cell_w, cell_h = HISTORY_THUMB_SIZE[0] + 16, HISTORY_THUMB_SIZE[1] + 30
+        column = int(canvas.canvasx(event.x)) // cell_w
+        if column >= self.history_columns_drawn:
+            return
+        index = int(canvas.canvasy(event.y)) // cell_h * self.history_columns_drawn + column
+        if index < len(self.history_items):
+            try:
+                open_with_system(self.history_items[index][0])
+            except Exception as e:
+                self.status_var.set(f"No se pudo abrir la captura: {e}")
+
     # ======================= LÓGICA ======================
 
     def browse_folder(self):
@@ -326,57 +6080,92 @@ class ScreenCaptureApp:
 
     def start_capture(self):
         try:
-            if not os.path.exists(self.save_path.get()):
-                messagebox.showerror("Error", "La ruta especificada no existe")
-                return
-
-            if not self.base_name.get().strip():
-                messagebox.showerror("Error", "Debe especificar un nombre base")
-                return
-
-            if not self.word_name.get().strip():
-                messagebox.showerror("Error", "Debe especificar un nombre para el documento Word")
-                return
-
-            self.capturing = True
-            self.counter = 0
-            self.create_word_document()
+            config = self.capture_config()
+            config.validate()
+            targets = [CaptureTarget.parse(spec) for spec in self.targets_spec.get().split()]
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        try:
+            self.recover_orphan_reports()
+            self.ensure_history_cache(config.save_path)
+            self.history_live = []
+            if self.history_choice.get() == HISTORY_CURRENT:
+                self.show_history(self.history_live)
+            self.session = create_capture_session(config, targets, manager_factory=self.get_capture_manager,
+                                                  on_frame=self.on_session_frame,
+                                                  on_error=self.on_session_error)
+            self.session.start()
+            self.word_path = self.session.word_path
+            self.timelapse_path = self.session.timelapse_path
 
             self.start_btn.config(state='disabled')
             self.stop_btn.config(state='normal')
             # Activar botón PDF cuando se crea el documento
             self.pdf_btn.config(state='normal', bg='#fd7e14')  
 
-            self.capture_thread = threading.Thread(target=self.capture_loop, daemon=True)
-            self.capture_thread.start()
-            self.status_var.set(f"Capturando cada {self.interval.get()} segundos...")
+            self.status_var.set(f"Capturando {config.schedule_text()}...")
 
         except Exception as e:
             messagebox.showerror("Error", f"Error al iniciar captura: {str(e)}")
 
+    def capture_config(self):
+        """Lee la configuración de la interfaz (en el hilo de Tk)."""
+        config = CaptureConfig(
+            save_path=self.save_path.get(), base_name=self.base_name.get(), word_name=self.word_name.get(),
+            interval=self.interval.get(), image_format=self.image_format.get(),
+            codec_profile=self.codec_profile.get(), backpressure=self.backpressure.get(),
+            missed_policy=self.missed_policy.get(), skip_unchanged=self.skip_unchanged.get(),
+            change_threshold=self.change_threshold.get() / 100, unchanged_action=self.unchanged_action.get(),
+            video_session=self.video_session.get())
+        config.triggers = tuple(self.triggers_spec.get().replace(",", " ").split())
+        config.archive = self.archive_session.get()
+        config.uploader = self.get_uploader(self.upload_url.get().strip())
+        return config
+
+    def get_uploader(self, url):
+        """Uploader del destino indicado; se reutiliza entre sesiones mientras no cambie."""
+        if self.uploader and self.uploader.endpoint.url != url:
+            # Lo pendiente queda en la cola y se retoma al volver a ese destino
+            threading.Thread(target=self.uploader.stop, daemon=True).start()
+            self.uploader = None
+        if url and not self.uploader:
+            self.uploader = BackgroundUploader(UploadEndpoint(url)).start()
+        return self.uploader
+
     def stop_capture(self):
-        self.capturing = False
-        self.start_btn.config(state='normal')
+        if self.session:
+            self.session.request_stop()
         self.stop_btn.config(state='disabled')
-        if self.document:
-            try:
-                # Guardar Word con nombre único
-                self.document.save(self.word_path)
-                self.status_var.set(f"Documento guardado en: {self.word_path}")
-            except Exception as e:
-                self.status_var.set(f"Error al guardar documento: {str(e)}")
+        self.status_var.set("Terminando de guardar capturas pendientes...")
+        # Vaciar el pipeline y guardar el Word fuera del hilo de la interfaz
+        threading.Thread(target=self.finish_capture, daemon=True).start()
 
-    def create_word_document(self):
-        from docx import Document
-        self.document = Document()
-        self.document.add_heading('Reporte de Capturas de Pantalla', 0)
-        self.document.add_paragraph(f'Fecha: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
-        self.document.add_paragraph(f'Intervalo: {self.interval.get()} seg')
-        self.document.add_paragraph(f'Formato: {self.image_format.get()}')
-        self.document.add_paragraph('_' * 40)
+    def finish_capture(self):
+        session = self.session
+        message = session.stop() if session else None
+        has_video = bool(session and session.timelapse and session.timelapse.frames)
+
+        def done():
+            self.start_btn.config(state='normal')
+            if has_video:
+                self.video_export_btn.config(state='normal', bg='#fd7e14')
+            if message:
+                self.status_var.set(message)
+        self.root.after(0, done)
+
+    def recover_orphan_reports(self):
+        """Regenera en segundo plano los Word de sesiones que no se cerraron bien."""
+        folder = self.save_path.get()
+        journals = StreamingReportWriter.find_orphan_journals(folder)
+        if not journals:
+            return
 
-        base_word_path = os.path.join(self.save_path.get(), self.word_name.get())
-        self.word_path = self.get_unique_filename(base_word_path, ".docx")
+        def recover():
+            # Solo los diarios encontrados antes de iniciar: el de la sesión nueva no
+            for message in recover_orphan_reports(folder, journals):
+                self.root.after(0, lambda msg=message: self.status_var.set(msg))
+        threading.Thread(target=recover, daemon=True).start()
 
     def generate_pdf_from_word(self):
         try:
@@ -386,79 +6175,16 @@ class ScreenCaptureApp:
             
             # Ruta PDF con lógica de nombre único
             pdf_path = self.get_unique_filename(self.word_path.replace(".docx", ""), ".pdf")
+            prefer_native = self.native_pdf.get()
+            uploader, folder = self.uploader, self.save_path.get()
             
             def convert_pdf():
                 try:
                     self.status_var.set(f"Generando PDF: {os.path.basename(pdf_path)}")
-                    
-                    # Método 1: Intentar con docx2pdf
-                    success = False
-                    try:
-                        from docx2pdf import convert
-                        convert(self.word_path, pdf_path)
-                        success = True
-                        self.status_var.set(f"PDF generado exitosamente: {pdf_path}")
-                    except Exception as e1:
-                        print(f"Método docx2pdf falló: {e1}")
-                        
-                        # Método 2: Usar LibreOffice si está disponible
-                        try:
-                            # Buscar LibreOffice en rutas comunes
-                            libreoffice_paths = [
-                                r"C:\Program Files\LibreOffice\program\soffice.exe",
-                                r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
-                                "soffice",  # Si está en PATH
-                                "libreoffice"  # Si está en PATH
-                            ]
-                            
-                            libreoffice_cmd = None
-                            for path in libreoffice_paths:
-                                if os.path.exists(path) or path in ["soffice", "libreoffice"]:
-                                    libreoffice_cmd = path
-                                    break
-                            
-                            if libreoffice_cmd:
-                                cmd = [
-                                    libreoffice_cmd,
-                                    '--headless',
-                                    '--convert-to', 'pdf',
-                                    '--outdir', os.path.dirname(pdf_path),
-                                    self.word_path
-                                ]
-                                
-                                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-                                if result.returncode == 0:
-                                    success = True
-                                    self.status_var.set(f"PDF generado con LibreOffice: {pdf_path}")
-                                else:
-                                    raise Exception(f"LibreOffice error: {result.stderr}")
-                            else:
-                                raise Exception("LibreOffice no encontrado")
-                                
-                        except Exception as e2:
-                            print(f"Método LibreOffice falló: {e2}")
-                            
-                            # Método 3: Usar win32com si está disponible (solo Windows)
-                            try:
-                                if sys.platform == "win32":
-                                    import win32com.client
-                                    word = win32com.client.Dispatch("Word.Application")
-                                    word.Visible = False
-                                    doc = word.Documents.Open(self.word_path)
-                                    doc.SaveAs(pdf_path, FileFormat=17)  # 17 = PDF format
-                                    doc.Close()
-                                    word.Quit()
-                                    success = True
-                                    self.status_var.set(f"PDF generado con MS Word: {pdf_path}")
-                                else:
-                                    raise Exception("win32com solo disponible en Windows")
-                            except Exception as e3:
-                                print(f"Método win32com falló: {e3}")
-                                raise Exception(f"Todos los métodos fallaron: docx2pdf={e1}, LibreOffice={e2}, win32com={e3}")
-                    
-                    if not success:
-                        self.status_var.set("Error: No se pudo generar el PDF con ningún método")
-                        
+                    method = PDFConverter(prefer_native=prefer_native).convert(self.word_path, pdf_path)
+                    self.status_var.set(f"PDF generado con {method}: {pdf_path}")
+                    if uploader:
+                        uploader.enqueue(pdf_path, upload_key(pdf_path, folder))
                 except Exception as e:
                     error_msg = f"Error al generar PDF: {str(e)}"
                     self.status_var.set(error_msg)
@@ -470,55 +6196,115 @@ class ScreenCaptureApp:
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo iniciar generación de PDF: {str(e)}")
 
-    def get_unique_filename(self, base_path, extension=""):
-        if not os.path.exists(base_path + extension):
-            return base_path + extension
-        counter = 1
-        while True:
-            new_path = f"{base_path}_{counter:02d}{extension}"
-            if not os.path.exists(new_path):
-                return new_path
-            counter += 1
+    def build_report_from_folder(self):
+        """Reconstruye el Word con las imágenes ya guardadas en la carpeta de destino."""
+        folder = self.save_path.get()
+        if not os.path.isdir(folder):
+            messagebox.showerror("Error", "La ruta especificada no existe")
+            return
+        docx_path = get_unique_filename(os.path.join(folder, "reporte_reconstruido"), ".docx",
+                                        companions=(StreamingReportWriter.JOURNAL_SUFFIX,))
+        self.batch_report_btn.config(state='disabled')
+        self.status_var.set("Buscando imágenes...")
 
-    def capture_loop(self):
-        while self.capturing:
+        def progress(done, total):
+            self.root.after(0, lambda: self.status_var.set(f"Reporte desde carpeta: {done}/{total} imágenes"))
+
+        def build():
             try:
-                self.take_screenshot()
-                time.sleep(self.interval.get())
+                items = report_items_from_folder(folder)
+                BatchReportBuilder(docx_path).build(items, progress=progress, source=folder)
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", str(e)))
-                break
+                self.root.after(0, lambda msg=str(e): messagebox.showerror(
+                    "Error", f"No se pudo generar el reporte: {msg}"))
+            else:
+                def done():
+                    self.word_path = docx_path
+                    self.pdf_btn.config(state='normal', bg='#fd7e14')
+                    self.status_var.set(f"Documento guardado en: {docx_path}")
+                self.root.after(0, done)
+            finally:
+                self.root.after(0, lambda: self.batch_report_btn.config(state='normal'))
+        threading.Thread(target=build, daemon=True).start()
 
-    def take_screenshot(self):
-        import pyautogui
-        from PIL import Image, ImageTk
+    def export_from_video(self):
+        """Exporta capturas concretas de la última sesión de vídeo a PNG y a un Word."""
+        from tkinter import simpledialog
 
-        screenshot = pyautogui.screenshot()
-        self.counter += 1
+        if not self.timelapse_path or not os.path.exists(self.timelapse_path):
+            messagebox.showerror("Error", "No hay una sesión de vídeo para exportar")
+            return
+        selection = simpledialog.askstring(
+            "Exportar de vídeo", "Frames o horas a exportar (p. ej. 0, 10-12, 14:30:00):", parent=self.root)
+        if not selection:
+            return
+        video_path = self.timelapse_path
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = f"{self.base_name.get()}_{self.counter:04d}_{timestamp}"
-        extension = f".{self.image_format.get().lower()}"
-        filepath = self.get_unique_filename(os.path.join(self.save_path.get(), base_filename), extension)
+        def export():
+            reader = TimelapseReader(video_path)
+            try:
+                numbers = reader.parse_selection(selection)
+                if not numbers:
+                    raise ValueError("La selección no contiene frames válidos")
+                base = os.path.splitext(video_path)[0]
+                for number in numbers:
+                    reader.export_frame(number, self.get_unique_filename(f"{base}_frame{number:05d}", ".png"))
+                docx_path = reader.export_report(
+                    self.get_unique_filename(f"{base}_seleccion", ".docx",
+                                             companions=(StreamingReportWriter.JOURNAL_SUFFIX,)), numbers)
+                message = f"Exportados {len(numbers)} frames y {os.path.basename(docx_path)}"
+            except Exception as e:
+                message = f"Error al exportar de vídeo: {e}"
+            finally:
+                reader.close()
+            self.root.after(0, lambda: self.status_var.set(message))
+        threading.Thread(target=export, daemon=True).start()
 
-        if self.image_format.get() == "JPG":
-            screenshot = screenshot.convert('RGB')
-        screenshot.save(filepath)
+    def get_unique_filename(self, base_path, extension="", companions=()):
+        return get_unique_filename(base_path, extension, companions)
 
-        # Vista previa
-        img_copy = screenshot.copy()
-        img_copy.thumbnail((500, 350))
-        self.preview_photo = ImageTk.PhotoImage(img_copy)
-        self.root.after(0, lambda: self.preview_label.config(image=self.preview_photo))
+    def get_capture_manager(self):
+        with self.capture_manager_lock:
+            if self.capture_manager is None:
+                try:
+                    self.capture_manager = CaptureManager()
+                except Exception as e:
+                    self.root.after(0, lambda msg=str(e): self.status_var.set(msg))
+                    raise
+                name = self.capture_manager.name
+                self.root.after(0, lambda: self.status_var.set(f"Listo para capturar (backend: {name})"))
+            return self.capture_manager
 
-        # Word
-        if self.document:
-            from docx.shared import Inches
-            self.document.add_heading(f'Captura #{self.counter} - {timestamp}', level=1)
-            self.document.add_picture(filepath, width=Inches(6))
-        
-        self.root.after(0, lambda: self.counter_var.set(f"Capturas: {self.counter}"))
-        self.root.after(0, lambda: self.status_var.set(f"Guardado: {os.path.basename(filepath)}"))
+    def on_session_frame(self, frame):
+        # Llamado en el hilo de reporte: todo lo de Tk pasa por after()
+        session = self.session
+        counter_text = session.counter_text()
+        status_text = session.status_text(frame)
+        self.root.after(0, lambda: self.show_preview(frame.thumbnail))
+        cache = self.history_cache
+        if frame.video_number is None and cache is not None:
+            # La miniatura ya está hecha: el historial no tendrá que leer la captura
+            try:
+                cache.put(frame.filepath, frame.thumbnail)
+            except OSError:
+                pass
+            self.history_live.append((frame.filepath, frame.timestamp))
+            self.root.after(0, self.history_appended)
+        self.root.after(0, lambda: self.counter_var.set(counter_text))
+        self.root.after(0, lambda: self.status_var.set(status_text))
+
+    def on_session_error(self, message, fatal):
+        if fatal:
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+        else:
+            self.root.after(0, lambda: self.status_var.set(message))
+
+    def show_preview(self, thumbnail):
+        from PIL import ImageTk
+
+        # PhotoImage debe crearse en el hilo de Tk
+        self.preview_photo = ImageTk.PhotoImage(thumbnail)
+        self.preview_label.config(image=self.preview_photo)
 
     # ======================= CÁMARA ======================
 
@@ -529,13 +6315,14 @@ class ScreenCaptureApp:
             self.stop_webcam()
 
     def start_webcam(self):
-        import cv2
-        self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        if not self.cap.isOpened():
+        self.webcam = WebcamManager(0, 640, 480)
+        if not self.webcam.open():
+            self.webcam = None
             messagebox.showerror("Error", "No se pudo acceder a la cámara")
             return
-        self.cap.set(3, 640)
-        self.cap.set(4, 480)
+        # El anillo de pre-grabación se llena desde que se abre la cámara
+        self.webcam_recorder = WebcamRecorder(fps=self.webcam.fps())
+        self.webcam.add_listener(self.webcam_recorder.feed)
         self.webcam_active = True
         self.detect_faces = tk.BooleanVar(value=False)
         self.frame_counter = 0
@@ -546,11 +6333,17 @@ class ScreenCaptureApp:
     def stop_webcam(self):
         self.webcam_active = False
         self.webcam_btn.config(text="📹 ACTIVAR", bg='#6f42c1')  
-        if self.cap:
-            self.cap.release()
+        if self.webcam:
+            self.webcam.close()
+            self.webcam = None
+        if self.webcam_recorder:
+            recorder, self.webcam_recorder = self.webcam_recorder, None
+            # Terminar de escribir el vídeo sin bloquear la interfaz
+            threading.Thread(target=recorder.stop, daemon=True).start()
         if self.webcam_window:
             self.webcam_window.destroy()
             self.webcam_window = None
+        self.webcam_photo = None
 
     def create_webcam_window(self):
         self.webcam_window = tk.Toplevel(self.root)
@@ -559,6 +6352,14 @@ class ScreenCaptureApp:
         self.webcam_window.configure(bg="#f8f9fa")  
         self.webcam_window.attributes('-topmost', True)
 
+        # Contadores de FPS y grabación
+        self.webcam_fps_var = tk.StringVar(value="")
+        tk.Label(self.webcam_window, textvariable=self.webcam_fps_var, bg="#f8f9fa",
+                 fg="#6c757d", font=("Arial", 8)).pack(side='bottom', fill='x')
+        self.record_btn = tk.Button(self.webcam_window, text="⏺️ GRABAR", command=self.toggle_recording,
+                                    bg='#dc3545', fg='white', font=('Arial', 9, 'bold'))
+        self.record_btn.pack(side='bottom', pady=2)
+
         # Label de video
         self.webcam_label = tk.Label(self.webcam_window, bg="#ffffff")  
         self.webcam_label.pack(fill='both', expand=True, padx=0, pady=0)
@@ -574,14 +6375,13 @@ class ScreenCaptureApp:
         self.update_webcam()
 
     def update_webcam(self):
-        if self.webcam_active and self.cap:
+        if self.webcam_active and self.webcam:
             import cv2
-            from PIL import Image, ImageTk, Image as PILImage
+            from PIL import ImageTk, Image as PILImage
 
-            ret, frame = self.cap.read()
-            if ret:
+            frame = self.webcam.latest()
+            if frame is not None:
                 self.frame_counter += 1
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
                 # === SOLO detectar rostros si la opción está activada y cada 5 frames ===
                 # if self.detect_faces.get() and self.frame_counter % 5 == 0:
@@ -595,24 +6395,988 @@ class ScreenCaptureApp:
                   #   for (x, y, w, h) in faces:
                      #    cv2.rectangle(frame_rgb, (x, y), (x + w, y + h), (0, 255, 0), 2)
 
-                # Convertir frame a formato Tkinter
-                image_pil = PILImage.fromarray(frame_rgb)
-                image_pil = image_pil.resize((460, 320))
-                photo = ImageTk.PhotoImage(image_pil)
-                self.webcam_label.config(image=photo)
-                self.webcam_label.image = photo
+                # Reducir primero al tamaño real del widget y convertir color
+                # después: ambas operaciones trabajan sobre menos píxeles.
+                width = max(1, self.webcam_label.winfo_width())
+                height = max(1, self.webcam_label.winfo_height())
+                if width < 10 or height < 10:
+                    width, height = 460, 320
+                small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                image_pil = PILImage.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+                if self.webcam_photo and (self.webcam_photo.width(), self.webcam_photo.height()) == (width, height):
+                    # Reutilizar la imagen Tk existente en lugar de crear otra
+                    self.webcam_photo.paste(image_pil)
+                else:
+                    self.webcam_photo = ImageTk.PhotoImage(image_pil)
+                    self.webcam_label.config(image=self.webcam_photo)
+                    self.webcam_label.image = self.webcam_photo
+
+            stats = self.webcam.stats()
+            fps_text = (f"Mostrados {stats['delivered_fps']:.0f} fps | "
+                        f"descartados {stats['dropped_fps']:.0f} fps")
+            if self.webcam_recorder and self.webcam_recorder.recording:
+                rec = self.webcam_recorder.stats()
+                fps_text += f" | REC {int(rec['seconds']) // 60:02d}:{int(rec['seconds']) % 60:02d}"
+                if rec['dropped']:
+                    fps_text += f" (perdidos {rec['dropped']})"
+            self.webcam_fps_var.set(fps_text)
 
             if self.webcam_window:
                 self.webcam_window.after(30, self.update_webcam)
 
+    def toggle_recording(self):
+        recorder = self.webcam_recorder
+        if not recorder:
+            return
+        if not recorder.recording:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = self.get_unique_filename(os.path.join(self.save_path.get(), f"webcam_{timestamp}"), ".mp4")
+            recorder.start(path)
+            self.record_btn.config(text="⏹️ PARAR")
+            self.status_var.set(f"Grabando cámara (incluye {recorder.preroll_frames} frames previos)")
+        else:
+            self.record_btn.config(text="⏺️ GRABAR")
+
+            def finish():
+                recorder.stop()
+                stats = recorder.stats()
+                message = f"Vídeo guardado: {os.path.basename(recorder.path)} ({stats['recorded']} frames"
+                message += f", {stats['dropped']} perdidos)" if stats['dropped'] else ")"
+                self.root.after(0, lambda: self.status_var.set(message))
+            threading.Thread(target=finish, daemon=True).start()
+
     def on_closing(self):
-        self.capturing = False
+        if self.session:
+            # El diario queda en disco; el próximo inicio recupera el Word
+            self.session.abort()
+        if self.uploader:
+            # Lo que no se haya subido se retoma en la próxima sesión
+            self.uploader.stop(timeout=1)
+        if self.capture_manager:
+            self.capture_manager.close()
+        threading.Thread(target=shutdown_office_pool, daemon=True).start()
         self.stop_webcam()
         self.root.destroy()
 
+# ================== BENCHMARK ==================
+
+BENCHMARK_RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    # Tres monitores 1080p lado a lado (el "monitor 0" virtual de mss)
+    "multi": (5760, 1080),
+}
+BENCHMARK_STAGES = ("capture", "encode", "report", "docx", "pdf")
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Percentiles por rango más cercano; {} si no hay muestras."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {}
+    for p in points:
+        index = max(0, min(len(ordered) - 1, -(-p * len(ordered) // 100) - 1))
+        result[f"p{p}"] = ordered[index]
+    return result
+
+
+def peak_rss_bytes():
+    """Pico de memoria residente del proceso, o None si el sistema no lo expone."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KiB, macOS en bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _timed(func, samples):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+    return wrapper
+
+
+def _folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder)
+               if os.path.isfile(os.path.join(folder, name)))
+
+
+def benchmark_case(resolution, content, frames=20, image_format="PNG", profile="balanced",
+                   pdf="native", seed=0, workdir=None):
+    """Un escenario: frames sintéticos -> pipeline -> .docx -> PDF. Devuelve un dict.
+
+    Los frames salen del backend sintético con semilla fija, así que dos
+    ejecuciones trabajan sobre exactamente los mismos píxeles.
+    """
+    import tempfile
+
+    width, height = BENCHMARK_RESOLUTIONS[resolution]
+    backend = SyntheticBackend(width, height, content, seed=seed)
+    backend.grab()  # dibuja el fondo fuera de la medición
+    samples = {stage: [] for stage in BENCHMARK_STAGES}
+    backend.grab = _timed(backend.grab, samples["capture"])
+    backend.grab_into = _timed(backend.grab_into, samples["capture"])
+
+    folder = tempfile.mkdtemp(prefix="snapmaster-bench-", dir=workdir)
+    try:
+        config = CaptureConfig(save_path=folder, interval=MIN_CAPTURE_INTERVAL, image_format=image_format,
+                               codec_profile=profile, backpressure="block", skip_unchanged=False)
+        session = CaptureSession(config, manager_factory=lambda: CaptureManager(backend))
+        session.encode_capture = _timed(session.encode_capture, samples["encode"])
+        session.commit_capture = _timed(session.commit_capture, samples["report"])
+
+        started = time.perf_counter()
+        session.start(scheduled=False)
+        for _ in range(frames):
+            session.take_screenshot()
+        session.pipeline.stop(drain=True)
+        elapsed = time.perf_counter() - started
+        session.document.finalize = _timed(session.document.finalize, samples["docx"])
+        session.stop()
+
+        pdf_method = None
+        pdf_path = os.path.splitext(session.word_path)[0] + ".pdf"
+        if pdf != "none":
+            converter = PDFConverter(prefer_native=(pdf == "native"))
+            pdf_method = _timed(converter.convert, samples["pdf"])(session.word_path, pdf_path)
+
+        stages = {}
+        for stage, values in samples.items():
+            if values:
+                stats = {key: value * 1000 for key, value in percentiles(values).items()}
+                stats["mean"] = sum(values) / len(values) * 1000
+                stats["n"] = len(values)
+                stages[stage] = stats
+        return {
+            "resolution": resolution, "size": [width, height], "content": content,
+            "format": image_format, "profile": profile, "frames": frames,
+            "committed": session.pipeline.committed, "failed": session.pipeline.failed,
+            "seconds": elapsed, "fps": session.pipeline.committed / elapsed if elapsed else 0.0,
+            "stages_ms": stages,
+            "bytes_written": _folder_bytes(folder),
+            "docx_bytes": os.path.getsize(session.word_path),
+            "pdf_bytes": os.path.getsize(pdf_path) if os.path.exists(pdf_path) else None,
+            "pdf_method": pdf_method,
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _benchmark_case_kwargs(kwargs):
+    return benchmark_case(**kwargs)
+
+
+def run_benchmark(resolutions=("1080p", "1440p", "4k", "multi"), contents=("ui", "photo"), frames=20,
+                  image_format="PNG", profile="balanced", pdf="native", isolate=True, workdir=None,
+                  progress=None):
+    """Ejecuta todos los escenarios y devuelve los resultados listos para JSON.
+
+    Con isolate=True cada escenario corre en un proceso nuevo: el pico de RSS
+    es el de ese escenario y ninguno hereda cachés del anterior.
+    """
+    import platform
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "pipeline_workers": PIPELINE_WORKERS,
+            "modules": {name: getattr(sys.modules.get(name), "__version__", None)
+                        for name in ("PIL", "numpy", "cv2") if import_timed(name)[1] is None},
+        },
+        "cases": [],
+    }
+    for resolution in resolutions:
+        for content in contents:
+            kwargs = dict(resolution=resolution, content=content, frames=frames,
+                          image_format=image_format, profile=profile, pdf=pdf, workdir=workdir)
+            if isolate:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    case = pool.submit(_benchmark_case_kwargs, kwargs).result()
+            else:
+                case = benchmark_case(**kwargs)
+            results["cases"].append(case)
+            if progress:
+                progress(case)
+    return results
+
+
+def format_benchmark_case(case, baseline=None):
+    """Una línea legible por escenario; con baseline añade la variación de fps y p95."""
+    stages = case["stages_ms"]
+    line = (f"{case['resolution']:>5} {case['content']:<6} {case['fps']:6.2f} fps"
+            f" | captura p95 {stages.get('capture', {}).get('p95', 0):7.1f} ms"
+            f" | códec p95 {stages.get('encode', {}).get('p95', 0):7.1f} ms"
+            f" | reporte p95 {stages.get('report', {}).get('p95', 0):6.1f} ms"
+            f" | docx {stages.get('docx', {}).get('mean', 0):7.1f} ms"
+            f" | pdf {stages.get('pdf', {}).get('mean', 0):7.1f} ms"
+            f" | {case['bytes_written'] / 1e6:7.1f} MB")
+    if case["peak_rss_bytes"]:
+        line += f" | RSS {case['peak_rss_bytes'] / 1e6:6.0f} MB"
+    if baseline:
+        old = next((c for c in baseline.get("cases", []) if c["resolution"] == case["resolution"]
+                    and c["content"] == case["content"] and c["format"] == case["format"]), None)
+        if old and old["fps"]:
+            line += f" | fps {100 * (case['fps'] / old['fps'] - 1):+.1f}%"
+            old_p95 = old["stages_ms"].get("encode", {}).get("p95")
+            if old_p95:
+                line += f", códec p95 {100 * (stages['encode']['p95'] / old_p95 - 1):+.1f}%"
+    return line
+
+
+def run_benchmark_command(args):
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    resolutions = [r.strip().lower() for r in args.resolutions.split(",")]
+    contents = [c.strip().lower() for c in args.content.split(",")]
+    for value, allowed in [(r, BENCHMARK_RESOLUTIONS) for r in resolutions] + \
+                          [(c, SYNTHETIC_CONTENT_TYPES) for c in contents]:
+        if value not in allowed:
+            print(f"Valor desconocido: {value} (opciones: {', '.join(allowed)})", file=sys.stderr)
+            return 2
+    results = run_benchmark(resolutions, contents, frames=args.frames, image_format=args.format,
+                            profile=args.profile, pdf=args.pdf, isolate=not args.in_process,
+                            progress=lambda case: print(format_benchmark_case(case, baseline), flush=True))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados guardados en: {args.output}")
+    return 0 if all(not case["failed"] for case in results["cases"]) else 1
+
+# ================== LÍNEA DE COMANDOS Y DAEMON ==================
+
+def check_cli_unlock():
+    """Equivalente sin ventana del login: pide la contraseña solo si hay terminal."""
+    if is_unlocked():
+        return True
+    if not sys.stdin.isatty():
+        print("SnapMaster está bloqueado: ejecute una vez en una terminal o en la interfaz "
+              "para ingresar la contraseña", file=sys.stderr)
+        return False
+    import getpass
+
+    password = getpass.getpass("Contraseña de SnapMaster: ")
+    if hashlib.sha256(password.encode()).hexdigest() == PASSWORD_HASH:
+        save_token()
+        return True
+    print("Contraseña incorrecta", file=sys.stderr)
+    return False
+
+
+def retention_from_args(args):
+    """RetentionPolicy de las opciones --max-bytes/--max-age/--thin-after/--keep-every, o None."""
+    if not (args.max_bytes or args.max_age or (args.thin_after and args.keep_every)):
+        return None
+    return RetentionPolicy(
+        max_bytes=parse_size(args.max_bytes) if args.max_bytes else None,
+        max_age=parse_duration(args.max_age) if args.max_age else None,
+        thin_after=parse_duration(args.thin_after) if args.thin_after else None,
+        keep_every=args.keep_every, min_free_bytes=parse_size(args.min_free))
+
+
+def targets_from_args(args):
+    return [CaptureTarget.parse(spec) for spec in args.target or []]
+
+
+def config_from_args(args):
+    config = CaptureConfig(
+        save_path=os.path.abspath(args.out), base_name=args.name, word_name=args.report or "",
+        interval=args.interval, image_format=args.format, codec_profile=args.profile,
+        backpressure=args.backpressure, missed_policy=args.missed,
+        skip_unchanged=args.skip_unchanged, change_threshold=args.threshold / 100,
+        change_mode=args.change_mode, unchanged_action=args.unchanged,
+        video_session=args.video, report=bool(args.report), pdf=args.pdf,
+        backend=args.backend, catalog=args.catalog, retention=retention_from_args(args))
+    config.triggers = tuple(dict.fromkeys(kind for value in args.trigger or [] for kind in value.split(",") if kind))
+    config.debounce = args.debounce
+    config.heartbeat = args.heartbeat
+    config.archive = args.archive
+    return config
+
+
+def uploader_from_args(args):
+    """BackgroundUploader ya arrancado para --upload (None sin destino)."""
+    if not args.upload:
+        return None
+    return BackgroundUploader(UploadEndpoint(args.upload), workers=args.upload_workers,
+                              batch_size=args.upload_batch).start()
+
+
+def finish_uploads(uploader, wait):
+    """Espera hasta `wait` segundos a que se vacíe la cola y detiene el uploader."""
+    if not uploader:
+        return
+    uploader.drain(wait)
+    uploader.stop()
+    stats = uploader.stats()
+    message = f"Subida: {stats['uploaded']} archivos ({stats['bytes'] / 1e6:.1f} MB), {stats['retries']} reintentos"
+    if stats["pending"]:
+        message += f", {stats['pending']} pendientes para la próxima ejecución"
+    if stats["failed"]:
+        message += f", {stats['failed']} fallidos"
+    print(message, flush=True)
+
+
+def install_stop_signals(callback, extra=None):
+    """Registra callback para SIGINT/SIGTERM (y extra: {nombre_señal: func}) si existen."""
+    import signal
+
+    handlers = {"SIGINT": callback, "SIGTERM": callback}
+    handlers.update(extra or {})
+    for name, func in handlers.items():
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            signal.signal(signum, lambda _signum, _frame, func=func: func())
+
+
+def start_metrics_exporter(args):
+    if not args.metrics_file:
+        return None
+    return MetricsExporter(args.metrics_file, args.metrics_format, args.metrics_interval).start()
+
+
+def print_progress(session, quiet):
+    def on_frame(frame):
+        if not quiet:
+            print(f"{session.counter_text()} | {session.status_text(frame)}", flush=True)
+    return on_frame
+
+
+def run_capture(args):
+    """Subcomando capture: una sesión en primer plano hasta --count, --duration o Ctrl+C."""
+    try:
+        config = config_from_args(args)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    config.max_captures = args.count
+    errors = []
+
+    def on_error(message, fatal):
+        if fatal:
+            errors.append(message)
+        print(message, file=sys.stderr, flush=True)
+
+    try:
+        targets = targets_from_args(args)
+        # Antes de crear la sesión: cada objetivo copia la configuración
+        config.uploader = uploader_from_args(args)
+        session = create_capture_session(config, targets, on_error=on_error)
+    except ValueError as e:
+        finish_uploads(config.uploader, 0)
+        print(str(e), file=sys.stderr)
+        return 2
+    session.on_frame = print_progress(session, args.quiet)
+    stop_event = threading.Event()
+    install_stop_signals(stop_event.set)
+    try:
+        for message in recover_orphan_reports(config.save_path):
+            print(message, flush=True)
+        session.start()
+    except Exception as e:
+        print(f"Error al iniciar captura: {e}", file=sys.stderr)
+        finish_uploads(config.uploader, 0)
+        return 1
+    exporter = start_metrics_exporter(args)
+    if not args.quiet:
+        print(f"Capturando {config.schedule_text()} en {config.save_path}...", flush=True)
+    deadline = time.monotonic() + args.duration if args.duration else None
+    while session.capturing and not stop_event.wait(0.2):
+        if deadline and time.monotonic() >= deadline:
+            break
+    print(session.stop(), flush=True)
+    finish_uploads(config.uploader, args.upload_wait)
+    if exporter:
+        exporter.stop()
+    return 1 if errors else 0
+
+
+class CaptureDaemon:
+    """Sesión de captura desatendida, controlada por señales o por un socket local.
+
+    Señales (POSIX): SIGTERM/SIGINT detienen, SIGHUP rota el reporte (cierra el
+    Word actual y abre uno nuevo sin dejar de capturar) y SIGUSR1 escribe el
+    estado en stdout. El socket de control recibe una orden por línea
+    (status, metrics, pause, resume, rotate, trigger, stop) y responde una
+    línea JSON; trigger es un evento de actividad manual (con --trigger).
+    Se ejecuta en primer plano: el servicio del sistema (systemd, launchd,
+    Programador de tareas) se encarga de lanzarlo en segundo plano.
+    """
+
+    COMMANDS = ("status", "metrics", "pause", "resume", "rotate", "trigger", "stop")
+
+    def __init__(self, config, control=None, quiet=False, exporter=None, targets=None, upload_wait=0):
+        self.config = config
+        self.upload_wait = upload_wait
+        self.targets = targets
+        self.control = control
+        self.exporter = exporter
+        self.quiet = quiet
+        self.session = None
+        self.capture_manager = None
+        self.manager_lock = threading.Lock()
+        self.server = None
+        self.stop_event = threading.Event()
+        self.rotate_event = threading.Event()
+        self.status_event = threading.Event()
+        self.rotations = 0
+        self.errors = []
+
+    def get_capture_manager(self):
+        # Compartido entre sesiones: rotar no vuelve a abrir el backend
+        with self.manager_lock:
+            if self.capture_manager is None:
+                self.capture_manager = CaptureManager(self.config.backend)
+            return self.capture_manager
+
+    def new_session(self):
+        session = create_capture_session(self.config, self.targets, manager_factory=self.get_capture_manager,
+                                         on_error=self.on_error)
+        session.on_frame = print_progress(session, self.quiet)
+        session.start()
+        return session
+
+    def on_error(self, message, fatal):
+        if fatal:
+            self.errors.append(message)
+            self.stop_event.set()
+        print(message, file=sys.stderr, flush=True)
+
+    def run(self):
+        for message in recover_orphan_reports(self.config.save_path):
+            print(message, flush=True)
+        try:
+            self.session = self.new_session()
+        except Exception as e:
+            print(f"Error al iniciar captura: {e}", file=sys.stderr)
+            finish_uploads(self.config.uploader, 0)
+            return 1
+        install_stop_signals(self.stop_event.set, {"SIGHUP": self.rotate_event.set,
+                                                   "SIGUSR1": self.status_event.set})
+        if self.control:
+            self.start_control_server()
+        if self.exporter:
+            self.exporter.start()
+        print(f"Daemon iniciado (pid {os.getpid()}): capturando {self.config.schedule_text()} "
+              f"en {self.config.save_path}", flush=True)
+        # Las señales solo marcan eventos; el trabajo pesado se hace aquí
+        while not self.stop_event.wait(0.2):
+            if self.rotate_event.is_set():
+                self.rotate_event.clear()
+                self.rotate()
+            if self.status_event.is_set():
+                self.status_event.clear()
+                print(json.dumps(self.status(), default=str), flush=True)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            if self.server.address_family == getattr(socket, "AF_UNIX", None):
+                os.remove(self.control)
+        print(self.session.stop(), flush=True)
+        finish_uploads(self.config.uploader, self.upload_wait)
+        if self.exporter:
+            self.exporter.stop()
+        if self.capture_manager:
+            self.capture_manager.close()
+        return 1 if self.errors else 0
+
+    def rotate(self):
+        """Abre la sesión nueva antes de cerrar la anterior para no perder ticks."""
+        old = self.session
+        self.session = self.new_session()
+        self.session.paused = old.paused
+        self.rotations += 1
+        print(old.stop(), flush=True)
+
+    def status(self):
+        info = self.session.status() if self.session else {}
+        info["rotations"] = self.rotations
+        info["pid"] = os.getpid()
+        return info
+
+    def handle_command(self, command):
+        """Ejecuta una orden del socket de control y devuelve la respuesta."""
+        command = command.strip().lower()
+        if command not in self.COMMANDS:
+            return {"ok": False, "error": f"Orden desconocida: {command}",
+                    "commands": list(self.COMMANDS)}
+        if command == "metrics":
+            return {"ok": True, "metrics": METRICS.snapshot()}
+        if command == "pause":
+            self.session.paused = True
+        elif command == "resume":
+            self.session.paused = False
+        elif command == "rotate":
+            self.rotate_event.set()
+        elif command == "trigger":
+            if not self.session.trigger("control"):
+                return {"ok": False, "error": "La sesión usa el temporizador fijo (inicie con --trigger)"}
+        elif command == "stop":
+            self.stop_event.set()
+        return {"ok": True, "status": self.status()}
+
+    def start_control_server(self):
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    reply = daemon.handle_command(line.decode("utf-8", "replace"))
+                    self.wfile.write((json.dumps(reply, default=str) + "\n").encode("utf-8"))
+
+        host, port = parse_control_address(self.control)
+        if port is None:
+            class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+                daemon_threads = True
+            if os.path.exists(host):
+                os.remove(host)
+            self.server = Server(host, Handler)
+        else:
+            class Server(socketserver.ThreadingTCPServer):
+                daemon_threads = True
+                allow_reuse_address = True
+            self.server = Server((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="control", daemon=True).start()
+
+
+def parse_control_address(address):
+    """"host:puerto" o ":puerto" (TCP, 127.0.0.1 por defecto) o ruta a un socket Unix."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    if not hasattr(socket, "AF_UNIX"):
+        raise ValueError("Use host:puerto para el socket de control en este sistema")
+    return address, None
+
+
+def send_control_command(address, command, timeout=10):
+    """Cliente del socket de control: envía una orden y devuelve la respuesta."""
+    host, port = parse_control_address(address)
+    if port is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(host)
+    else:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((command + "\n").encode("utf-8"))
+        stream.flush()
+        return json.loads(stream.readline().decode("utf-8"))
+
+
+def parse_cli_time(value):
+    """ISO completo ("2024-05-01 10:00") o solo hora ("10:00", de hoy)."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        clock = datetime.strptime(value, "%H:%M:%S" if value.count(":") == 2 else "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"Hora no válida: {value}")
+    return datetime.combine(datetime.now().date(), clock)
+
+
+def run_catalog_command(args):
+    """Subcomando catalog: consulta el índice de una carpeta sin recorrerla."""
+    if not os.path.exists(os.path.join(args.folder, CATALOG_FILENAME)):
+        print(f"No hay catálogo en {args.folder}", file=sys.stderr)
+        return 1
+    catalog = SessionCatalog(args.folder)
+    try:
+        if args.sessions:
+            rows = catalog.sessions()
+        else:
+            session_id = None
+            if args.session:
+                session = catalog.find_session(args.session)
+                if not session:
+                    print(f"Sesión no encontrada: {args.session}", file=sys.stderr)
+                    return 1
+                session_id = session["id"]
+            start = parse_cli_time(args.start) if args.start else None
+            end = parse_cli_time(args.end) if args.end else None
+            rows = catalog.captures_between(start, end, session_id)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    finally:
+        catalog.close()
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    elif args.sessions:
+        for row in rows:
+            print(f"{row['id']:>4}  {row['name']:<32} {row['started'][:19]}  {row['captures'] or 0:>5} capturas"
+                  f"  {os.path.basename(row['word_path'] or row['video_path'] or '')}")
+    else:
+        for row in rows:
+            frame = f" (frame {row['frame']})" if row["frame"] is not None else ""
+            size = f"{row['bytes'] / 1024:8.0f} KB" if row["bytes"] else " " * 11
+            print(f"{row['timestamp'][:19]}  #{row['seq']:<5} {row['codec'] or '':<6} {size}  "
+                  f"{os.path.basename(row['path'])}{frame}")
+    return 0
+
+
+def run_report_command(args):
+    """Subcomando report: reconstruye el Word (y el PDF) desde una carpeta o sesión."""
+    folder = os.path.abspath(args.folder)
+    try:
+        items = report_items_from_folder(folder, args.session)
+    except (OSError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    if not items:
+        print(f"No hay imágenes en {folder}", file=sys.stderr)
+        return 1
+    docx_path = args.output or get_unique_filename(os.path.join(folder, "reporte_reconstruido"), ".docx",
+                                                   companions=(StreamingReportWriter.JOURNAL_SUFFIX,))
+    pdf_path = get_unique_filename(os.path.splitext(docx_path)[0], ".pdf") if args.pdf else None
+    builder = BatchReportBuilder(docx_path, width_inches=args.width, dpi=args.dpi,
+                                 jpeg_quality=args.quality, workers=args.workers)
+
+    def progress(done, total):
+        if not args.quiet and (done == total or done % 25 == 0):
+            print(f"\r{done}/{total} imágenes", end="\n" if done == total else "", flush=True)
+
+    started = time.perf_counter()
+    try:
+        builder.build(items, pdf_path=pdf_path, progress=progress, source=folder)
+    except Exception as e:
+        print(f"Error al generar el reporte: {e}", file=sys.stderr)
+        return 1
+    print(f"Documento guardado en: {docx_path} ({builder.unique} imágenes únicas, "
+          f"{builder.reused} repetidas, {time.perf_counter() - started:.1f} s)")
+    if pdf_path:
+        print(f"PDF guardado en: {pdf_path}")
+    for path, error in builder.failed:
+        print(f"Omitida {path}: {error}", file=sys.stderr)
+    return 1 if builder.failed else 0
+
+
+def run_archive_command(args):
+    """Subcomando archive: información, listado, verificación y exportación."""
+    try:
+        reader = SessionArchiveReader(args.path)
+    except (OSError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    with reader:
+        span = f"{reader.times[0]:%Y-%m-%d %H:%M:%S} - {reader.times[-1]:%H:%M:%S}" if reader.times else "vacío"
+        print(f"{os.path.basename(args.path)}: {len(reader)} frames ({span})"
+              + (" | final truncado: se ignoró el último registro incompleto" if reader.truncated else ""))
+        if args.list:
+            for number in range(len(reader)):
+                info = reader.info(number)
+                print(f"{number:6d}  {reader.times[number]:%Y-%m-%d %H:%M:%S}  {info['name']}  "
+                      f"{len(reader.frame_bytes(number)) / 1024:.0f} KB")
+        if args.verify:
+            damaged = reader.verify()
+            print(f"Frames dañados: {damaged}" if damaged else "Todos los frames están íntegros")
+            if damaged:
+                return 1
+        if args.export:
+            numbers = reader.parse_selection(args.frames) if args.frames else None
+            report = None
+            if args.report:
+                report = get_unique_filename(
+                    os.path.join(args.export, os.path.splitext(os.path.basename(args.path))[0]), ".docx",
+                    companions=(StreamingReportWriter.JOURNAL_SUFFIX,))
+            try:
+                paths = reader.export(args.export, numbers, report=report)
+            except Exception as e:
+                print(f"Error al exportar: {e}", file=sys.stderr)
+                return 1
+            print(f"Exportados {len(paths)} frames a {args.export}")
+            if report and paths:
+                print(f"Documento guardado en: {report}")
+    return 0
+
+
+def run_upload_command(args):
+    """Subcomando upload: encola archivos o carpetas y espera a que se suban.
+
+    Sin rutas solo retoma lo que quedó pendiente de ejecuciones anteriores.
+    """
+    try:
+        uploader = BackgroundUploader(UploadEndpoint(args.url), workers=args.workers, batch_size=args.batch)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if args.retry_failed:
+        print(f"Reintentando {uploader.retry_failed()} archivos fallidos", flush=True)
+    skipped = (StreamingReportWriter.JOURNAL_SUFFIX, StreamingReportWriter.LOCK_SUFFIX)
+    queued = 0
+    for path in args.paths:
+        if os.path.isdir(path):
+            for folder, subfolders, files in os.walk(path):
+                subfolders[:] = [name for name in subfolders if name != THUMBNAIL_CACHE_DIR]
+                for name in sorted(files):
+                    if name.startswith(CATALOG_FILENAME) or name.endswith(skipped):
+                        continue
+                    uploader.enqueue(os.path.join(folder, name), upload_key(os.path.join(folder, name), path))
+                    queued += 1
+        elif os.path.isfile(path):
+            uploader.enqueue(path)
+            queued += 1
+        else:
+            print(f"No existe: {path}", file=sys.stderr)
+    uploader.start()
+    if not args.quiet:
+        print(f"Subiendo {queued} archivos nuevos a {args.url} ({uploader.stats()['pending']} en cola)...",
+              flush=True)
+    stop_event = threading.Event()
+    install_stop_signals(stop_event.set)
+    deadline = time.monotonic() + args.wait if args.wait else None
+    while not stop_event.is_set() and not uploader.drain(timeout=0.5):
+        if deadline and time.monotonic() >= deadline:
+            break
+    failures = uploader.failures()
+    finish_uploads(uploader, 0)
+    for path, error in failures:
+        print(f"Fallido {path}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def build_arg_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="snapmaster", description="SnapMaster: capturas de pantalla con reporte Word/PDF.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="muestra los tiempos de arranque de la interfaz y sale")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS, metavar="MS",
+                        help="con --profile-startup: falla (código 3) si la ventana tarda más")
+    parser.add_argument("--profile-output", metavar="JSON",
+                        help="con --profile-startup: guarda los tiempos en un archivo JSON")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("gui", help="abre la interfaz gráfica (por defecto)")
+
+    session_options = argparse.ArgumentParser(add_help=False)
+    session_options.add_argument("--interval", type=float, default=5.0,
+                                 help="segundos entre capturas (por defecto 5)")
+    session_options.add_argument("--format", default="PNG", choices=(*CODEC_FORMATS, "AUTO"),
+                                 type=str.upper, help="formato de imagen")
+    session_options.add_argument("--profile", default="balanced", choices=CODEC_PROFILES,
+                                 help="perfil del códec")
+    session_options.add_argument("--out", default=os.path.expanduser("~/Desktop"),
+                                 help="carpeta de destino")
+    session_options.add_argument("--name", default="captura", help="nombre base de las imágenes")
+    session_options.add_argument("--report", default="reporte_capturas",
+                                 help="nombre del documento Word ('' para no generarlo)")
+    session_options.add_argument("--pdf", action="store_true",
+                                 help="genera también el PDF al terminar (conversor nativo)")
+    session_options.add_argument("--video", action="store_true",
+                                 help="guarda la sesión en un único .mp4 indexado")
+    session_options.add_argument("--backend", choices=CAPTURE_BACKENDS,
+                                 help="backend de captura (por defecto el más rápido)")
+    session_options.add_argument("--skip-unchanged", action=argparse.BooleanOptionalAction,
+                                 default=True, help="omite capturas sin cambios")
+    session_options.add_argument("--threshold", type=float, default=0.5,
+                                 help="porcentaje de cambio mínimo (por defecto 0.5)")
+    session_options.add_argument("--change-mode", default="diff", choices=CHANGE_DETECTION_MODES)
+    session_options.add_argument("--unchanged", default="drop", choices=("drop", "note"),
+                                 help="qué hacer con las capturas sin cambios")
+    session_options.add_argument("--missed", default="skip", choices=MISSED_TICK_POLICIES,
+                                 help="política para ticks perdidos")
+    session_options.add_argument("--backpressure", default="drop_oldest",
+                                 choices=BACKPRESSURE_POLICIES, help="política con la cola llena")
+    session_options.add_argument("--catalog", action=argparse.BooleanOptionalAction, default=True,
+                                 help="registra las capturas en el catálogo SQLite de la carpeta")
+    session_options.add_argument("--target", action="append", metavar="SPEC",
+                                 help="objetivo de captura, repetible: screen, monitor:N o "
+                                      "region:x,y,ancho,alto, con /interval=5/format=JPG/name=...")
+    session_options.add_argument("--trigger", action="append", metavar="TIPO",
+                                 help="captura por actividad en vez de cada --interval (que pasa a ser el "
+                                      f"periodo de ráfaga): {', '.join(TRIGGER_KINDS)}; repetible o con comas")
+    session_options.add_argument("--debounce", type=float, default=TRIGGER_DEBOUNCE,
+                                 help="segundos sin actividad antes de capturar")
+    session_options.add_argument("--heartbeat", type=float, default=TRIGGER_HEARTBEAT,
+                                 help="con --trigger, captura cada N segundos sin actividad (0 = nunca)")
+    session_options.add_argument("--archive", action="store_true",
+                                 help=f"guarda las capturas en un único archivo {ARCHIVE_EXTENSION} de la sesión")
+    session_options.add_argument("--upload", metavar="URL",
+                                 help="sube capturas y reportes en segundo plano: http(s)://servidor/prefijo "
+                                      "o s3://bucket/prefijo")
+    session_options.add_argument("--upload-workers", type=int, default=UPLOAD_WORKERS,
+                                 help="conexiones de subida simultáneas")
+    session_options.add_argument("--upload-batch", type=int, default=UPLOAD_BATCH,
+                                 help="archivos por lote de subida")
+    session_options.add_argument("--upload-wait", type=float, default=30.0,
+                                 help="segundos que se espera a la cola al terminar (el resto se "
+                                      "retoma en la próxima ejecución)")
+    session_options.add_argument("--max-bytes", help="tamaño máximo de las capturas (p. ej. 20G)")
+    session_options.add_argument("--max-age", help="borra capturas más antiguas (p. ej. 7d, 12h)")
+    session_options.add_argument("--thin-after", help="pasado este tiempo conserva una de cada --keep-every")
+    session_options.add_argument("--keep-every", type=int, help="aclarado: conserva una de cada N capturas")
+    session_options.add_argument("--min-free", default="256M",
+                                 help="espacio libre mínimo en disco con retención (por defecto 256M)")
+    session_options.add_argument("--metrics-file", help="exporta las métricas a este archivo")
+    session_options.add_argument("--metrics-format", default="prometheus", choices=METRICS_FORMATS)
+    session_options.add_argument("--metrics-interval", type=float, default=10.0,
+                                 help="segundos entre exportaciones de métricas")
+    session_options.add_argument("-q", "--quiet", action="store_true",
+                                 help="no muestra cada captura guardada")
+
+    capture = commands.add_parser("capture", parents=[session_options],
+                                  help="captura en primer plano hasta --count, --duration o Ctrl+C")
+    capture.add_argument("--count", type=int, help="número de capturas a tomar")
+    capture.add_argument("--duration", type=float, help="segundos de captura")
+
+    daemon = commands.add_parser("daemon", parents=[session_options],
+                                 help="sesión desatendida controlada por señales o socket")
+    daemon.add_argument("--control", help="socket de control: host:puerto o ruta de socket Unix")
+
+    bench = commands.add_parser("bench", help="benchmark de extremo a extremo con frames sintéticos")
+    bench.add_argument("--resolutions", default="1080p,1440p,4k,multi",
+                       help=f"lista separada por comas ({', '.join(BENCHMARK_RESOLUTIONS)})")
+    bench.add_argument("--content", default="ui,photo",
+                       help=f"tipos de contenido ({', '.join(SYNTHETIC_CONTENT_TYPES)})")
+    bench.add_argument("--frames", type=int, default=20, help="frames por escenario")
+    bench.add_argument("--format", default="PNG", choices=(*CODEC_FORMATS, "AUTO"), type=str.upper)
+    bench.add_argument("--profile", default="balanced", choices=CODEC_PROFILES)
+    bench.add_argument("--pdf", default="native", choices=("native", "auto", "none"),
+                       help="conversor de PDF a medir (por defecto el nativo)")
+    bench.add_argument("--output", metavar="JSON", help="guarda los resultados en JSON")
+    bench.add_argument("--compare", metavar="JSON", help="resultados anteriores con los que comparar")
+    bench.add_argument("--in-process", action="store_true",
+                       help="no aísla cada escenario en su propio proceso")
+
+    catalog = commands.add_parser("catalog", help="consulta el catálogo de capturas de una carpeta")
+    catalog.add_argument("folder", help="carpeta de capturas")
+    catalog.add_argument("--sessions", action="store_true", help="lista las sesiones")
+    catalog.add_argument("--session", help="id o nombre de la sesión")
+    catalog.add_argument("--from", dest="start", help="desde (ISO o HH:MM de hoy)")
+    catalog.add_argument("--to", dest="end", help="hasta, sin incluir (ISO o HH:MM de hoy)")
+    catalog.add_argument("--json", action="store_true", help="salida en JSON")
+
+    report = commands.add_parser("report", help="genera el Word (y PDF) desde las imágenes de una carpeta")
+    report.add_argument("folder", help="carpeta de capturas")
+    report.add_argument("--session", help="solo las capturas de esta sesión del catálogo (id o nombre)")
+    report.add_argument("--output", help="ruta del .docx (por defecto reporte_reconstruido.docx)")
+    report.add_argument("--pdf", action="store_true", help="genera también el PDF (nativo)")
+    report.add_argument("--width", type=float, default=6, help="ancho de las imágenes en pulgadas")
+    report.add_argument("--dpi", type=int, default=150, help="resolución de las imágenes del reporte")
+    report.add_argument("--quality", type=int, default=80, help="calidad JPG de las fotos")
+    report.add_argument("--workers", type=int, help="procesos (por defecto uno por núcleo)")
+    report.add_argument("-q", "--quiet", action="store_true", help="sin progreso")
+
+    archive = commands.add_parser("archive", help=f"consulta o exporta un archivo de sesión {ARCHIVE_EXTENSION}")
+    archive.add_argument("path", help=f"archivo {ARCHIVE_EXTENSION}")
+    archive.add_argument("--list", action="store_true", help="lista los frames (número, hora, nombre, tamaño)")
+    archive.add_argument("--verify", action="store_true", help="comprueba el CRC de todos los frames")
+    archive.add_argument("--export", metavar="CARPETA", help="escribe los frames como archivos sueltos")
+    archive.add_argument("--frames", help="selección a exportar: 0, 10-12, 14:30:00 (por defecto todos)")
+    archive.add_argument("--report", action="store_true", help="con --export, genera también el Word")
+
+    upload = commands.add_parser("upload", help="sube archivos o carpetas (y lo pendiente de otras ejecuciones)")
+    upload.add_argument("url", help="destino: http(s)://servidor/prefijo o s3://bucket/prefijo")
+    upload.add_argument("paths", nargs="*", help="archivos o carpetas a subir")
+    upload.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="conexiones simultáneas")
+    upload.add_argument("--batch", type=int, default=UPLOAD_BATCH, help="archivos por lote")
+    upload.add_argument("--retry-failed", action="store_true", help="vuelve a intentar los archivos fallidos")
+    upload.add_argument("--wait", type=float, help="segundos máximos de espera (por defecto hasta terminar)")
+    upload.add_argument("-q", "--quiet", action="store_true", help="sin progreso")
+
+    control = commands.add_parser("control", help="envía una orden a un daemon en ejecución")
+    control.add_argument("address", help="host:puerto o ruta de socket Unix del daemon")
+    control.add_argument("order", choices=CaptureDaemon.COMMANDS)
+    return parser
+
+
+def cli_main(argv=None):
+    """Punto de entrada: sin argumentos abre la interfaz, como siempre."""
+    args = build_arg_parser().parse_args(argv)
+    if args.profile_startup:
+        return profile_startup(args.startup_budget, args.profile_output)
+    if args.command in (None, "gui"):
+        main()
+        return 0
+    if args.command == "bench":
+        return run_benchmark_command(args)
+    if args.command == "catalog":
+        return run_catalog_command(args)
+    if args.command == "control":
+        try:
+            reply = send_control_command(args.address, args.order)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo contactar al daemon: {e}", file=sys.stderr)
+            return 1
+        print(json.dumps(reply, indent=2, default=str))
+        return 0 if reply.get("ok") else 1
+
+    create_app_dir()
+    if not check_cli_unlock():
+        return 1
+    if args.command == "capture":
+        return run_capture(args)
+    if args.command == "report":
+        return run_report_command(args)
+    if args.command == "archive":
+        return run_archive_command(args)
+    if args.command == "upload":
+        return run_upload_command(args)
+    try:
+        exporter = None
+        if args.metrics_file:
+            exporter = MetricsExporter(args.metrics_file, args.metrics_format, args.metrics_interval)
+        config = config_from_args(args)
+        targets = targets_from_args(args)
+        config.uploader = uploader_from_args(args)
+        daemon = CaptureDaemon(config, control=args.control, quiet=args.quiet, exporter=exporter,
+                               targets=targets, upload_wait=args.upload_wait)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    return daemon.run()
+
+def profile_startup(budget_ms=STARTUP_BUDGET_MS, output=None):
+    """--profile-startup: tiempos de importación y de construcción de la interfaz.
+
+    Devuelve 3 si el tiempo hasta mostrar la ventana supera budget_ms, para
+    poder usarlo como control de regresión en CI.
+    """
+    profiler = StartupProfiler()
+    profiler.record("import snapmaster_profesional", MODULE_IMPORT_SECONDS)
+    profiler.measure("import tkinter", load_tk)
+    root = profiler.measure("tk.Tk()", tk.Tk)
+    app = profiler.measure("ScreenCaptureApp (interfaz)", ScreenCaptureApp, root, False)
+    profiler.measure("primer dibujado", root.update)
+    window_ms = profiler.total() * 1000
+    # En primer plano, para medir cada importación en frío
+    warm_up_imports(profiler=profiler)
+    app.on_closing()
+
+    print(profiler.report())
+    within_budget = window_ms <= budget_ms
+    print(f"Ventana visible en {window_ms:.0f} ms (presupuesto {budget_ms:.0f} ms)"
+          f"{'' if within_budget else ' -- PRESUPUESTO SUPERADO'}")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"window_ms": window_ms, "budget_ms": budget_ms,
+                       "timings": [{"phase": name, "ms": seconds * 1000, "note": note}
+                                   for name, seconds, note in profiler.timings]}, f, indent=2)
+    return 0 if within_budget else 3
+
 # ======================= MAIN MODIFICADO ==================
 
 def main():
+    load_tk()
     create_app_dir()
     if not is_unlocked():
         if not ask_password():
@@ -624,5 +7388,11 @@ def main():
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
 
+MODULE_IMPORT_SECONDS = time.perf_counter() - MODULE_IMPORT_STARTED
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if getattr(sys, "frozen", False):
+        # Ejecutable empaquetado: los procesos del pool de reportes arrancan por aquí
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(cli_main())
\ No newline at end of file
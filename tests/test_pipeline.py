@@ -0,0 +1,72 @@
+"""Pipeline de captura de extremo a extremo con el backend sintético (sin pantalla)."""
+import random
+import threading
+import time
+
+import snapmaster_profesional as sm
+
+
+def test_synthetic_backend_is_deterministic():
+    first = sm.SyntheticBackend(640, 360, seed=7)
+    second = sm.SyntheticBackend(640, 360, seed=7)
+    frames = [first.grab().tobytes() for _ in range(3)]
+    assert frames == [second.grab().tobytes() for _ in range(3)]
+    # Cada frame cambia respecto al anterior
+    assert frames[0] != frames[1]
+
+
+def test_pipeline_commits_in_submission_order():
+    committed = []
+
+    def encode(frame):
+        time.sleep(random.uniform(0, 0.01))
+
+    pipeline = sm.CapturePipeline(encode, lambda frame: committed.append(frame.seq),
+                                  workers=4, queue_size=4, policy="block")
+    pipeline.start()
+    for seq in range(50):
+        pipeline.submit(sm.CaptureFrame(seq, None, None))
+    pipeline.stop(drain=True)
+    assert committed == list(range(50))
+    assert pipeline.dropped == 0
+
+
+def test_pipeline_drop_oldest_releases_dropped_frames():
+    gate = threading.Event()
+    dropped, committed = [], []
+    pipeline = sm.CapturePipeline(lambda frame: gate.wait(5), lambda frame: committed.append(frame.seq),
+                                  workers=1, queue_size=2, policy="drop_oldest",
+                                  on_drop=lambda frame: dropped.append(frame.seq))
+    pipeline.start()
+    pipeline.submit(sm.CaptureFrame(0, None, None))
+    # Espera a que el codificador tome el frame 0 y se quede bloqueado
+    deadline = time.monotonic() + 5
+    while pipeline._queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for seq in range(1, 6):
+        pipeline.submit(sm.CaptureFrame(seq, None, None))
+    gate.set()
+    pipeline.stop(drain=True)
+    assert dropped == [1, 2, 3]
+    assert committed == [0, 4, 5]
+    assert pipeline.dropped == 3
+
+
+def test_session_with_synthetic_backend_writes_captures_and_report(tmp_path):
+    config = sm.CaptureConfig(save_path=str(tmp_path), image_format="JPG", skip_unchanged=False,
+                              backend="synthetic")
+    saved = []
+    session = sm.CaptureSession(config, on_frame=lambda frame: saved.append(frame.seq))
+    session.start(scheduled=False)
+    for _ in range(5):
+        session.take_screenshot()
+    message = session.stop()
+    assert "Documento guardado" in message
+    assert saved == [1, 2, 3, 4, 5]
+    assert len(list(tmp_path.glob("captura_*.jpg"))) == 5
+    assert (tmp_path / "reporte_capturas.docx").exists()
+    catalog = sm.SessionCatalog(str(tmp_path))
+    try:
+        assert [row["seq"] for row in catalog.captures_between()] == [1, 2, 3, 4, 5]
+    finally:
+        catalog.close()
@@ -0,0 +1,68 @@
+"""Objetivos de captura (pantalla, monitor, región) sobre el backend sintético."""
+import time
+
+import pytest
+
+import snapmaster_profesional as sm
+
+
+@pytest.fixture
+def manager():
+    # Dos monitores simulados de 640x360 lado a lado
+    manager = sm.CaptureManager(sm.SyntheticBackend(1280, 360, screens=2))
+    yield manager
+    manager.close()
+
+
+def capture_sizes(tmp_path, spec, manager, count=2):
+    config = sm.CaptureConfig(save_path=str(tmp_path), image_format="JPG", skip_unchanged=False, report=False)
+    sizes = []
+    session = sm.create_capture_session(config, [sm.CaptureTarget.parse(spec)], manager_factory=lambda: manager,
+                                        on_frame=lambda frame: sizes.append(frame.size))
+    session.start(scheduled=False)
+    for _ in range(count):
+        session.take_screenshot()
+    session.stop()
+    return sizes
+
+
+@pytest.mark.parametrize("spec, size", [
+    ("screen", (1280, 360)),
+    ("monitor:2", (640, 360)),
+    ("region:10,20,200,100", (200, 100)),
+])
+def test_target_captures_its_area(tmp_path, manager, spec, size):
+    assert capture_sizes(tmp_path, spec, manager) == [size, size]
+
+
+def test_unknown_monitor_is_rejected(tmp_path, manager):
+    config = sm.CaptureConfig(save_path=str(tmp_path), report=False)
+    session = sm.create_capture_session(config, [sm.CaptureTarget.parse("monitor:5")],
+                                        manager_factory=lambda: manager)
+    session.start(scheduled=False)
+    try:
+        with pytest.raises(ValueError, match="monitor 5"):
+            session.take_screenshot()
+    finally:
+        session.stop()
+
+
+def test_multi_target_session_shares_one_retention_manager(tmp_path, manager):
+    config = sm.CaptureConfig(save_path=str(tmp_path), interval=0.2, image_format="JPG", skip_unchanged=False,
+                              report=False, retention=sm.RetentionPolicy(max_bytes=10 ** 9))
+    targets = [sm.CaptureTarget.parse(spec) for spec in ("screen", "monitor:1", "region:0,0,100,100")]
+    session = sm.create_capture_session(config, targets, manager_factory=lambda: manager)
+    session.start()
+    try:
+        retention = session.retention
+        assert retention is not None
+        assert all(target.retention is retention for target in session.sessions)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and not all(target.saved_count for target in session.sessions):
+            time.sleep(0.05)
+    finally:
+        session.stop()
+    assert all(target.saved_count for target in session.sessions)
+    # Los tres objetivos se contabilizan en el mismo presupuesto de la carpeta
+    assert retention.files == sum(target.saved_count for target in session.sessions)
+    assert session.retention is None
@@ -0,0 +1,126 @@
+"""Disparo por actividad: antirrebote, ráfaga y latido con un reloj simulado."""
+import pytest
+
+import snapmaster_profesional as sm
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def source():
+    return sm.ManualActivitySource("input")
+
+
+@pytest.fixture
+def scheduler(clock, source):
+    scheduler = sm.ActivityScheduler([source], burst_interval=2.0, debounce=0.5, heartbeat=10.0,
+                                     clock=clock, wall_clock=clock)
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def next_tick(scheduler, clock):
+    """Avanza el reloj hasta el próximo disparo y lo devuelve (sin esperar de verdad)."""
+    due = scheduler._due()
+    assert due is not None
+    clock.now = max(clock.now, due)
+    return scheduler.wait_next()
+
+
+def test_first_tick_fires_at_start(scheduler, clock):
+    tick = scheduler.wait_next()
+    assert tick.reason == "start"
+    assert tick.fired_at == 0.0
+
+
+def test_debounce_merges_a_burst_of_events(scheduler, clock, source):
+    scheduler.wait_next()
+    for t in (3.0, 3.2, 3.4):
+        clock.now = t
+        source.fire()
+    assert scheduler._due() == pytest.approx(3.9)
+    tick = next_tick(scheduler, clock)
+    assert tick.reason == "input"
+    assert tick.merged == 3
+
+
+def test_continuous_activity_fires_at_burst_rate(scheduler, clock, source):
+    scheduler.wait_next()
+    fired = []
+    clock.now = 5.0
+    # Un evento cada 0.1 s durante 5 s: el antirrebote nunca vence
+    while clock.now < 10.0:
+        source.fire()
+        due = scheduler._due()
+        if clock.now >= due:
+            fired.append(scheduler.wait_next().fired_at)
+        clock.now = round(clock.now + 0.1, 3)
+    # Como mucho una captura por intervalo de ráfaga, contado desde el primer evento pendiente
+    assert fired == pytest.approx([7.0, 9.1])
+
+
+def test_heartbeat_fires_while_idle(scheduler, clock):
+    scheduler.wait_next()
+    tick = next_tick(scheduler, clock)
+    assert tick.reason == "heartbeat"
+    assert tick.fired_at == pytest.approx(10.0)
+    assert next_tick(scheduler, clock).fired_at == pytest.approx(20.0)
+
+
+def test_no_heartbeat_waits_for_activity(clock, source):
+    scheduler = sm.ActivityScheduler([source], burst_interval=1.0, debounce=0.5, heartbeat=0,
+                                     clock=clock, wall_clock=clock)
+    scheduler.start()
+    scheduler.wait_next()
+    assert scheduler._due() is None
+    clock.now = 3.0
+    source.fire()
+    assert next_tick(scheduler, clock).fired_at == pytest.approx(3.5)
+    scheduler.stop()
+
+
+def test_stopped_source_no_longer_notifies(scheduler, clock, source):
+    scheduler.stop()
+    source.fire()
+    assert scheduler.events == 0
+    assert scheduler.wait_next() is None
+
+
+def test_session_captures_on_injected_events(tmp_path):
+    import time
+
+    source = sm.ManualActivitySource("input")
+    config = sm.CaptureConfig(save_path=str(tmp_path), interval=0.2, image_format="JPG", skip_unchanged=False,
+                              report=False, backend="synthetic")
+    config.triggers = (source,)
+    config.debounce = 0.05
+    config.heartbeat = 0
+    saved = []
+    session = sm.CaptureSession(config, on_frame=lambda frame: saved.append(frame.seq))
+    session.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not saved and time.monotonic() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.5)
+        # Sin actividad ni latido solo está la captura inicial
+        assert len(saved) == 1
+        source.fire()
+        while len(saved) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        session.stop()
+    assert len(saved) == 2
+    assert session.scheduler.stats()["reasons"] == {"start": 1, "input": 1}
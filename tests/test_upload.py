@@ -0,0 +1,209 @@
+"""Subida en segundo plano contra un servidor HTTP local de pega."""
+import http.server
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import snapmaster_profesional as sm
+
+
+class StandInServer:
+    """Servidor PUT keep-alive: guarda los objetos y puede fallar o ir lento a propósito."""
+
+    def __init__(self, root, port=0):
+        self.root = root
+        self.fail_first = 0
+        self.status = 503
+        self.delay = 0.0
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def do_PUT(self):
+                data = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(server.delay)
+                with server.lock:
+                    server.requests += 1
+                    failing = server.requests <= server.fail_first
+                if failing:
+                    self.send_response(server.status)
+                else:
+                    path = os.path.join(server.root, self.path.lstrip("/"))
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(data)
+                    self.send_response(201)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/bucket"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stored(self):
+        folder = os.path.join(self.root, "bucket")
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = StandInServer(str(tmp_path / "server"))
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def files(tmp_path):
+    folder = tmp_path / "files"
+    folder.mkdir()
+    paths = []
+    for i in range(6):
+        path = folder / f"captura_{i:04d}.jpg"
+        path.write_bytes(os.urandom(4096))
+        paths.append(str(path))
+    return paths
+
+
+def make_uploader(url, tmp_path, **kwargs):
+    kwargs.setdefault("backoff", 0.05)
+    return sm.BackgroundUploader(sm.UploadEndpoint(url), queue_path=str(tmp_path / "queue.sqlite3"), **kwargs)
+
+
+def queue_rows(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "queue.sqlite3"))
+    try:
+        return db.execute("SELECT status, COUNT(*) FROM uploads GROUP BY status").fetchall()
+    finally:
+        db.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_uploads_retry_over_keep_alive_connections(server, files, tmp_path):
+    server.fail_first = 2
+    uploader = make_uploader(server.url, tmp_path, workers=2, batch_size=3).start()
+    for path in files:
+        uploader.enqueue(path)
+    assert uploader.drain(timeout=20)
+    uploader.stop()
+    stats = uploader.stats()
+    assert (stats["uploaded"], stats["retries"], stats["failed"]) == (6, 2, 0)
+    assert server.stored() == sorted(os.path.basename(path) for path in files)
+    # Una conexión por hilo más las reabiertas tras cada 5xx, no una por archivo
+    assert server.connections <= 2 + 2 < server.requests
+    assert queue_rows(tmp_path) == []
+
+
+def test_queue_resumes_after_restart(files, tmp_path):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/bucket"
+    # Servidor caído: todo queda pendiente en la cola persistente
+    uploader = make_uploader(url, tmp_path, backoff=1.0).start()
+    for path in files:
+        uploader.enqueue(path)
+    time.sleep(0.3)
+    uploader.stop()
+    assert uploader.stats()["pending"] == len(files)
+
+    # "Reinicio": otro uploader con la misma cola y el servidor ya en marcha
+    server = StandInServer(str(tmp_path / "server"), port=port)
+    try:
+        resumed = make_uploader(url, tmp_path).start()
+        assert resumed.drain(timeout=20)
+        resumed.stop()
+    finally:
+        server.close()
+    assert resumed.stats()["uploaded"] == len(files)
+    assert server.stored() == sorted(os.path.basename(path) for path in files)
+
+
+def test_stop_lets_in_flight_upload_finish(server, files, tmp_path):
+    server.delay = 0.5
+    errors = []
+    hook, threading.excepthook = threading.excepthook, lambda args: errors.append(args.exc_value)
+    try:
+        uploader = make_uploader(server.url, tmp_path, workers=1, batch_size=6).start()
+        for path in files:
+            uploader.enqueue(path)
+        time.sleep(0.2)
+        uploader.stop(timeout=0.05)
+        time.sleep(1.0)
+    finally:
+        threading.excepthook = hook
+    assert errors == []
+    # El archivo en curso se confirmó y el resto del lote volvió a la cola
+    assert uploader.stats()["uploaded"] == 1
+    assert queue_rows(tmp_path) == [("pending", len(files) - 1)]
+
+
+def test_client_errors_are_not_retried(server, files, tmp_path):
+    server.fail_first = 1
+    server.status = 403
+    uploader = make_uploader(server.url, tmp_path, workers=1).start()
+    uploader.enqueue(files[0])
+    assert uploader.drain(timeout=10)
+    assert uploader.stats()["failed"] == 1
+    assert uploader.failures()[0][1].startswith("HTTP 403")
+    assert uploader.retry_failed() == 1
+    assert uploader.drain(timeout=10)
+    uploader.stop()
+    assert server.stored() == [os.path.basename(files[0])]
+
+
+def test_session_uploads_captures_and_report(server, tmp_path):
+    folder = tmp_path / "captures"
+    folder.mkdir()
+    uploader = make_uploader(server.url, tmp_path).start()
+    config = sm.CaptureConfig(save_path=str(folder), image_format="JPG", skip_unchanged=False,
+                              backend="synthetic")
+    config.uploader = uploader
+    session = sm.create_capture_session(config, [sm.CaptureTarget.parse("screen")])
+    session.start(scheduled=False)
+    for _ in range(3):
+        session.take_screenshot()
+    session.stop()
+    assert uploader.drain(timeout=20)
+    uploader.stop()
+    stored = server.stored()
+    assert len([name for name in stored if name.endswith(".jpg")]) == 3
+    assert "reporte_capturas_pantalla.docx" in stored
+
+
+def test_capture_command_uploads_every_target(server, tmp_path, monkeypatch):
+    import functools
+
+    monkeypatch.setattr(sm, "BackgroundUploader",
+                        functools.partial(sm.BackgroundUploader, queue_path=str(tmp_path / "queue.sqlite3")))
+    folder = tmp_path / "captures"
+    folder.mkdir()
+    args = sm.build_arg_parser().parse_args([
+        "capture", "--backend", "synthetic", "--out", str(folder), "--count", "2", "--interval", "0.2",
+        "--format", "JPG", "--no-skip-unchanged", "--report", "", "--target", "screen", "--upload", server.url,
+        "--upload-wait", "20", "-q"])
+    assert sm.run_capture(args) == 0
+    assert len([name for name in server.stored() if name.endswith(".jpg")]) == 2